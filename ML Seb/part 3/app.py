@@ -1,23 +1,31 @@
 # app.py
 
 # --- Imports ---
-import joblib
-import pandas as pd
+import os
+import threading
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import HTMLResponse
-from pydantic import BaseModel
 import numpy as np
 
+# Modules partagés (forest_engine.py, feature_schema.py) : source unique dans ML_Gael/api, à mettre sur le chemin
+# d'import au lancement (cf. README : PYTHONPATH=../../ML_Gael/api uvicorn app:app).
+
+from feature_schema import FEATURE_COLUMNS, patient_model
+from forest_engine import load_model
+
 # --- Configuration et Chargement du Modèle ---
 
 # Nom du fichier modèle (doit exister dans le même répertoire)
 MODEL_PATH = 'modele_diabete_XX.pkl' 
 # 🚨 N'oubliez pas de remplacer XX par vos initiales !
 
+# Artefact NumPy du modèle (python forest_engine.py export) : chargé par mmap à la place du pickle s'il est présent
+MODEL_ARTIFACT_PATH = os.getenv("MODEL_ARTIFACT_PATH", "modele_diabete_XX.model")
+
 try:
-    # Charger le pipeline complet (préprocesseur + modèle)
-    model_pipeline = joblib.load(MODEL_PATH)
-    print(f"Modèle chargé avec succès depuis {MODEL_PATH}")
+    # Charger le pipeline complet (préprocesseur + modèle), ou son export NumPy
+    model_pipeline, _ = load_model(MODEL_PATH, MODEL_ARTIFACT_PATH)
+    print(f"Modèle chargé avec succès depuis {MODEL_PATH} ({type(model_pipeline).__name__})")
 except FileNotFoundError:
     print(f"ERREUR: Le fichier modèle {MODEL_PATH} est introuvable. Assurez-vous de le placer dans le répertoire de l'API.")
     # Permet à l'application de démarrer même sans modèle, mais toutes les requêtes /predict échoueront.
@@ -34,23 +42,26 @@ app = FastAPI(
 
 # Pydantic garantit que les données reçues correspondent à ce format.
 # Cela gère les "erreurs si une valeur manque ou est incorrecte" (Critère de performance).
-class PatientFeatures(BaseModel):
-    age: int
-    gender: int
-    polyuria: int
-    polydipsia: int
-    sudden_weight_loss: int
-    weakness: int
-    polyphagia: int
-    genital_thrush: int
-    visual_blurring: int
-    itching: int
-    irritability: int
-    delayed_healing: int
-    partial_paresis: int
-    muscle_stiffness: int
-    alopecia: int
-    obesity: int
+# Modèle généré depuis le schéma déclaratif commun (feature_schema.py : bornes, descriptions, ordre des colonnes).
+PatientFeatures = patient_model("PatientFeatures")
+
+# Ordre des colonnes du schéma, vérifié une seule fois au démarrage
+# contre l'ordre d'entraînement du modèle : /predict envoie ensuite directement une ligne NumPy.
+if model_pipeline is not None:
+    model_pipeline.check_feature_order(FEATURE_COLUMNS)
+
+# Tampon (1, 16) réutilisé par thread pour la ligne d'entrée
+_row_buffers = threading.local()
+
+def patient_row(patient: PatientFeatures) -> np.ndarray:
+    """
+    Remplit le tampon float64 du thread courant avec les caractéristiques du patient.
+    """
+    row = getattr(_row_buffers, "row", None)
+    if row is None:
+        row = _row_buffers.row = np.empty((1, len(FEATURE_COLUMNS)), dtype=np.float64)
+    row[0] = [getattr(patient, c) for c in FEATURE_COLUMNS]
+    return row
 
 # --- Définition des Endpoints ---
 
@@ -72,16 +83,11 @@ def predict_diabete(patient: PatientFeatures):
         raise HTTPException(status_code=503, detail="Service non disponible: Modèle de prédiction non chargé.")
 
     try:
-        # 1. Conversion des données Pydantic en DataFrame (format attendu par le pipeline)
-        data = patient.model_dump()
-        input_df = pd.DataFrame([data])
-        
-        # S'assurer que les colonnes sont dans le bon ordre (celui utilisé lors de l'entraînement)
-        # Note: L'ordre des colonnes du modèle Pydantic doit correspondre aux colonnes du train set
-        # L'ordre par défaut de Pydantic est l'ordre de définition.
+        # 1. Conversion des données Pydantic en ligne NumPy (ordre des colonnes vérifié au démarrage)
+        input_row = patient_row(patient)
         
         # 2. Prédiction de probabilité
-        proba = model_pipeline.predict_proba(input_df)[:, 1][0]
+        proba = model_pipeline.predict_proba(input_row)[:, 1][0]
         score = float(proba) # Probabilité d'être de classe Positive (diabète)
         
         # 3. Décision (Seuil de 0.5)
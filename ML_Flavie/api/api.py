@@ -1,47 +1,41 @@
 from fastapi import FastAPI
-from pydantic import BaseModel, Field, conint
-import joblib
 import os
+import numpy as np
 
+# Modules partagés (forest_engine.py, feature_schema.py) : source unique dans ML_Gael/api. Copiés à côté de ce
+# fichier par Dockerfile.api ; en local, via PYTHONPATH (cf. ReadMe_ML/README_ML3.md).
+
+from feature_schema import FEATURE_COLUMNS, patient_model
+from forest_engine import load_model
 
 
 # === Charger le modèle ===
 # chemin absolu vers le modèle
-model_path = 'model/modele_diabete_XX.pkl'
-model = joblib.load(model_path)
+model_path = os.getenv("MODEL_PATH", 'model/modele_diabete_XX.pkl')
+# artefact NumPy du modèle (python forest_engine.py export) : chargé par mmap à la place du pickle s'il est présent
+artifact_path = os.getenv("MODEL_ARTIFACT_PATH", 'model/modele_diabete_XX.model')
+model, _ = load_model(model_path, artifact_path)
 
 app = FastAPI(title="API Prédiction Diabète")
 
 # === Définition du schéma des données ===
-class PatientData(BaseModel):
-    age: conint(ge=0, le=120) = Field(..., description="Âge du patient (0-120)")
-    gender: conint(ge=0, le=1) = Field(..., description="1 = Homme, 0 = Femme")
-    polyuria: conint(ge=0, le=1)
-    polydipsia: conint(ge=0, le=1)
-    sudden_weight_loss: conint(ge=0, le=1)
-    weakness: conint(ge=0, le=1)
-    polyphagia: conint(ge=0, le=1)
-    genital_thrush: conint(ge=0, le=1)
-    visual_blurring: conint(ge=0, le=1)
-    itching: conint(ge=0, le=1)
-    irritability: conint(ge=0, le=1)
-    delayed_healing: conint(ge=0, le=1)
-    partial_paresis: conint(ge=0, le=1)
-    muscle_stiffness: conint(ge=0, le=1)
-    alopecia: conint(ge=0, le=1)
-    obesity: conint(ge=0, le=1)
+# Généré depuis le schéma commun (feature_schema.py) : mêmes bornes et même ordre de colonnes que l'entraînement
+PatientData = patient_model("PatientData")
+
+# Ordre des colonnes vérifié une seule fois contre le modèle : /predict envoie ensuite une ligne NumPy
+model.check_feature_order(FEATURE_COLUMNS)
 
 # === Endpoint /predict ===
 @app.post("/predict")
 def predict(patient: PatientData):
     try:
-        # --- Convertir en DataFrame pour le modèle ---
-        import pandas as pd
-        data = pd.DataFrame([patient.dict()])
+        # --- Convertir en ligne NumPy pour le modèle (ordre d'entraînement) ---
+        data = np.array([[getattr(patient, c) for c in FEATURE_COLUMNS]], dtype=np.float64)
 
-        # --- Prédiction ---
-        pred = model.predict(data)[0]
-        proba = model.predict_proba(data)[0][1]  # probabilité du diabète
+        # --- Prédiction (un seul passage dans le modèle) ---
+        probas = model.predict_proba(data)[0]
+        pred = model.classes_[np.argmax(probas)]
+        proba = probas[1]  # probabilité du diabète
 
         return {
             "prediction": int(pred),
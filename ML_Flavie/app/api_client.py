@@ -0,0 +1,153 @@
+# api_client.py
+
+# --- Client de prédiction partagé par les interfaces Gradio (app/main.py, app_v1/gradio_app.py) ---
+#
+# - Mode "api" (défaut) : appels asynchrones (httpx.AsyncClient, un seul pool de connexions keep-alive par
+#   processus, nouvelle tentative si la connexion est refusée) depuis la boucle d'événements de Gradio : une
+#   API lente n'immobilise aucun thread. Au plus `max_inflight` appels simultanés vers l'API, et les demandes
+#   identiques reçues en même temps de plusieurs utilisateurs partagent un seul appel ("singleflight").
+#   La disponibilité de l'API est vérifiée par un thread en arrière-plan (toutes les API_HEALTH_INTERVAL
+#   secondes) et non avant chaque prédiction : un clic ne coûte qu'un aller-retour, et échoue immédiatement si
+#   l'API est connue comme injoignable.
+# - Mode "embedded" (PREDICTION_MODE=embedded) : le modèle local est chargé (artefact NumPy ou pickle, cf.
+#   forest_engine.py) et la prédiction est faite dans le processus Gradio, sans appel réseau.
+#
+# Utilisé par app/main.py et par l'ancienne interface app_v1/gradio_app.py (qui l'importe depuis app/).
+
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+# Modules partagés (forest_engine.py, feature_schema.py) : source unique dans ML_Gael/api. Copiés à côté de ce
+# fichier par Dockerfile.app ; en local, via PYTHONPATH (cf. ReadMe_ML/README_ML3.md).
+
+from feature_schema import FEATURE_COLUMNS
+
+
+class APIUnavailableError(Exception):
+    """
+    L'API est injoignable (dernière vérification en arrière-plan en échec).
+    """
+
+
+class PredictionClient:
+    """
+    await predict(data) renvoie (prédiction 0/1, probabilité du diabète), via l'API ou le modèle local.
+    """
+
+    def __init__(self, api_url: str, mode: str = "api", health_url: Optional[str] = None,
+                 health_interval: float = 10.0, timeout: float = 5.0, max_inflight: int = 10,
+                 model_path: Optional[str] = None, artifact_path: Optional[str] = None):
+        if mode not in ("api", "embedded"):
+            raise ValueError(f"PREDICTION_MODE doit valoir 'api' ou 'embedded', reçu {mode!r}")
+        self.api_url = api_url
+        self.mode = mode
+        self.timeout = timeout
+        self.health_url = health_url or api_url.rsplit("/predict", 1)[0] + "/"
+        self.health_interval = health_interval
+        self.api_up: Optional[bool] = None  # None = pas encore vérifié
+        self.last_error: Optional[str] = None
+        self.model = None
+        self.max_inflight = max(1, max_inflight)
+        # Créés à la première prédiction, dans la boucle d'événements qui les utilise
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self.upstream_calls = self.coalesced = 0
+
+        if mode == "embedded":
+            from forest_engine import load_model
+            self.model, _ = load_model(model_path, artifact_path)
+            self.model.check_feature_order(FEATURE_COLUMNS)
+            return
+
+        threading.Thread(target=self._health_loop, name="api-health", daemon=True).start()
+
+    def _health_loop(self) -> None:
+        with httpx.Client(timeout=self.timeout) as session:
+            while True:
+                try:
+                    response = session.get(self.health_url)
+                    self.api_up = response.status_code < 500
+                    self.last_error = None if self.api_up else f"HTTP {response.status_code}"
+                except httpx.HTTPError as e:
+                    self.api_up = False
+                    self.last_error = str(e) or type(e).__name__
+                time.sleep(self.health_interval)
+
+    async def predict(self, data: dict) -> Tuple[int, float]:
+        if self.model is not None:
+            import numpy as np
+            row = np.array([[data[c] for c in FEATURE_COLUMNS]], dtype=np.float64)
+            probas = self.model.predict_proba(row)[0]
+            return int(self.model.classes_[probas.argmax()]), float(probas[1])
+
+        if self.api_up is False:
+            raise APIUnavailableError(f"API injoignable ({self.last_error}). Vérifiez qu'elle tourne sur le bon port.")
+
+        # Singleflight : une demande identique déjà en cours est attendue au lieu d'être renvoyée à l'API
+        key = tuple(data[c] for c in FEATURE_COLUMNS)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._post(data)
+        except Exception as e:
+            future.set_exception(e)
+            # Exception déjà remontée à l'appelant : évite l'avertissement "exception never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if not future.done():
+                # Appel annulé (utilisateur parti) : les demandes en attente sont annulées avec lui
+                future.cancel()
+            del self._inflight[key]
+
+    async def _post(self, data: dict) -> Tuple[int, float]:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_inflight, max_keepalive_connections=self.max_inflight),
+                transport=httpx.AsyncHTTPTransport(retries=2),
+            )
+            self._slots = asyncio.Semaphore(self.max_inflight)
+        async with self._slots:
+            self.upstream_calls += 1
+            try:
+                response = await self._client.post(self.api_url, json=data)
+            except httpx.ConnectError:
+                # L'API vient de tomber : inutile d'attendre la prochaine vérification pour le signaler
+                self.api_up = False
+                raise
+        response.raise_for_status()
+        result = response.json()
+        self.api_up = True
+        return int(result.get("prediction", 0)), float(result.get("probability", 0))
+
+
+def client_from_env(default_api_url: str, model_path: str, artifact_path: str) -> PredictionClient:
+    """
+    API_BASE_URL, PREDICTION_MODE (api | embedded), API_HEALTH_URL, API_HEALTH_INTERVAL, API_TIMEOUT,
+    API_MAX_INFLIGHT (appels simultanés vers l'API et taille du pool de connexions), MODEL_PATH, MODEL_ARTIFACT_PATH.
+    """
+    return PredictionClient(
+        api_url=os.getenv("API_BASE_URL", default_api_url),
+        mode=os.getenv("PREDICTION_MODE", "api"),
+        health_url=os.getenv("API_HEALTH_URL") or None,
+        health_interval=float(os.getenv("API_HEALTH_INTERVAL", "10")),
+        timeout=float(os.getenv("API_TIMEOUT", "5")),
+        max_inflight=int(os.getenv("API_MAX_INFLIGHT", "10")),
+        model_path=os.getenv("MODEL_PATH", model_path),
+        artifact_path=os.getenv("MODEL_ARTIFACT_PATH", artifact_path),
+    )
@@ -1,11 +1,8 @@
 import gradio as gr
 import requests
-import joblib
 import os
 
-# Chargement du modèle
-model_path = "./model/modele_diabete_XX.pkl"
-model = joblib.load(model_path)
+from api_client import client_from_env
 
 # ---------------------------
 # 1️⃣ Récupération de l'URL de l'API depuis Render
@@ -13,6 +10,16 @@ model = joblib.load(model_path)
 # Récupère l'URL de l'API depuis la variable d'environnement
 API_BASE_URL = os.getenv("API_BASE_URL", "http://api:8000/predict")
 
+# Client de prédiction (cf. api_client.py) : appels asynchrones (pool de connexions partagé, demandes identiques
+# regroupées) + vérification de l'API en arrière-plan, ou PREDICTION_MODE=embedded pour prédire avec le modèle local, sans API (le modèle n'est chargé que dans ce mode)
+client = client_from_env(API_BASE_URL, "./model/modele_diabete_XX.pkl", "./model/modele_diabete_XX.model")
+
+# File d'attente Gradio : nombre de prédictions traitées en parallèle et nombre maximal de requêtes en attente.
+# Les prédictions sont des coroutines (aucun thread bloqué pendant l'appel à l'API) ; le nombre d'appels
+# simultanés vers l'API reste borné par API_MAX_INFLIGHT.
+GRADIO_CONCURRENCY = int(os.getenv("GRADIO_CONCURRENCY", "32"))
+GRADIO_QUEUE_SIZE = int(os.getenv("GRADIO_QUEUE_SIZE", "64"))
+
 def predict(input_data):
     try:
         response = requests.post(API_BASE_URL, json={"data": input_data})
@@ -21,7 +28,7 @@ def predict(input_data):
     except requests.exceptions.RequestException as e:
         return f"Erreur API : {e}"
 
-def predict_diabete_api(age, gender, polyuria, polydipsia, sudden_weight_loss, weakness, polyphagia,
+async def predict_diabete_api(age, gender, polyuria, polydipsia, sudden_weight_loss, weakness, polyphagia,
                         genital_thrush, visual_blurring, itching, irritability, delayed_healing,
                         partial_paresis, muscle_stiffness, alopecia, obesity):
     try:
@@ -44,12 +51,8 @@ def predict_diabete_api(age, gender, polyuria, polydipsia, sudden_weight_loss, w
             "alopecia": int(alopecia),
             "obesity": int(obesity)
         }
-        response = requests.post(API_BASE_URL, json=data, timeout=5)
-        response.raise_for_status()
-        result = response.json()
-
-        pred = result.get("prediction", 0)
-        proba = result.get("probability", 0) * 100
+        pred, proba = await client.predict(data)
+        proba = proba * 100
         pred_text = "Positif" if pred == 1 else "Négatif"
         color = "#e74c3c" if pred == 1 else "#27ae60"
         decision = "⚠️ Diabète détecté" if pred == 1 else "✅ Aucun diabète détecté"
@@ -163,5 +166,6 @@ with gr.Blocks(css="""
         outputs=output
     )
 
-# Lancer l’interface
+# Lancer l’interface (file d'attente bornée : au-delà, les nouveaux utilisateurs sont refusés au lieu d'attendre)
+demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY, max_size=GRADIO_QUEUE_SIZE)
 demo.launch(server_name="0.0.0.0", server_port=7860)
@@ -1,10 +1,14 @@
 # app.py
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
 import joblib
 import pandas as pd
 
+# Schéma partagé (feature_schema.py) : source unique dans ML_Gael/api, via PYTHONPATH en local
+# (cf. ReadMe_ML/README_ML3.md)
+
+from feature_schema import patient_model
+
 # === Charger le modèle ===
 try:
     model = joblib.load("model/modele_diabete_XX.pkl")
@@ -16,23 +20,8 @@ app = FastAPI(title="API Prédiction Diabète")
 
 # === Définir le format des données d'entrée ===
 
-class PatientData(BaseModel):
-    age: int
-    gender: int
-    polyuria: int
-    polydipsia: int
-    sudden_weight_loss: int
-    weakness: int
-    polyphagia: int
-    genital_thrush: int
-    visual_blurring: int
-    itching: int
-    irritability: int
-    delayed_healing: int
-    partial_paresis: int
-    muscle_stiffness: int
-    alopecia: int
-    obesity: int
+# Généré depuis le schéma commun (feature_schema.py) : mêmes bornes et même ordre de colonnes que l'entraînement
+PatientData = patient_model("PatientData")
 
 # === Endpoint de santé ===
 @app.get("/health")
@@ -1,24 +1,34 @@
 import gradio as gr
-import requests
+import os
+import sys
+import httpx
 
-# URL de ton API (à modifier si besoin)
-API_URL = "http://127.0.0.1:8000/predict"
+# Client de prédiction partagé avec l'interface actuelle : source unique dans ../app/api_client.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from api_client import APIUnavailableError, client_from_env
+
+# URL de ton API (à modifier si besoin, ou variable d'environnement API_BASE_URL)
+API_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:8000/predict")
+
+# Client de prédiction (cf. api_client.py) : appels asynchrones (pool de connexions partagé, demandes identiques
+# regroupées), disponibilité de l'API vérifiée en arrière-plan (plus de requête OPTIONS avant chaque prédiction),
+# ou PREDICTION_MODE=embedded (modèle local)
+client = client_from_env(API_URL, "model/modele_diabete_XX.pkl", "model/modele_diabete_XX.model")
+
+# File d'attente Gradio : nombre de prédictions traitées en parallèle et nombre maximal de requêtes en attente.
+# Les prédictions sont des coroutines (aucun thread bloqué pendant l'appel à l'API) ; le nombre d'appels
+# simultanés vers l'API reste borné par API_MAX_INFLIGHT.
+GRADIO_CONCURRENCY = int(os.getenv("GRADIO_CONCURRENCY", "32"))
+GRADIO_QUEUE_SIZE = int(os.getenv("GRADIO_QUEUE_SIZE", "64"))
 
 # === Fonction de prédiction via API avec vérification ===
-def predict_diabete_api_checked(
+async def predict_diabete_api_checked(
     age, gender, polyuria, polydipsia, sudden_weight_loss, weakness, polyphagia,
     genital_thrush, visual_blurring, itching, irritability, delayed_healing,
     partial_paresis, muscle_stiffness, alopecia, obesity
 ):
     try:
-        # --- Vérifier si l'API est joignable ---
-        try:
-            test_resp = requests.options(API_URL, timeout=3)
-            if test_resp.status_code >= 400:
-                return "<div style='color:red; font-weight:bold;'>❌ API non disponible ou erreur HTTP</div>"
-        except requests.exceptions.RequestException:
-            return "<div style='color:red; font-weight:bold;'>❌ Impossible de joindre l'API. Vérifiez qu'elle tourne sur le bon port.</div>"
-
         # --- Validation des champs ---
         if age <= 0 or age > 120:
             return "<div style='color:red; font-weight:bold;'>❌ Age invalide</div>"
@@ -57,13 +67,9 @@ def predict_diabete_api_checked(
             "obesity": obesity
         }
 
-        # --- Appel à l'API ---
-        response = requests.post(API_URL, json=data, timeout=5)
-        response.raise_for_status()
-        result = response.json()
-
-        pred = result.get("prediction", 0)
-        proba = result.get("probability", 0) * 100
+        # --- Appel à l'API (ou au modèle local en mode embedded) ---
+        pred, proba = await client.predict(data)
+        proba = proba * 100
 
         pred_text = "Positif" if pred == 1 else "Négatif"
         color = "#e74c3c" if pred == 1 else "#27ae60"
@@ -90,7 +96,9 @@ def predict_diabete_api_checked(
         </div>
         """
 
-    except requests.exceptions.RequestException as e:
+    except APIUnavailableError:
+        return "<div style='color:red; font-weight:bold;'>❌ Impossible de joindre l'API. Vérifiez qu'elle tourne sur le bon port.</div>"
+    except httpx.HTTPError as e:
         return f"<div style='color:red; font-weight:bold;'>❌ Erreur API : {e}</div>"
     except Exception as e:
         return f"<div style='color:red; font-weight:bold;'>❌ Erreur : {e}</div>"
@@ -176,5 +184,6 @@ h1, h2, h3, p {
         outputs=output
     )
 
-# Lancer Gradio
+# Lancer Gradio (file d'attente bornée : au-delà, les nouveaux utilisateurs sont refusés au lieu d'attendre)
+demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY, max_size=GRADIO_QUEUE_SIZE)
 demo.launch()
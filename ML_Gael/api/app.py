@@ -1,97 +1,915 @@
 # app.py
 
 # --- Imports ---
+import asyncio
+import codecs
+import functools
 import os
-import joblib
-import pandas as pd
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
 import numpy as np
 
+from audit import audit_from_env
+from cache import cache_from_env
+from calibration import DEFAULT_OPERATING_POINT, Calibration
+from candidate import MODES as CANDIDATE_MODES, candidate_from_env
+from cohort import CohortScorer
+from feature_schema import FEATURE_COLUMNS, patient_model
+from features import feature_key
+from forest_engine import load_model
+from metrics import (CONTENT_TYPE, IN_FLIGHT, MODEL_SWAPS, MODEL_WARMUP_SECONDS, PREDICTIONS, REGISTRY,
+                     MetricsMiddleware, current_timer, multiprocess_from_env, set_model)
+from profiler import ProfilingMiddleware, profiler_from_env
+from registry import ModelRegistry, RegistryError
+from scheduler import QueueFullError, SchedulerNotRunningError, scheduler_from_env
+from score_table import ScoreTable
+
 # --- Configuration et Chargement du Modèle ---
 
 # Nom du fichier modèle (doit exister dans le même répertoire)
 # 🚨 N'oubliez pas de remplacer XX par vos initiales !
 MODEL_PATH = 'modele_diabete_XX.pkl' 
 
-# 🔑 CHARGEMENT DU MODÈLE À L'INITIALISATION (UNE SEULE FOIS)
-try:
-    # Charger le pipeline complet (préprocesseur + modèle)
-    model_pipeline = joblib.load(MODEL_PATH)
-    print(f"Modèle chargé avec succès depuis {MODEL_PATH}")
-except FileNotFoundError:
-    print(f"ERREUR: Le fichier modèle {MODEL_PATH} est introuvable. Assurez-vous de le placer dans le répertoire de l'API.")
-    # Le service sera disponible, mais l'endpoint /predict renverra une erreur 503.
-    model_pipeline = None 
+# Artefact NumPy du même modèle (répertoire manifest.json + .npy, cf. forest_engine.py) : s'il est présent,
+# il remplace le pickle. Chargé par mmap en quelques millisecondes, sans scikit-learn ni joblib.
+MODEL_ARTIFACT_PATH = os.getenv("MODEL_ARTIFACT_PATH", "modele_diabete_XX.model")
+
+# Table de scores pré-calculée (cf. score_table.py) : si elle existe et correspond au modèle,
+# /predict est servi par une simple lecture en mémoire au lieu d'un appel à scikit-learn.
+SCORE_TABLE_PATH = os.getenv("SCORE_TABLE_PATH", "modele_diabete_XX.table.npz")
+
+# Registre de modèles versionné (cf. registry.py) : si une version y est active (fichier CURRENT), elle est
+# servie à la place des trois fichiers ci-dessus et peut être remplacée à chaud, sans reconstruire l'image.
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "models")
+
+# Surveillance du fichier CURRENT du registre, en secondes (0 = désactivée, bascule par l'endpoint d'admin
+# uniquement). Sous Gunicorn, c'est elle qui propage une bascule à tous les workers.
+MODEL_REGISTRY_POLL_S = float(os.getenv("MODEL_REGISTRY_POLL_S", "5"))
+
+# Modèle candidat (shadow / canary, cf. candidate.py) : les comparaisons en arrière-plan sont abandonnées dès
+# que la file d'inférence dépasse CANDIDATE_SHED_QUEUE_DEPTH lignes ou que CANDIDATE_SHED_IN_FLIGHT requêtes
+# HTTP sont en cours
+CANDIDATE_SHED_QUEUE_DEPTH = int(os.getenv("CANDIDATE_SHED_QUEUE_DEPTH", "16"))
+CANDIDATE_SHED_IN_FLIGHT = int(os.getenv("CANDIDATE_SHED_IN_FLIGHT", "64"))
+
+# Taille maximale d'un lot pour /predict/batch (évite qu'une seule requête monopolise un worker)
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "1000"))
+
+# Nombre de lignes scorées par bloc dans /predict/csv (mémoire constante quelle que soit la taille du fichier)
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", "10000"))
+
+# Jeton exigé (en-tête X-Admin-Token) par les endpoints /admin/* ; vide = pas de contrôle (usage local)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Nombre de lignes du lot de chauffe exécuté avant de déclarer le service prêt (0 = pas de chauffe)
+WARMUP_ROWS = int(os.getenv("WARMUP_ROWS", "256"))
+
+class ServedModel:
+    """
+    Modèle servi et tout ce qui en dépend (empreinte, table de scores, calibration, version) : une bascule
+    remplace l'objet entier en une seule affectation. Chaque requête lit served_model une fois et s'y tient.
+    """
+    __slots__ = ("pipeline", "sha256", "table", "calibration", "version", "load_seconds", "warmup_seconds",
+                 "loaded_at")
+
+    def __init__(self, pipeline, sha256: str, table: Optional[ScoreTable], version: str, load_seconds: float):
+        self.pipeline = pipeline
+        self.sha256 = sha256
+        self.table = table
+        # Calibration et seuils de décision enregistrés par train.py / calibration.py (identité sinon)
+        self.calibration = Calibration.from_metadata(pipeline.metadata)
+        self.version = version
+        self.load_seconds = load_seconds
+        self.warmup_seconds: Optional[float] = None
+        self.loaded_at = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+
+    def describe(self) -> dict:
+        return {
+            "model_version": self.version,
+            "model_sha256": self.sha256,
+            "engine": type(self.pipeline).__name__,
+            "score_table_loaded": self.table is not None,
+            "calibration": self.calibration.method,
+            "operating_points": list(self.calibration.operating_points),
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "loaded_at": self.loaded_at,
+        }
+
+# 🔑 ÉTAT DU MODÈLE : chargé en arrière-plan par load_artifacts() (cf. lifespan), pas à l'import.
+# Le port est ainsi ouvert immédiatement (/health/live répond) pendant le chargement et la chauffe.
+# previous_model reste en mémoire après une bascule : le retour arrière est immédiat.
+served_model: Optional[ServedModel] = None
+previous_model: Optional[ServedModel] = None
+model_registry = ModelRegistry(MODEL_REGISTRY_DIR)
+
+# Prêt = modèle chargé ET lot de chauffe exécuté (cf. /health/ready)
+service_ready = threading.Event()
+startup_state = {"status": "starting", "error": None, "load_seconds": None, "warmup_seconds": None}
+_load_lock = threading.Lock()
+# Une seule bascule (chargement + chauffe + remplacement) à la fois
+_swap_lock = threading.Lock()
+# Dernière désignation du candidat lue dans le registre (cf. watch_registry)
+_candidate_state = {"applied": None}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Chargement + chauffe dans un thread : le serveur accepte les connexions sans attendre leur fin
+    app.state.startup_task = asyncio.create_task(asyncio.to_thread(start_service))
+    inference_scheduler.start()
+    candidate_router.start()
+    if audit_log is not None:
+        audit_log.start()
+    if multiprocess_metrics is not None:
+        multiprocess_metrics.start()
+    watcher = asyncio.create_task(watch_registry()) if MODEL_REGISTRY_POLL_S > 0 else None
+    yield
+    if watcher is not None:
+        watcher.cancel()
+    await candidate_router.stop()
+    await inference_scheduler.stop()
+    # Arrêt propre : les enregistrements d'audit encore en mémoire sont écrits
+    if audit_log is not None:
+        await audit_log.stop()
+    if multiprocess_metrics is not None:
+        await multiprocess_metrics.stop()
 
 # Initialisation de l'API (l'objet 'app' est ce que Gunicorn cherchera)
 app = FastAPI(
     title="API de Prédiction du Diabète",
     description="Service de classification basé sur un modèle RandomForest.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Profilage des requêtes lentes (cf. profiler.py) : désactivé par défaut, activable par PROFILE_SAMPLE_EVERY /
+# PROFILE_SLOW_MS ou par POST /admin/profiling. Ajouté avant MetricsMiddleware, il s'exécute à l'intérieur
+# et relève les durées des étapes.
+request_profiler = profiler_from_env()
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
+# Compteurs par statut, latences et requêtes en cours, exposés par GET /metrics (cf. metrics.py).
+# Avec METRICS_MULTIPROC_DIR (positionné par gunicorn_conf.py), /metrics additionne les séries de tous les workers.
+app.add_middleware(MetricsMiddleware)
+multiprocess_metrics = multiprocess_from_env()
+
 # --- Définition du Schéma de Données (Pydantic) ---
 
-# Pydantic garantit que les données reçues correspondent à ce format.
-class PatientFeatures(BaseModel):
-    age: int
-    gender: int
-    polyuria: int
-    polydipsia: int
-    sudden_weight_loss: int
-    weakness: int
-    polyphagia: int
-    genital_thrush: int
-    visual_blurring: int
-    itching: int
-    irritability: int
-    delayed_healing: int
-    partial_paresis: int
-    muscle_stiffness: int
-    alopecia: int
-    obesity: int
+# Pydantic garantit que les données reçues correspondent à ce format. Le modèle est généré depuis le schéma
+# déclaratif partagé avec l'entraînement et le scoring par lots (cf. feature_schema.py) : bornes (âge 0-150,
+# caractéristiques binaires 0/1), descriptions et ordre des colonnes identiques partout.
+PatientFeatures = patient_model("PatientFeatures")
+
+# Cache des réponses de /predict (LRU + TTL, cf. cache.py), invalidé si le modèle change
+prediction_cache = cache_from_env()
+
+# Journal d'audit de chaque prédiction (tampon en mémoire, écrit par lots en JSONL, cf. audit.py) ; AUDIT_DIR="" le désactive
+audit_log = audit_from_env()
+
+# --- Fonctions utilitaires ---
+
+def format_prediction(probability: float, threshold: float = 0.5,
+                      operating_point: str = DEFAULT_OPERATING_POINT) -> dict:
+    """
+    Construit la réponse JSON à partir de la probabilité positive du point de fonctionnement (score brut pour
+    "default", probabilité calibrée sinon) et de son seuil.
+    """
+    decision = "Positive" if probability >= threshold else "Negative"
+    return {
+        "prediction": decision,
+        "probability_positive": round(probability, 4),
+        "operating_point": operating_point,
+        "threshold": threshold,
+    }
+
+def decision_threshold(model: ServedModel, operating_point: Optional[str]) -> float:
+    """
+    Seuil du point de fonctionnement demandé (paramètre operating_point) ; 422 s'il n'existe pas pour ce modèle.
+    """
+    try:
+        return model.calibration.threshold(operating_point)
+    except KeyError:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Point de fonctionnement inconnu: {operating_point!r} (disponibles: {list(model.calibration.operating_points)})"
+        )
+
+def operating_point_scores(X: np.ndarray, model: ServedModel, operating_point: Optional[str] = None) -> np.ndarray:
+    """
+    Probabilité positive de chaque ligne de X au point de fonctionnement : score du modèle, puis table de
+    calibration sauf pour "default" (vectorisé).
+    """
+    return model.calibration.probabilities(score_matrix(X, model), operating_point)
+
+def predict_positive(X: np.ndarray, model: Optional[ServedModel] = None) -> np.ndarray:
+    """
+    Probabilité positive de chaque ligne de X (matrice float64 dans l'ordre d'entraînement),
+    calculée par `model` (par défaut le modèle servi).
+    """
+    return (model or served_model).pipeline.predict_proba(X)[:, 1]
+
+def patients_matrix(patients: List[PatientFeatures]) -> np.ndarray:
+    """
+    Matrice float64 (n, 16) des patients, dans l'ordre d'entraînement.
+    """
+    return np.array([[getattr(p, c) for c in FEATURE_COLUMNS] for p in patients], dtype=np.float64)
+
+def score_patients(patients: List[PatientFeatures], model: ServedModel) -> np.ndarray:
+    """
+    Calcule la probabilité positive de plusieurs patients en un seul appel vectorisé à predict_proba.
+    """
+    return score_matrix(patients_matrix(patients), model)
+
+def score_matrix(X: np.ndarray, model: ServedModel) -> np.ndarray:
+    """
+    Probabilité positive de chaque ligne de X : lignes couvertes par la table de scores servies
+    directement depuis la table, les autres par le modèle (un seul appel vectorisé).
+    """
+    if model.table is None:
+        return predict_positive(X, model)
+
+    scores, covered = model.table.lookup(X)
+    if not covered.all():
+        scores[~covered] = predict_positive(X[~covered], model)
+    return scores
+
+def predict_rows(rows: List[Any], endpoint: str = "/predict/batch", operating_point: Optional[str] = None) -> dict:
+    """
+    Valide chaque ligne indépendamment, score toutes les lignes valides en une fois
+    et renvoie les résultats dans l'ordre d'entrée (avec l'erreur de validation pour les lignes invalides).
+    """
+    model = served_model
+    if model is None:
+        raise HTTPException(status_code=503, detail="Service non disponible: Modèle de prédiction non chargé.")
+    threshold = decision_threshold(model, operating_point)
+    operating_point = operating_point or DEFAULT_OPERATING_POINT
+    if len(rows) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lot trop volumineux: {len(rows)} lignes (maximum {MAX_BATCH_SIZE})."
+        )
+
+    started = time.perf_counter()
+    results: List[dict] = [None] * len(rows)
+    valid_index: List[int] = []
+    valid_patients: List[PatientFeatures] = []
+
+    # 1. Validation ligne par ligne (une ligne invalide ne fait pas échouer tout le lot)
+    for i, row in enumerate(rows):
+        try:
+            valid_patients.append(PatientFeatures.model_validate(row))
+            valid_index.append(i)
+        except ValidationError as e:
+            results[i] = {"index": i, "error": e.errors(include_url=False)}
+
+    # 2. Prédiction vectorisée de toutes les lignes valides
+    if valid_patients:
+        try:
+            scores = score_patients(valid_patients, model)
+            probabilities = model.calibration.probabilities(scores, operating_point)
+        except Exception as e:
+            print(f"Erreur de prédiction (lot): {e}")
+            raise HTTPException(status_code=500, detail=f"Erreur interne de prédiction: {type(e).__name__}: {str(e)}")
+        latency_ms = (time.perf_counter() - started) * 1000
+        for i, patient, score, probability in zip(valid_index, valid_patients, scores, probabilities):
+            results[i] = {"index": i, **format_prediction(float(probability), threshold, operating_point)}
+            if audit_log is not None:
+                audit_log.record_prediction(endpoint, [getattr(patient, c) for c in FEATURE_COLUMNS], score,
+                                            results[i]["prediction"], model.sha256, latency_ms, "batch",
+                                            model.version, operating_point)
+        PREDICTIONS.labels(model.version, "batch").inc(len(valid_patients))
+
+    return {
+        "model_version": model.version,
+        "n_rows": len(rows),
+        "n_errors": len(rows) - len(valid_patients),
+        "results": results,
+    }
+
+# Ordonnanceur de /predict (cf. scheduler.py) : les requêtes concurrentes sont regroupées en un seul
+# predict_proba vectorisé, exécuté dans un pool de threads borné ; file pleine -> 429.
+# Il ne voit que les patients absents de la table de scores (table manquante ou non couvrante).
+inference_scheduler = scheduler_from_env(predict_positive)
+
+def under_pressure() -> bool:
+    """
+    Service chargé : les comparaisons au modèle candidat sont abandonnées pour ne pas lui prendre de CPU.
+    """
+    return (inference_scheduler.queue_depth > CANDIDATE_SHED_QUEUE_DEPTH
+            or IN_FLIGHT.labels().value > CANDIDATE_SHED_IN_FLIGHT)
+
+# Modèle candidat évalué sur le trafic réel (cf. candidate.py) : canary (une part des patients servie par le
+# candidat) ou shadow (copie de chaque requête scorée en arrière-plan)
+candidate_router = candidate_from_env(score_matrix, under_pressure,
+                                      lambda scores, model: model.calibration.decide(scores))
+
+# --- Chargement et chauffe du modèle ---
+
+def build_model(model_path: str, artifact_path: Optional[str], table_path: Optional[str],
+                version: Optional[str] = None) -> ServedModel:
+    """
+    Charge un modèle (artefact NumPy ou pickle) et sa table de scores, et vérifie l'ordre des colonnes.
+    Lève FileNotFoundError (modèle absent) ou ValueError (colonnes). Sans version (hors registre),
+    le début de l'empreinte du pickle sert de version.
+    """
+    start = time.perf_counter()
+    # Charger le pipeline complet (préprocesseur + modèle), ou son artefact NumPy
+    pipeline, sha256 = load_model(model_path, artifact_path)
+    print(f"Modèle chargé avec succès depuis {model_path} ({type(pipeline).__name__})")
+
+    # Vérification unique de l'ordre des colonnes : les prédictions reçoivent ensuite
+    # directement des tableaux NumPy, sans DataFrame ni contrôle des noms de colonnes à chaque appel.
+    pipeline.check_feature_order(FEATURE_COLUMNS)
+
+    table = None
+    if table_path and os.path.exists(table_path):
+        table = ScoreTable.load(table_path)
+        # La table n'est utilisée que si elle a été compilée à partir de ce fichier modèle exact
+        if table.model_sha256 != sha256:
+            print(f"ATTENTION: {table_path} ne correspond pas à {model_path}, table ignorée (relancez score_table.py).")
+            table = None
+        elif table.feature_columns != FEATURE_COLUMNS:
+            print("ATTENTION: ordre des colonnes de la table de scores différent du schéma, table ignorée.")
+            table = None
+        else:
+            print(f"Table de scores chargée depuis {table_path} ({table.nbytes // 1024} Ko)")
+
+    return ServedModel(pipeline, sha256, table, version or sha256[:12], round(time.perf_counter() - start, 4))
+
+def build_registry_model(version: str) -> ServedModel:
+    """
+    Charge une version du registre après avoir revérifié les empreintes de ses fichiers (RegistryError sinon).
+    """
+    entry = model_registry.get(version)
+    entry.verify()
+    return build_model(entry.model_path, entry.artifact_path, entry.table_path, entry.version)
+
+def install_model(model: ServedModel) -> Optional[ServedModel]:
+    """
+    Remplace le modèle servi (une seule affectation) et renvoie l'ancien. Les requêtes en cours terminent
+    avec le modèle qu'elles ont lu ; les suivantes utilisent le nouveau.
+    """
+    global served_model, previous_model
+    old = served_model
+    # Cache des réponses invalidé si le modèle change
+    prediction_cache.bind_model(model.sha256)
+    served_model = model
+    if old is not None and old is not model:
+        previous_model = old
+        MODEL_SWAPS.inc()
+    set_model(model.version, model.sha256, type(model.pipeline).__name__, model.load_seconds)
+    return old
+
+def load_artifacts() -> None:
+    """
+    Charge le modèle de démarrage : version active du registre s'il y en a une, sinon MODEL_PATH.
+    Idempotent : sous Gunicorn, le maître l'appelle à l'import de ce module, avant le fork (API_PRELOAD_ARTIFACTS,
+    cf. gunicorn_conf.py), et les workers héritent du modèle déjà chargé.
+    """
+    with _load_lock:
+        if startup_state["load_seconds"] is not None:
+            return
+        startup_state["status"] = "loading"
+        current = model_registry.current()
+        try:
+            if current is not None:
+                model = build_registry_model(current)
+            else:
+                model = build_model(MODEL_PATH, MODEL_ARTIFACT_PATH, SCORE_TABLE_PATH)
+        except FileNotFoundError:
+            print(f"ERREUR: Le fichier modèle {MODEL_PATH} est introuvable. Assurez-vous de le placer dans le répertoire de l'API.")
+            # Le service reste joignable (/health/live) mais n'est jamais prêt, et /predict renvoie une erreur 503.
+            startup_state.update(status="error", error="model not loaded")
+            return
+        except (ValueError, RegistryError) as e:
+            print(f"ERREUR: {e}")
+            startup_state.update(status="error", error=str(e))
+            return
+
+        install_model(model)
+        startup_state.update(status="loaded", load_seconds=model.load_seconds)
+
+def warm_up(model: ServedModel, n_rows: int = WARMUP_ROWS) -> float:
+    """
+    Exécute un lot de patients synthétiques sur les chemins de prédiction (ligne seule, lot, table de scores)
+    pour que les allocations du premier appel ne soient pas payées par un utilisateur. Renvoie sa durée.
+    """
+    start = time.perf_counter()
+    if n_rows > 0:
+        rng = np.random.default_rng(0)
+        X = np.column_stack([
+            rng.integers(20, 80, n_rows),
+            rng.integers(0, 2, (n_rows, len(FEATURE_COLUMNS) - 1)),
+        ]).astype(np.float64)
+        predict_positive(X, model)
+        predict_positive(X[:1], model)
+        if model.table is not None:
+            model.table.lookup(X)
+    model.warmup_seconds = round(time.perf_counter() - start, 4)
+    MODEL_WARMUP_SECONDS.set(model.warmup_seconds)
+    return model.warmup_seconds
+
+def start_service() -> None:
+    """
+    Chargement puis chauffe (exécutés dans un thread par le lifespan) ; le service n'est déclaré prêt qu'à la fin.
+    """
+    try:
+        load_artifacts()
+        if served_model is None:
+            return
+        startup_state["warmup_seconds"] = warm_up(served_model)
+    except Exception as e:
+        print(f"ERREUR au démarrage: {type(e).__name__}: {e}")
+        startup_state.update(status="error", error=f"{type(e).__name__}: {e}")
+        return
+    startup_state["status"] = "ready"
+    service_ready.set()
+    print(f"Service prêt (chargement {startup_state['load_seconds']}s, chauffe {startup_state['warmup_seconds']}s)")
+    # Candidat désigné dans le registre : chargé après l'ouverture du service, qui n'a pas à l'attendre
+    designated = model_registry.candidate()
+    _candidate_state["applied"] = designated
+    if designated is not None:
+        try:
+            set_candidate(**designated)
+        except (FileNotFoundError, ValueError, TypeError, RegistryError) as e:
+            print(f"ERREUR: candidat {designated} non chargé: {e}")
+
+# --- Bascule à chaud du modèle (registre) ---
+
+def activate_version(version: str) -> ServedModel:
+    """
+    Charge et chauffe une version du registre en arrière-plan (le modèle en place continue de servir),
+    puis la bascule. Sans effet si elle est déjà servie.
+    """
+    with _swap_lock:
+        if served_model is not None and served_model.version == version:
+            return served_model
+        candidate = candidate_router.candidate
+        if candidate is not None and candidate.version == version:
+            # Promotion du candidat : déjà chargé et chauffé
+            model = candidate
+            candidate_router.clear()
+        elif previous_model is not None and previous_model.version == version:
+            # Retour au modèle précédent, resté chargé et chauffé en mémoire
+            model = previous_model
+        else:
+            model = build_registry_model(version)
+            warm_up(model)
+        install_model(model)
+    print(f"Modèle {version} ({model.sha256[:12]}) en service (chargement {model.load_seconds}s, chauffe {model.warmup_seconds}s)")
+    return model
+
+def rollback_model() -> ServedModel:
+    """
+    Retour à la version précédente de l'historique du registre (cf. ModelRegistry.previous) : immédiat si c'est le
+    modèle précédent resté en mémoire, sinon chargée et chauffée. Des retours arrière successifs remontent
+    l'historique au lieu d'alterner entre deux versions. Registre sans historique : retour au modèle précédent en
+    mémoire.
+    """
+    target = model_registry.previous()
+    if target is not None:
+        model = activate_version(target)
+    elif model_registry.history():
+        raise RegistryError("aucune version précédente dans l'historique")
+    else:
+        with _swap_lock:
+            if previous_model is None:
+                raise RegistryError("aucun modèle précédent en mémoire")
+            model = previous_model
+            install_model(model)
+    print(f"Retour arrière vers le modèle {model.version} ({model.sha256[:12]})")
+    return model
+
+def set_candidate(version: str, mode: str, percent: float = 0.0) -> ServedModel:
+    """
+    Désigne le modèle candidat (chargé et chauffé dans le thread appelant s'il ne l'est pas déjà).
+    """
+    if mode not in CANDIDATE_MODES:
+        raise ValueError(f"mode doit valoir {CANDIDATE_MODES}, reçu {mode!r}")
+    if not 0 <= percent <= 100:
+        raise ValueError(f"percent doit être compris entre 0 et 100, reçu {percent}")
+    if served_model is not None and served_model.version == version:
+        raise ValueError(f"la version {version} est déjà servie")
+    loaded = [m for m in (candidate_router.candidate, previous_model) if m is not None and m.version == version]
+    if loaded:
+        model = loaded[0]
+    else:
+        model = build_registry_model(version)
+        warm_up(model)
+    candidate_router.configure(model, mode, percent)
+    prediction_cache.bind_candidate(model.sha256)
+    print(f"Modèle candidat {version} ({model.sha256[:12]}) en {mode}{f' ({percent:g} %)' if mode == 'canary' else ''}")
+    return model
+
+async def watch_registry() -> None:
+    """
+    Bascule sur la version désignée par CURRENT dès qu'elle change (publication ou retour arrière par
+    registry.py, ou activation faite par un autre worker), et suit de même le candidat désigné (CANDIDATE).
+    """
+    while True:
+        await asyncio.sleep(MODEL_REGISTRY_POLL_S)
+        if not service_ready.is_set():
+            continue
+        current = model_registry.current()
+        if current is not None and served_model is not None and current != served_model.version:
+            try:
+                # Modèle précédent ou candidat déjà en mémoire : réutilisé sans rechargement (cf. activate_version)
+                await asyncio.to_thread(activate_version, current)
+            except (FileNotFoundError, ValueError, RegistryError) as e:
+                # Le modèle en place continue de servir ; nouvel essai au prochain passage
+                print(f"ERREUR: bascule vers la version {current} impossible: {e}")
+
+        designated = model_registry.candidate()
+        if designated is None:
+            _candidate_state["applied"] = None
+            if candidate_router.active:
+                candidate_router.clear()
+                prediction_cache.bind_candidate(None)
+        elif designated != _candidate_state["applied"]:
+            # Chaque désignation n'est tentée qu'une fois (pas de rechargement en boucle si elle échoue)
+            _candidate_state["applied"] = designated
+            try:
+                await asyncio.to_thread(set_candidate, **designated)
+            except (FileNotFoundError, ValueError, TypeError, RegistryError) as e:
+                print(f"ERREUR: candidat {designated} non chargé: {e}")
 
 # --- Définition des Endpoints ---
 
 @app.get("/health", tags=["Health Check"])
 def health_check():
     """
-    Endpoint de santé pour vérifier si le service est opérationnel.
+    Endpoint de santé pour vérifier si le service est opérationnel (résumé, toujours en 200).
+    """
+    if service_ready.is_set():
+        status = "ok"
+    elif startup_state["status"] == "error":
+        status = f"error - {startup_state['error']}"
+    else:
+        status = startup_state["status"]
+    return {
+        "status": status,
+        "ready": service_ready.is_set(),
+        "model_loaded": served_model is not None,
+        "model_version": served_model.version if served_model is not None else None,
+        "score_table_loaded": served_model is not None and served_model.table is not None,
+    }
+
+@app.get("/health/live", tags=["Health Check"])
+def liveness():
+    """
+    Liveness : le processus répond. Disponible dès l'ouverture du port, avant le chargement du modèle.
     """
-    status = "ok" if model_pipeline else "error - model not loaded"
-    return {"status": status, "model_loaded": model_pipeline is not None}
+    return {"status": "alive"}
+
+@app.get("/health/ready", tags=["Health Check"])
+def readiness():
+    """
+    Readiness : 200 uniquement quand le modèle est chargé et chauffé, 503 sinon (chargement en cours ou échec).
+    """
+    body = {"ready": service_ready.is_set(), **startup_state}
+    return JSONResponse(content=body, status_code=200 if service_ready.is_set() else 503)
+
+@app.get("/cache/stats", tags=["Health Check"])
+def cache_stats():
+    """
+    Statistiques du cache de prédictions (taille, hits, misses, évictions, expirations), globales et par modèle.
+    """
+    return prediction_cache.stats()
+
+@app.get("/audit/stats", tags=["Health Check"])
+def audit_stats():
+    """
+    État du journal d'audit : enregistrements en mémoire, écrits, perdus (tampon plein ou erreur d'écriture).
+    """
+    return audit_log.stats() if audit_log is not None else {"enabled": False}
+
+@app.get("/model/info", tags=["Health Check"])
+def model_info():
+    """
+    Modèle servi : version, moteur d'inférence, empreinte, ordre des colonnes et métadonnées de sélection
+    (famille, hyperparamètres, ROC-AUC, profil de latence mesuré par train.py).
+    """
+    model = served_model
+    if model is None:
+        raise HTTPException(status_code=503, detail="Service non disponible: Modèle de prédiction non chargé.")
+    return {
+        **model.describe(),
+        "feature_columns": FEATURE_COLUMNS,
+        "metadata": model.pipeline.metadata,
+    }
+
+@app.get("/metrics", tags=["Health Check"])
+def prometheus_metrics():
+    """
+    Métriques au format texte Prometheus (requêtes, latences par étape, modèle servi), tous workers confondus
+    si METRICS_MULTIPROC_DIR est défini.
+    """
+    content = multiprocess_metrics.render() if multiprocess_metrics is not None else REGISTRY.render()
+    return Response(content, media_type=CONTENT_TYPE)
+
+def check_admin(request: Request) -> None:
+    if ADMIN_TOKEN and request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Jeton d'administration invalide.")
+
+class ProfilingSettings(BaseModel):
+    sample_every_n: Optional[int] = None
+    slow_ms: Optional[float] = None
+    interval_ms: Optional[float] = None
+
+@app.get("/admin/profiling", tags=["Admin"])
+def get_profiling(request: Request):
+    """
+    Configuration du profilage des requêtes et nombre de profils écrits.
+    """
+    check_admin(request)
+    return request_profiler.settings()
+
+@app.post("/admin/profiling", tags=["Admin"])
+def set_profiling(settings: ProfilingSettings, request: Request):
+    """
+    Active ou désactive le profilage : une requête sur sample_every_n et/ou celles plus lentes que slow_ms (0 = désactivé).
+    """
+    check_admin(request)
+    request_profiler.configure(settings.sample_every_n, settings.slow_ms, settings.interval_ms)
+    return request_profiler.settings()
+
+@app.get("/admin/models", tags=["Admin"])
+def list_models(request: Request):
+    """
+    Versions publiées dans le registre, version désignée par CURRENT, modèles servi et précédent (en mémoire).
+    """
+    check_admin(request)
+    return {
+        "registry": os.path.abspath(MODEL_REGISTRY_DIR),
+        "versions": model_registry.versions(),
+        "current": model_registry.current(),
+        "served": served_model.describe() if served_model is not None else None,
+        "previous": previous_model.describe() if previous_model is not None else None,
+    }
+
+@app.post("/admin/models/rollback", tags=["Admin"])
+async def rollback_model_endpoint(request: Request):
+    """
+    Retour à la version précédente de l'historique (immédiat si elle est restée chargée en mémoire) ; CURRENT est
+    mis à jour pour les autres workers.
+    """
+    check_admin(request)
+    try:
+        model = await asyncio.to_thread(rollback_model)
+    except RegistryError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except (FileNotFoundError, ValueError) as e:
+        raise HTTPException(status_code=409, detail=f"{type(e).__name__}: {e}")
+    if model.version in model_registry.versions():
+        model_registry.activate(model.version, rollback=True)
+    return model.describe()
+
+@app.post("/admin/models/{version}/activate", tags=["Admin"])
+async def activate_model(version: str, request: Request):
+    """
+    Charge, vérifie (empreintes du manifeste) et chauffe une version du registre dans un thread, puis la bascule
+    sans interrompre les requêtes en cours ; CURRENT est mis à jour pour les autres workers.
+    """
+    check_admin(request)
+    if version not in model_registry.versions():
+        raise HTTPException(status_code=404, detail=f"Version inconnue dans {MODEL_REGISTRY_DIR}: {version}")
+    try:
+        model = await asyncio.to_thread(activate_version, version)
+    except RegistryError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except (FileNotFoundError, ValueError) as e:
+        raise HTTPException(status_code=409, detail=f"{type(e).__name__}: {e}")
+    model_registry.activate(version)
+    return model.describe()
+
+class CandidateSettings(BaseModel):
+    version: str
+    mode: str = "shadow"
+    percent: float = 0.0
+
+@app.get("/admin/candidate", tags=["Admin"])
+def candidate_stats(request: Request):
+    """
+    Candidat évalué et comparaison au modèle servi : accord des décisions, écarts de probabilité,
+    durées de calcul par modèle et rôle, comparaisons abandonnées (file pleine, service sous pression).
+    """
+    check_admin(request)
+    return {"served_version": served_model.version if served_model is not None else None,
+            **candidate_router.stats()}
+
+@app.post("/admin/candidate", tags=["Admin"])
+async def set_candidate_endpoint(settings: CandidateSettings, request: Request):
+    """
+    Désigne une version du registre comme candidate : "shadow" (copie de chaque requête scorée en arrière-plan)
+    ou "canary" (percent % des patients servis par le candidat). Appliqué aux autres workers via le registre.
+    """
+    check_admin(request)
+    if settings.version not in model_registry.versions():
+        raise HTTPException(status_code=404, detail=f"Version inconnue dans {MODEL_REGISTRY_DIR}: {settings.version}")
+    designated = settings.model_dump()
+    try:
+        await asyncio.to_thread(set_candidate, **designated)
+    except (FileNotFoundError, ValueError, RegistryError) as e:
+        raise HTTPException(status_code=409, detail=f"{type(e).__name__}: {e}")
+    model_registry.set_candidate(**designated)
+    _candidate_state["applied"] = designated
+    return candidate_router.stats()
+
+@app.delete("/admin/candidate", tags=["Admin"])
+def clear_candidate(request: Request):
+    """
+    Arrête l'évaluation du candidat (tout le trafic revient au modèle servi).
+    """
+    check_admin(request)
+    model_registry.clear_candidate()
+    _candidate_state["applied"] = None
+    candidate_router.clear()
+    prediction_cache.bind_candidate(None)
+    return candidate_router.stats()
+
+@app.get("/scheduler/stats", tags=["Health Check"])
+def scheduler_stats():
+    """
+    Statistiques de l'ordonnanceur d'inférence (profondeur de file, lots, taille moyenne des lots, rejets).
+    """
+    return inference_scheduler.stats()
 
 @app.post("/predict", tags=["Prediction"])
-def predict_diabete(patient: PatientFeatures):
+async def predict_diabete(patient: PatientFeatures, operating_point: Optional[str] = None):
     """
     Reçoit les caractéristiques d'un patient et renvoie la prédiction de diabète.
+    operating_point (paramètre de requête) : default (score brut >= 0.5) ou, avec la calibration, calibrated,
+    balanced, high_sensitivity, high_specificity (seuils calculés à l'entraînement, cf. calibration.py et /model/info).
     """
-    # Vérification du modèle
-    if model_pipeline is None:
+    # Chronométrage par étape (cf. metrics.py) : la validation pydantic a déjà eu lieu
+    timer = current_timer()
+    if timer is not None:
+        timer.mark("parse")
+    started = timer.started if timer is not None else time.perf_counter()
+
+    # Vérification du modèle : la requête est servie de bout en bout par le modèle lu ici, même si une
+    # bascule a lieu pendant son traitement
+    model = served_model
+    if model is None:
         raise HTTPException(status_code=503, detail="Service non disponible: Modèle de prédiction non chargé.")
+    decision_threshold(model, operating_point)
+    operating_point = operating_point or DEFAULT_OPERATING_POINT
 
     try:
-        # 1. Conversion des données Pydantic en DataFrame (format attendu par le pipeline)
-        data = patient.model_dump()
-        input_df = pd.DataFrame([data])
-        
-        # 2. Prédiction de probabilité
-        # La prédiction est maintenant rapide car le modèle est déjà en mémoire.
-        proba = model_pipeline.predict_proba(input_df)[:, 1][0]
-        score = float(proba)
-        
-        # 3. Décision (Seuil de 0.5)
-        decision = "Positive" if score >= 0.5 else "Negative"
+        values = [getattr(patient, c) for c in FEATURE_COLUMNS]
+        binary_values = values[1:]
+
+        # Modèle candidat (cf. candidate.py) : en canary, une part des patients est servie par le candidat ;
+        # `other` est le modèle qui scorera une copie de la requête en arrière-plan
+        candidate = candidate_router.candidate
+        other, role = None, "primary"
+        if candidate is not None:
+            # Le candidat ne sert que les points de fonctionnement qu'il connaît
+            if operating_point in candidate.calibration.operating_points and candidate_router.routes(values):
+                model, other, role = candidate, model, "canary"
+            elif candidate_router.mode == "shadow":
+                other = candidate
+            inference_started = time.perf_counter()
+
+        # 0. Réponse déjà calculée pour ce patient (clé = encodage binaire des 16 caractéristiques)
+        key = feature_key(patient.age, binary_values) if prediction_cache.enabled else None
+        score = await prediction_cache.aget(key, model.sha256) if key is not None else None
+        from_cache = score is not None
+        source = "cache"
+        if timer is not None:
+            timer.mark("feature_build")
+
+        # 1. Lecture directe dans la table de scores (O(1)) si le patient est dans le domaine couvert
+        if score is None and model.table is not None:
+            score = model.table.lookup_one(patient.age, binary_values)
+            if score is not None:
+                source = "table"
+
+        if score is None:
+            # 2. Sinon : la ligne est mise en file et scorée avec les autres requêtes reçues dans la même
+            # fenêtre, hors de la boucle d'événements (pool de threads de l'ordonnanceur)
+            score = await inference_scheduler.submit(values, model)
+            source = "model"
+
+        if key is not None and not from_cache:
+            await prediction_cache.aset(key, score, model.sha256)
+        if candidate is not None:
+            candidate_router.observe(model, role, time.perf_counter() - inference_started)
+            if other is not None:
+                candidate_router.mirror(values, score, model, other)
+        if timer is not None:
+            timer.mark("inference")
         
-        # 4. Retour du résultat
+        # 3. Décision (score brut, ou probabilité calibrée si le point de fonctionnement le demande, comparé à
+        # son seuil) et 4. Retour du résultat
+        calibration = model.calibration
+        prediction = format_prediction(calibration.probability(score, operating_point),
+                                       calibration.threshold(operating_point), operating_point)
+        if audit_log is not None:
+            audit_log.record_prediction("/predict", values, score, prediction["prediction"], model.sha256,
+                                        (time.perf_counter() - started) * 1000, source, model.version,
+                                        operating_point)
+        PREDICTIONS.labels(model.version, source).inc()
         return {
-            "prediction": decision,
-            "probability_positive": round(score, 4),
+            **prediction,
+            "model_version": model.version,
             "comment": "Résultat stable et reproductible car le modèle est fixe."
         }
-        
+
+    except QueueFullError as e:
+        # Saturation : on rejette immédiatement plutôt que de laisser la latence grandir
+        raise HTTPException(status_code=429, detail=f"Service saturé: {e}", headers={"Retry-After": "1"})
+    except SchedulerNotRunningError as e:
+        raise HTTPException(status_code=503, detail=f"Service non disponible: {e}")
     except Exception as e:
         # Gérer les erreurs inattendues
         print(f"Erreur de prédiction: {e}")
-        raise HTTPException(status_code=500, detail=f"Erreur interne de prédiction: {type(e).__name__}: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Erreur interne de prédiction: {type(e).__name__}: {str(e)}")
+
+@app.post("/predict/batch", tags=["Prediction"])
+def predict_batch(patients: List[Dict[str, Any]], operating_point: Optional[str] = None):
+    """
+    Reçoit une liste de patients (même format que /predict) et renvoie les prédictions dans l'ordre d'entrée.
+    Les lignes invalides sont signalées individuellement sans bloquer le reste du lot.
+    """
+    return predict_rows(patients, operating_point=operating_point)
+
+@app.post("/predict/batch/columnar", tags=["Prediction"])
+def predict_batch_columnar(columns: Dict[str, List[Any]], operating_point: Optional[str] = None):
+    """
+    Variante colonnaire de /predict/batch : un tableau par caractéristique, tous de la même longueur.
+    Exemple : {"age": [30, 55], "gender": [1, 0], ...}
+    """
+    missing = [c for c in FEATURE_COLUMNS if c not in columns]
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Colonnes manquantes: {missing}")
+    lengths = {len(columns[c]) for c in FEATURE_COLUMNS}
+    if len(lengths) > 1:
+        raise HTTPException(status_code=422, detail="Toutes les colonnes doivent avoir la même longueur.")
+
+    n_rows = lengths.pop()
+    if n_rows > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lot trop volumineux: {n_rows} lignes (maximum {MAX_BATCH_SIZE})."
+        )
+    rows = [{c: columns[c][i] for c in FEATURE_COLUMNS} for i in range(n_rows)]
+    return predict_rows(rows, "/predict/batch/columnar", operating_point)
+
+@app.post("/predict/csv", tags=["Prediction"])
+async def predict_csv(request: Request, operating_point: Optional[str] = None):
+    """
+    Score un fichier CSV de cohorte envoyé brut dans le corps de la requête (Content-Type: text/csv),
+    au format de data/test_without_class.csv (Yes/No, Male/Female) ou déjà encodé (0/1).
+    Le fichier est lu et scoré par blocs de CSV_CHUNK_ROWS lignes ; la réponse "ID,class,probability"
+    est renvoyée en flux (chunked) au fur et à mesure. probability est calibrée ; class suit le seuil du
+    paramètre operating_point.
+    Exemple : curl -X POST --data-binary @data/test_without_class.csv -H 'Content-Type: text/csv' .../predict/csv
+    """
+    model = served_model
+    if model is None:
+        raise HTTPException(status_code=503, detail="Service non disponible: Modèle de prédiction non chargé.")
+
+    threshold = decision_threshold(model, operating_point)
+
+    # Tout le fichier est scoré par le même modèle, même si une bascule a lieu pendant le flux
+    scorer = CohortScorer(functools.partial(operating_point_scores, model=model, operating_point=operating_point),
+                          CSV_CHUNK_ROWS, threshold)
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    chunks = request.stream()
+
+    # 1. Lecture jusqu'à l'en-tête : une erreur de colonnes est renvoyée en 422 avant de commencer la réponse
+    head = ""
+    try:
+        async for chunk in chunks:
+            head += await run_in_threadpool(scorer.feed, decoder.decode(chunk))
+            if scorer.started:
+                break
+        else:
+            head += await run_in_threadpool(scorer.close, decoder.decode(b"", final=True))
+            return StreamingResponse(iter([head]), media_type="text/csv", headers={"X-Model-Version": model.version})
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # 2. Suite du fichier : chaque bloc est scoré dans un thread et renvoyé dès qu'il est prêt
+    async def scored_blocks():
+        yield head
+        async for chunk in chunks:
+            out = await run_in_threadpool(scorer.feed, decoder.decode(chunk))
+            if out:
+                yield out
+        yield await run_in_threadpool(scorer.close, decoder.decode(b"", final=True))
+        print(f"/predict/csv : {scorer.n_rows} lignes scorées, {scorer.n_invalid} invalide(s)")
+
+    return StreamingResponse(scored_blocks(), media_type="text/csv", headers={"X-Model-Version": model.version})
+
+# Préchargement dans le processus maître de Gunicorn (cf. gunicorn_conf.py) : le module est importé une seule fois
+# avant le fork, le lifespan de chaque worker trouve le modèle déjà chargé et ne fait que la chauffe.
+if os.getenv("API_PRELOAD_ARTIFACTS") == "1":
+    load_artifacts()
@@ -0,0 +1,319 @@
+# audit.py
+
+# --- Journal d'audit des prédictions (écriture asynchrone par lots) ---
+#
+# Chaque prédiction (entrées, score brut du modèle avant calibration, décision, point de fonctionnement,
+# empreinte du modèle, latence) est ajoutée à un tampon circulaire en mémoire : record() ne fait aucune
+# entrée/sortie. Une tâche de fond vide le tampon dans des fichiers JSONL toutes les `flush_interval` secondes,
+# ou dès que `flush_rows` enregistrements attendent.
+# L'écriture elle-même se fait dans un thread, hors de la boucle d'événements.
+#
+# Fichiers : <répertoire>/audit-AAAA-MM-JJ-<pid>-NNN.jsonl (un jour UTC par fichier, un fichier par processus
+# pour les workers Gunicorn, nouveau fichier NNN+1 au-delà de max_file_bytes).
+#
+# Tampon plein (disque lent ou bloqué) : la requête n'attend jamais. Selon `drop_policy`, l'enregistrement le
+# plus ancien ("drop_oldest", défaut) ou le nouveau ("drop_newest") est perdu, et compté dans stats()["dropped"].
+# stop() (arrêt propre du service) écrit tout ce qui reste dans le tampon.
+#
+# Rejeu d'une journée contre un autre modèle :
+#   python audit.py replay --day 2026-10-18 --dir audit --model nouveau_modele.pkl --out ecarts.csv
+
+import argparse
+import asyncio
+import collections
+import datetime
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from features import FEATURE_COLUMNS
+
+DROP_POLICIES = ("drop_oldest", "drop_newest")
+
+
+def _day(timestamp: str) -> str:
+    return timestamp[:10]
+
+
+class AuditLog:
+    """
+    Tampon circulaire d'enregistrements d'audit et tâche d'écriture par lots.
+    """
+
+    def __init__(self, directory: str = "audit", capacity: int = 100000, flush_interval: float = 1.0,
+                 flush_rows: int = 1000, max_file_bytes: int = 64 * 1024 * 1024, drop_policy: str = "drop_oldest"):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"drop_policy doit valoir {DROP_POLICIES}, reçu {drop_policy!r}")
+        self.directory = directory
+        self.capacity = max(1, capacity)
+        self.flush_interval = flush_interval
+        self.flush_rows = max(1, flush_rows)
+        self.max_file_bytes = max_file_bytes
+        self.drop_policy = drop_policy
+        self._buffer: collections.deque = collections.deque()
+        self._lock = threading.Lock()
+        # Une seule écriture à la fois (la tâche annulée par stop() peut encore finir son écriture dans son thread)
+        self._write_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._files = {}  # jour -> (chemin, numéro)
+        self.recorded = self.written = self.dropped = self.write_errors = 0
+        self.last_flush: Optional[str] = None
+
+    # --- Production (chemin des requêtes) ---
+
+    def record(self, entry: dict) -> None:
+        """
+        Ajoute un enregistrement au tampon, sans entrée/sortie (utilisable depuis la boucle ou un thread).
+        """
+        # Horodatage brut (float) : la conversion en ISO 8601 est faite à l'écriture, hors du chemin des requêtes
+        entry.setdefault("ts", time.time())
+        with self._lock:
+            self.recorded += 1
+            if len(self._buffer) >= self.capacity:
+                self.dropped += 1
+                if self.drop_policy == "drop_newest":
+                    return
+                self._buffer.popleft()
+            self._buffer.append(entry)
+            wake = len(self._buffer) == self.flush_rows
+        if wake and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._flush_requested.set)
+
+    def record_prediction(self, endpoint: str, values: Iterable, score: float, decision: str, model_sha256: str,
+                          latency_ms: float, source: str, model_version: Optional[str] = None,
+                          operating_point: Optional[str] = None) -> None:
+        self.record({
+            "endpoint": endpoint,
+            "model_version": model_version,
+            "model_sha256": model_sha256,
+            "inputs": dict(zip(FEATURE_COLUMNS, (int(v) for v in values))),
+            "probability": round(float(score), 6),
+            "decision": decision,
+            "operating_point": operating_point,
+            "source": source,
+            "latency_ms": round(latency_ms, 3),
+        })
+
+    # --- Tâche d'écriture ---
+
+    def start(self) -> None:
+        """
+        Démarre la tâche d'écriture (à appeler depuis la boucle asyncio du serveur, ex. lifespan).
+        """
+        self._loop = asyncio.get_running_loop()
+        self._flush_requested = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Arrête la tâche et écrit les enregistrements encore en mémoire.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+        self._loop = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                # Erreur inattendue : la tâche continue (sinon plus rien ne serait écrit jusqu'au redémarrage)
+                print(f"ERREUR: écriture du journal d'audit: {type(e).__name__}: {e}")
+                with self._lock:
+                    self.write_errors += 1
+
+    def flush(self) -> int:
+        """
+        Écrit tout le contenu du tampon (par jour) et renvoie le nombre d'enregistrements écrits.
+        """
+        with self._write_lock:
+            return self._flush()
+
+    def _flush(self) -> int:
+        with self._lock:
+            batch, self._buffer = list(self._buffer), collections.deque()
+        if not batch:
+            return 0
+        by_day = collections.defaultdict(list)
+        invalid = 0
+        for entry in batch:
+            try:
+                if not isinstance(entry["ts"], str):
+                    entry["ts"] = datetime.datetime.fromtimestamp(entry["ts"], datetime.timezone.utc).isoformat(
+                        timespec="microseconds")
+                by_day[_day(entry["ts"])].append(json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+            except (TypeError, ValueError, OverflowError, KeyError) as e:
+                # Enregistrement non sérialisable : écarté seul, le reste du lot est écrit
+                print(f"ERREUR: enregistrement d'audit ignoré: {type(e).__name__}: {e}")
+                invalid += 1
+        n_valid = len(batch) - invalid
+        if invalid:
+            with self._lock:
+                self.dropped += invalid
+            if not n_valid:
+                return 0
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for day, lines in by_day.items():
+                with open(self._file_for(day), "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            # Le service continue ; les enregistrements de ce lot sont perdus et comptés
+            print(f"ERREUR: écriture du journal d'audit dans {self.directory} impossible: {e}")
+            with self._lock:
+                self.write_errors += 1
+                self.dropped += n_valid
+            return 0
+        with self._lock:
+            self.written += n_valid
+            self.last_flush = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+        return n_valid
+
+    def _file_for(self, day: str) -> str:
+        path, number = self._files.get(day, (None, 0))
+        while path is None or (os.path.exists(path) and os.path.getsize(path) >= self.max_file_bytes):
+            number += 1
+            path = os.path.join(self.directory, f"audit-{day}-{os.getpid()}-{number:03d}.jsonl")
+        self._files[day] = (path, number)
+        return path
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self._task is not None and not self._task.done(),
+                "directory": os.path.abspath(self.directory),
+                "buffered": len(self._buffer),
+                "capacity": self.capacity,
+                "drop_policy": self.drop_policy,
+                "recorded": self.recorded,
+                "written": self.written,
+                "dropped": self.dropped,
+                "write_errors": self.write_errors,
+                "last_flush": self.last_flush,
+            }
+
+
+def audit_from_env() -> Optional[AuditLog]:
+    """
+    AUDIT_DIR (vide = journal désactivé), AUDIT_BUFFER_SIZE, AUDIT_FLUSH_INTERVAL_S, AUDIT_FLUSH_ROWS,
+    AUDIT_MAX_FILE_MB, AUDIT_DROP_POLICY.
+    """
+    directory = os.getenv("AUDIT_DIR", "audit")
+    if not directory:
+        return None
+    return AuditLog(
+        directory=directory,
+        capacity=int(os.getenv("AUDIT_BUFFER_SIZE", "100000")),
+        flush_interval=float(os.getenv("AUDIT_FLUSH_INTERVAL_S", "1")),
+        flush_rows=int(os.getenv("AUDIT_FLUSH_ROWS", "1000")),
+        max_file_bytes=int(float(os.getenv("AUDIT_MAX_FILE_MB", "64")) * 1024 * 1024),
+        drop_policy=os.getenv("AUDIT_DROP_POLICY", "drop_oldest"),
+    )
+
+
+# --- Rejeu ---
+
+def read_day(directory: str, day: str) -> List[dict]:
+    """
+    Tous les enregistrements d'une journée (tous processus et fichiers confondus), dans l'ordre chronologique.
+    """
+    records = []
+    for path in sorted(glob.glob(os.path.join(directory, f"audit-{day}-*.jsonl"))):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+    records.sort(key=lambda r: r["ts"])
+    return records
+
+
+def replay(records: List[dict], model) -> dict:
+    """
+    Re-score tous les enregistrements en un seul appel vectorisé et compare aux scores journalisés (bruts) ;
+    la nouvelle décision applique le point de fonctionnement de chaque requête (score brut pour "default",
+    calibration du modèle sinon).
+    """
+    from calibration import DEFAULT_OPERATING_POINT, Calibration
+
+    X = np.array([[r["inputs"][c] for c in FEATURE_COLUMNS] for r in records], dtype=np.float64)
+    logged = np.array([r["probability"] for r in records], dtype=np.float64)
+    new = model.predict_proba(X)[:, 1] if len(X) else np.empty(0)
+    calibration = Calibration.from_metadata(getattr(model, "metadata", None))
+    # Point de fonctionnement inconnu du nouveau modèle (ou absent des anciens journaux) : celui par défaut
+    points = np.array([r.get("operating_point") if r.get("operating_point") in calibration.operating_points
+                       else DEFAULT_OPERATING_POINT for r in records], dtype=object)
+    new_positive = np.zeros(len(records), dtype=bool)
+    for point in set(points):
+        selected = points == point
+        new_positive[selected] = calibration.decide(new[selected], point)
+    logged_positive = np.array([r["decision"] == "Positive" for r in records], dtype=bool)
+    changed = logged_positive != new_positive
+    return {
+        "n_records": len(records),
+        "models": sorted({r["model_sha256"] or "" for r in records}),
+        "mean_abs_diff": round(float(np.abs(new - logged).mean()), 6) if len(X) else None,
+        "max_abs_diff": round(float(np.abs(new - logged).max()), 6) if len(X) else None,
+        "decisions_changed": int(changed.sum()),
+        "new_probability": new,
+        "changed": changed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Journal d'audit des prédictions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_replay = sub.add_parser("replay", help="Re-score une journée du journal avec un modèle")
+    p_replay.add_argument("--day", default=datetime.date.today().isoformat(), help="AAAA-MM-JJ (UTC)")
+    p_replay.add_argument("--dir", default="audit")
+    p_replay.add_argument("--model", default="modele_diabete_XX.pkl")
+    p_replay.add_argument("--artifact", default=None, help="Artefact NumPy du modèle (cf. forest_engine.py)")
+    p_replay.add_argument("--out", help="CSV des décisions modifiées (ts, entrées, ancienne et nouvelle probabilité)")
+    args = parser.parse_args()
+
+    from forest_engine import load_model
+
+    start = time.perf_counter()
+    records = read_day(args.dir, args.day)
+    if not records:
+        raise SystemExit(f"Aucun enregistrement pour le {args.day} dans {args.dir}.")
+    model, model_sha256 = load_model(args.model, args.artifact)
+    result = replay(records, model)
+    elapsed = time.perf_counter() - start
+
+    print(f"{result['n_records']} prédictions du {args.day} (modèles journalisés : {', '.join(result['models'])})")
+    print(f"Nouveau modèle {model_sha256[:12]} : écart moyen {result['mean_abs_diff']}, max {result['max_abs_diff']}, "
+          f"{result['decisions_changed']} décision(s) modifiée(s) ({elapsed:.2f} s)")
+    if args.out:
+        import csv
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["ts"] + FEATURE_COLUMNS + ["logged_probability", "new_probability"])
+            for record, new, changed in zip(records, result["new_probability"], result["changed"]):
+                if changed:
+                    writer.writerow([record["ts"]] + [record["inputs"][c] for c in FEATURE_COLUMNS]
+                                    + [record["probability"], round(float(new), 6)])
+        print(f"Décisions modifiées écrites dans {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+# bench.py
+
+# --- Banc de mesure de débit et de latence des API de prédiction ---
+#
+# Mode "http" : démarre chaque API (uvicorn sur un port local), attend qu'elle soit prête, puis envoie des
+# requêtes POST /predict construites à partir de patients tirés de data/diabetes_clean.csv :
+#   - en boucle fermée : N clients concurrents enchaînent les requêtes (--concurrency 1 8 32)
+#   - en boucle ouverte : requêtes émises à débit fixe quel que soit le temps de réponse (--rates 50 200) ;
+#     la latence est comptée depuis l'instant d'émission prévu, pour ne pas masquer l'attente côté client
+# Pour chaque palier : requêtes/s, latences p50/p95/p99/p999, taux d'erreur, CPU et RSS du processus serveur.
+#
+# Mode "micro" : appelle le modèle seul, dans ce processus (une ligne, puis un lot), pour séparer le coût de
+# l'inférence de celui du framework web.
+#
+# Résultat en JSON (--out) ; --baseline compare à un résultat précédent et échoue (code 1) si la latence
+# (--percentile, p99 par défaut) ou le débit se dégradent de plus de --max-regression.
+#
+# Usage (nécessite httpx : pip install httpx) :
+#   python bench.py http --apps gael seb flavie --concurrency 1 8 32 --rates 100 --duration 10 --out bench.json
+#   python bench.py micro --out micro.json
+#   python bench.py micro --baseline micro.json --percentile p50
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(HERE, "..", ".."))
+DATA_PATH = os.path.join(REPO_ROOT, "data", "diabetes_clean.csv")
+GAEL_MODEL = os.path.join(HERE, "modele_diabete_XX.pkl")
+GAEL_ARTIFACT = os.path.join(HERE, "modele_diabete_XX.model")
+
+# Les trois API du dépôt : répertoire, application ASGI, endpoint de disponibilité et chemins du modèle.
+# L'API de Flavie n'a pas de modèle versionné : elle utilise celui de ML_Gael/api.
+APPS = {
+    "gael": {
+        "cwd": HERE,
+        "app": "app:app",
+        "ready": "/health/ready",
+        "model": GAEL_MODEL,
+        "artifact": GAEL_ARTIFACT,
+        "env": {},
+    },
+    "seb": {
+        "cwd": os.path.join(REPO_ROOT, "ML Seb", "part 3"),
+        "app": "app:app",
+        "ready": "/health",
+        "model": os.path.join(REPO_ROOT, "ML Seb", "part 3", "modele_diabete_XX.pkl"),
+        "artifact": os.path.join(REPO_ROOT, "ML Seb", "part 3", "modele_diabete_XX.model"),
+        "env": {},
+    },
+    "flavie": {
+        "cwd": os.path.join(REPO_ROOT, "ML_Flavie", "api"),
+        "app": "api:app",
+        "ready": "/",
+        "model": GAEL_MODEL,
+        "artifact": GAEL_ARTIFACT,
+        "env": {"MODEL_PATH": GAEL_MODEL, "MODEL_ARTIFACT_PATH": GAEL_ARTIFACT},
+    },
+}
+
+PERCENTILES = {"p50": 50, "p95": 95, "p99": 99, "p999": 99.9}
+
+
+# --- Données et statistiques ---
+
+def load_patients(path: str = DATA_PATH, n: int = 1000, seed: int = 42) -> List[dict]:
+    """
+    Échantillon (avec remise) de patients réels au format JSON attendu par /predict.
+    """
+    df = pd.read_csv(path)[FEATURE_COLUMNS]
+    sample = df.sample(n=n, replace=True, random_state=seed)
+    return [{c: int(v) for c, v in zip(FEATURE_COLUMNS, row)} for row in sample.itertuples(index=False)]
+
+
+def latency_summary(latencies_s) -> dict:
+    """
+    Percentiles de latence en millisecondes.
+    """
+    if len(latencies_s) == 0:
+        return {name: None for name in PERCENTILES}
+    values = np.percentile(np.asarray(latencies_s) * 1000, list(PERCENTILES.values()))
+    return {name: round(float(v), 3) for name, v in zip(PERCENTILES, values)}
+
+
+class ProcessProbe:
+    """
+    Temps CPU et mémoire d'un processus lus dans /proc (Linux) ; valeurs None sur les autres systèmes.
+    """
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def cpu_seconds(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+        # utime et stime : 14e et 15e champs de /proc/<pid>/stat (indices 11 et 12 après le nom)
+        return (int(fields[11]) + int(fields[12])) / self.ticks
+
+    def memory_mb(self) -> Dict[str, Optional[float]]:
+        values = {"rss_mb": None, "peak_rss_mb": None}
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        values["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+                    elif line.startswith("VmHWM:"):
+                        values["peak_rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            pass
+        return values
+
+
+# --- Mode http ---
+
+class Server:
+    """
+    API lancée avec uvicorn sur 127.0.0.1:port (contexte : arrêt du processus à la sortie).
+    """
+
+    def __init__(self, name: str, port: int, startup_timeout: float = 60.0):
+        self.name = name
+        self.config = APPS[name]
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.startup_timeout = startup_timeout
+        self.process: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "Server":
+        import httpx
+
+        env = {**os.environ, **self.config["env"], "PYTHONWARNINGS": "ignore"}
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", self.config["app"], "--host", "127.0.0.1",
+             "--port", str(self.port), "--log-level", "warning", "--no-access-log"],
+            cwd=self.config["cwd"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        started = time.perf_counter()
+        deadline = started + self.startup_timeout
+        while time.perf_counter() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.name} : le serveur s'est arrêté au démarrage (code {self.process.returncode}).")
+            try:
+                if httpx.get(self.url + self.config["ready"], timeout=1.0).status_code == 200:
+                    self.startup_seconds = time.perf_counter() - started
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"{self.name} : serveur non prêt après {self.startup_timeout} s.")
+
+    def __exit__(self, *exc) -> None:
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+async def _send(client, patient: dict, sent_at: float, latencies: list, errors: list) -> None:
+    try:
+        response = await client.post("/predict", json=patient)
+        ok = response.status_code == 200 and "error" not in response.json()
+    except Exception:
+        ok = False
+    latencies.append(time.perf_counter() - sent_at)
+    if not ok:
+        errors.append(1)
+
+
+async def closed_loop(client, patients: List[dict], concurrency: int, duration: float) -> dict:
+    """
+    `concurrency` clients enchaînent les requêtes pendant `duration` secondes.
+    """
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+
+    async def worker(offset: int):
+        i = offset
+        while time.perf_counter() < deadline:
+            await _send(client, patients[i % len(patients)], time.perf_counter(), latencies, errors)
+            i += concurrency
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(k) for k in range(concurrency)))
+    return {"requests": len(latencies), "errors": len(errors), "seconds": time.perf_counter() - started,
+            "latencies": latencies}
+
+
+async def open_loop(client, patients: List[dict], rate: float, duration: float) -> dict:
+    """
+    Requêtes émises à `rate` par seconde pendant `duration` secondes, sans attendre les réponses.
+    """
+    latencies, errors, tasks = [], [], []
+    n = max(1, int(rate * duration))
+    started = time.perf_counter()
+    for i in range(n):
+        scheduled = started + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(_send(client, patients[i % len(patients)], scheduled, latencies, errors)))
+    await asyncio.gather(*tasks)
+    return {"requests": len(latencies), "errors": len(errors), "seconds": time.perf_counter() - started,
+            "latencies": latencies}
+
+
+def run_phase(server: Server, probe: ProcessProbe, load, patients: List[dict], level: float, duration: float,
+              warmup: float) -> dict:
+    import httpx
+
+    async def main():
+        limits = httpx.Limits(max_connections=1000, max_keepalive_connections=1000)
+        async with httpx.AsyncClient(base_url=server.url, limits=limits, timeout=30.0) as client:
+            await load(client, patients, level, warmup)
+            cpu_before = probe.cpu_seconds()
+            result = await load(client, patients, level, duration)
+            cpu_after = probe.cpu_seconds()
+            return result, cpu_before, cpu_after
+
+    result, cpu_before, cpu_after = asyncio.run(main())
+    seconds = result["seconds"]
+    phase = {
+        "requests": result["requests"],
+        "rps": round(result["requests"] / seconds, 1),
+        "error_rate": round(result["errors"] / result["requests"], 4) if result["requests"] else None,
+        "latency_ms": latency_summary(result["latencies"]),
+        "server_cpu_percent": (round(100 * (cpu_after - cpu_before) / seconds, 1)
+                               if cpu_before is not None and cpu_after is not None else None),
+    }
+    phase.update(probe.memory_mb())
+    return phase
+
+
+def bench_http(apps: List[str], concurrency: List[int], rates: List[float], duration: float, warmup: float,
+               port: int, n_patients: int) -> dict:
+    patients = load_patients(n=n_patients)
+    results = {}
+    for k, name in enumerate(apps):
+        with Server(name, port + k) as server:
+            probe = ProcessProbe(server.process.pid)
+            app_result = {"startup_seconds": round(server.startup_seconds, 3), "idle": probe.memory_mb(),
+                          "closed_loop": {}, "open_loop": {}}
+            for c in concurrency:
+                print(f"{name} : {c} client(s) concurrent(s)...", file=sys.stderr)
+                app_result["closed_loop"][str(c)] = run_phase(server, probe, closed_loop, patients, c, duration, warmup)
+            for r in rates:
+                print(f"{name} : {r:g} requêtes/s...", file=sys.stderr)
+                app_result["open_loop"][f"{r:g}"] = run_phase(server, probe, open_loop, patients, r, duration, warmup)
+            results[name] = app_result
+    return results
+
+
+# --- Mode micro ---
+
+def _time_calls(fn, n_calls: int) -> list:
+    timings = []
+    for _ in range(n_calls):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_micro(apps: List[str], n_calls: int, batch_rows: int) -> dict:
+    """
+    Coût du seul appel au modèle, tel que chargé par chaque API (load_model : artefact NumPy ou pickle).
+    """
+    from forest_engine import load_model
+
+    X = pd.read_csv(DATA_PATH)[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    batch = X[np.random.default_rng(42).integers(0, len(X), batch_rows)]
+    results = {}
+    for name in apps:
+        config = APPS[name]
+        model, _ = load_model(config["model"], config["artifact"])
+        row = X[:1]
+        model.predict_proba(batch)  # premier appel (allocations, caches) hors mesure
+        single = _time_calls(lambda: model.predict_proba(row), n_calls)
+        batched = _time_calls(lambda: model.predict_proba(batch), max(1, n_calls // 20))
+        results[name] = {
+            "engine": type(model).__name__,
+            "single_row_ms": latency_summary(single),
+            f"batch_{batch_rows}_ms": latency_summary(batched),
+            "batch_row_us": round(float(np.median(batched)) / batch_rows * 1e6, 3),
+        }
+    return results
+
+
+# --- Comparaison à une référence ---
+
+def regressions(result: dict, baseline: dict, max_regression: float, percentile: str = "p99") -> List[str]:
+    """
+    Liste des mesures dégradées de plus de max_regression (fraction) par rapport à baseline :
+    latence (au percentile donné) plus élevée ou débit plus faible, pour chaque palier présent dans les deux résultats.
+    """
+    found = []
+
+    def walk(current, reference, path):
+        for key, value in current.items():
+            if key not in reference:
+                continue
+            if isinstance(value, dict):
+                walk(value, reference[key], path + [key])
+            elif value is not None and reference[key]:
+                name = "/".join(path + [key])
+                if key == percentile and value > reference[key] * (1 + max_regression):
+                    found.append(f"{name} : {reference[key]} -> {value} ms")
+                elif key == "rps" and value < reference[key] * (1 - max_regression):
+                    found.append(f"{name} : {reference[key]} -> {value} req/s")
+
+    walk(result["results"], baseline.get("results", {}), [])
+    return found
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de mesure de débit et de latence des API de prédiction.")
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    p_http = sub.add_parser("http", help="Charge HTTP sur /predict (uvicorn local)")
+    p_http.add_argument("--concurrency", type=int, nargs="*", default=[1, 8, 32], help="Paliers en boucle fermée")
+    p_http.add_argument("--rates", type=float, nargs="*", default=[50.0], help="Paliers en boucle ouverte (requêtes/s)")
+    p_http.add_argument("--duration", type=float, default=10.0, help="Durée de chaque palier (s)")
+    p_http.add_argument("--warmup", type=float, default=1.0, help="Échauffement avant chaque palier (s)")
+    p_http.add_argument("--port", type=int, default=8100, help="Premier port utilisé (un par API)")
+    p_http.add_argument("--patients", type=int, default=1000, help="Taille de l'échantillon de patients")
+
+    p_micro = sub.add_parser("micro", help="Appel au modèle seul, sans serveur")
+    p_micro.add_argument("--calls", type=int, default=2000)
+    p_micro.add_argument("--batch-rows", type=int, default=1000)
+
+    for p in (p_http, p_micro):
+        p.add_argument("--apps", nargs="*", choices=list(APPS), default=list(APPS))
+        p.add_argument("--out", help="Fichier JSON de résultat (défaut : sortie standard)")
+        p.add_argument("--baseline", help="Résultat précédent à comparer")
+        p.add_argument("--max-regression", type=float, default=0.2, help="Dégradation tolérée (0.2 = 20 %%)")
+        p.add_argument("--percentile", choices=list(PERCENTILES), default="p99", help="Latence comparée à la référence")
+    args = parser.parse_args()
+
+    if args.mode == "http":
+        results = bench_http(args.apps, args.concurrency, args.rates, args.duration, args.warmup, args.port,
+                             args.patients)
+    else:
+        results = bench_micro(args.apps, args.calls, args.batch_rows)
+
+    report = {
+        "mode": args.mode,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "parameters": {k: v for k, v in vars(args).items() if k not in ("mode", "out", "baseline", "max_regression", "percentile")},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+        print(f"Résultat écrit dans {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.max_regression, args.percentile)
+        for line in found:
+            print(f"RÉGRESSION {line}", file=sys.stderr)
+        if found:
+            raise SystemExit(1)
+        print("Aucune régression par rapport à la référence.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+# cache.py
+
+# --- Cache des réponses de /predict ---
+#
+# Les interfaces (Streamlit, Gradio) renvoient très souvent le même patient (re-soumission,
+# formulaire par défaut, démonstrations). Le cache garde en mémoire la probabilité déjà calculée,
+# indexée par la clé entière des 16 caractéristiques (cf. features.feature_key).
+#
+#   - éviction LRU (taille bornée) + expiration TTL
+#   - entrées indexées par (empreinte du modèle, clé) : seuls le modèle servi (bind_model) et le candidat
+#     éventuel (bind_candidate) gardent des entrées, un changement de modèle invalide les autres
+#   - compteurs hits / misses / evictions / expirations exposés par /cache/stats, globaux et par modèle
+#   - backend partagé optionnel (SQLite local, ou stand-in en mémoire) pour que plusieurs
+#     workers uvicorn profitent des résultats calculés par les autres ; les accès bloquants au backend
+#     passent par un thread (aget / aset) pour ne pas figer la boucle asyncio
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class MemoryBackend:
+    """
+    Backend partagé "factice" en mémoire (même processus) : utile pour les tests et en développement.
+    Borné comme le cache local : au plus maxsize entrées (éviction LRU), lignes expirées supprimées à la lecture
+    et toutes les PURGE_EVERY écritures.
+    """
+
+    name = "memory"
+    blocking = False
+    PURGE_EVERY = 1000
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = max(1, maxsize)
+        self._data = OrderedDict()  # (empreinte, clé) -> (probabilité, date d'expiration)
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, model_sha256: str, key: int) -> Optional[float]:
+        with self._lock:
+            entry = self._data.get((model_sha256, key))
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                del self._data[(model_sha256, key)]
+                return None
+            self._data.move_to_end((model_sha256, key))
+            return entry[0]
+
+    def set(self, model_sha256: str, key: int, value: float, ttl: float) -> None:
+        with self._lock:
+            self._data[(model_sha256, key)] = (value, time.time() + ttl)
+            self._data.move_to_end((model_sha256, key))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._purge_locked()
+
+    def purge(self) -> int:
+        """
+        Supprime les entrées expirées et renvoie leur nombre.
+        """
+        with self._lock:
+            return self._purge_locked()
+
+    def _purge_locked(self) -> int:
+        now = time.time()
+        expired = [k for k, (_, expires) in self._data.items() if expires < now]
+        for k in expired:
+            del self._data[k]
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteBackend:
+    """
+    Backend partagé entre processus via un fichier SQLite local (mode WAL).
+    Les entrées sont indexées par (empreinte du modèle, clé) : un nouveau modèle ne lit jamais les anciens scores.
+    Les lignes expirées sont supprimées toutes les PURGE_EVERY écritures.
+    """
+
+    name = "sqlite"
+    blocking = True
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                " model_sha256 TEXT NOT NULL, key INTEGER NOT NULL, value REAL NOT NULL, expires REAL NOT NULL,"
+                " PRIMARY KEY (model_sha256, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS predictions_expires ON predictions (expires)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # Une connexion par thread et par processus : les connexions sqlite3 ne se partagent ni entre
+        # threads, ni entre le maître gunicorn et les workers créés par fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, model_sha256: str, key: int) -> Optional[float]:
+        try:
+            row = self._connection().execute(
+                "SELECT value FROM predictions WHERE model_sha256 = ? AND key = ? AND expires >= ?",
+                (model_sha256, key, time.time()),
+            ).fetchone()
+        except sqlite3.OperationalError as e:
+            # Base verrouillée ou illisible : la requête est servie comme un miss
+            print(f"Cache partagé indisponible: {e}")
+            return None
+        return None if row is None else row[0]
+
+    def set(self, model_sha256: str, key: int, value: float, ttl: float) -> None:
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)",
+                (model_sha256, key, value, now + ttl),
+            )
+            if self._count_write():
+                conn.execute("DELETE FROM predictions WHERE expires < ?", (now,))
+        except sqlite3.OperationalError as e:
+            # Base verrouillée par un autre worker : le cache partagé est facultatif, on n'échoue pas la requête
+            print(f"Cache partagé indisponible: {e}")
+
+    def _count_write(self) -> bool:
+        """
+        Compte les écritures de ce processus ; True quand une purge des lignes expirées est due.
+        """
+        with self._writes_lock:
+            self._writes += 1
+            return self._writes % self.PURGE_EVERY == 0
+
+    def purge(self) -> int:
+        """
+        Supprime les lignes expirées et renvoie leur nombre.
+        """
+        return self._connection().execute("DELETE FROM predictions WHERE expires < ?", (time.time(),)).rowcount
+
+
+class PredictionCache:
+    """
+    Cache LRU + TTL en mémoire du processus, avec un backend partagé optionnel en second niveau.
+    Les entrées sont indexées par (empreinte du modèle, clé) : pendant une évaluation canary, le modèle servi
+    et le candidat ont chacun leurs entrées et leurs compteurs.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600.0, backend=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self.model_sha256 = None
+        self.candidate_sha256 = None
+        self._entries = OrderedDict()  # (empreinte, clé) -> (probabilité, date d'expiration)
+        self._per_model = {}  # empreinte -> {"hits": .., "misses": ..}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.shared_hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def bind_model(self, model_sha256: str) -> None:
+        """
+        Associe le cache au modèle servi : les entrées des modèles qui ne sont ni servis ni candidats sont invalidées.
+        """
+        with self._lock:
+            if model_sha256 != self.model_sha256:
+                self.model_sha256 = model_sha256
+                if self.candidate_sha256 == model_sha256:
+                    # Promotion du candidat : ses entrées restent valides
+                    self.candidate_sha256 = None
+                self._retain()
+
+    def bind_candidate(self, model_sha256: Optional[str]) -> None:
+        """
+        Associe le cache au modèle candidat (None quand l'évaluation s'arrête).
+        """
+        with self._lock:
+            if model_sha256 == self.model_sha256:
+                model_sha256 = None
+            if model_sha256 != self.candidate_sha256:
+                self.candidate_sha256 = model_sha256
+                self._retain()
+
+    def _retain(self) -> None:
+        # Appelé sous self._lock
+        bound = {self.model_sha256, self.candidate_sha256} - {None}
+        for entry_key in [k for k in self._entries if k[0] not in bound]:
+            del self._entries[entry_key]
+        self._per_model = {sha: counts for sha, counts in self._per_model.items() if sha in bound}
+
+    def get(self, key: int, model_sha256: Optional[str] = None) -> Optional[float]:
+        """
+        model_sha256 : modèle avec lequel la requête est servie (modèle servi par défaut).
+        """
+        model_sha256 = model_sha256 or self.model_sha256
+        value = self._get_local(key, model_sha256)
+        if value is not None:
+            return value
+        if self.backend is not None:
+            return self._shared_result(key, model_sha256, self.backend.get(model_sha256, key))
+        self._count(model_sha256, hit=False)
+        return None
+
+    async def aget(self, key: int, model_sha256: Optional[str] = None) -> Optional[float]:
+        """
+        Variante de get pour la boucle asyncio : un backend bloquant (SQLite) est interrogé dans un thread.
+        """
+        if self.backend is None or not self.backend.blocking:
+            return self.get(key, model_sha256)
+        model_sha256 = model_sha256 or self.model_sha256
+        value = self._get_local(key, model_sha256)
+        if value is not None:
+            return value
+        return self._shared_result(key, model_sha256, await asyncio.to_thread(self.backend.get, model_sha256, key))
+
+    def _get_local(self, key: int, model_sha256: Optional[str]) -> Optional[float]:
+        now = time.monotonic()
+        entry_key = (model_sha256, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is None:
+                return None
+            if entry[1] < now:
+                del self._entries[entry_key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(entry_key)
+            self._count_locked(model_sha256, hit=True)
+            return entry[0]
+
+    def _shared_result(self, key: int, model_sha256: Optional[str], value: Optional[float]) -> Optional[float]:
+        if value is None:
+            self._count(model_sha256, hit=False)
+            return None
+        self._store(key, value, model_sha256)
+        with self._lock:
+            self.shared_hits += 1
+            self._count_locked(model_sha256, hit=True)
+        return value
+
+    def _count(self, model_sha256: Optional[str], hit: bool) -> None:
+        with self._lock:
+            self._count_locked(model_sha256, hit)
+
+    def _count_locked(self, model_sha256: Optional[str], hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if model_sha256 is not None and model_sha256 in (self.model_sha256, self.candidate_sha256):
+            counts = self._per_model.setdefault(model_sha256, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    def set(self, key: int, value: float, model_sha256: Optional[str] = None) -> None:
+        """
+        model_sha256 : modèle qui a calculé `value` ; ignoré localement s'il n'est plus ni servi ni candidat.
+        """
+        model_sha256 = model_sha256 or self.model_sha256
+        self._store(key, value, model_sha256)
+        if self.backend is not None:
+            self.backend.set(model_sha256, key, value, self.ttl)
+
+    async def aset(self, key: int, value: float, model_sha256: Optional[str] = None) -> None:
+        """
+        Variante de set pour la boucle asyncio (écriture du backend bloquant dans un thread).
+        """
+        if self.backend is None or not self.backend.blocking:
+            self.set(key, value, model_sha256)
+            return
+        model_sha256 = model_sha256 or self.model_sha256
+        self._store(key, value, model_sha256)
+        await asyncio.to_thread(self.backend.set, model_sha256, key, value, self.ttl)
+
+    def _store(self, key: int, value: float, model_sha256: Optional[str]) -> None:
+        with self._lock:
+            if model_sha256 is None or model_sha256 not in (self.model_sha256, self.candidate_sha256):
+                return
+            entry_key = (model_sha256, key)
+            self._entries[entry_key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            sizes = {}
+            for sha, _ in self._entries:
+                sizes[sha] = sizes.get(sha, 0) + 1
+            models = {}
+            for role, sha in (("served", self.model_sha256), ("candidate", self.candidate_sha256)):
+                if sha is None:
+                    continue
+                counts = self._per_model.get(sha, {"hits": 0, "misses": 0})
+                model_lookups = counts["hits"] + counts["misses"]
+                models[sha] = {
+                    "role": role,
+                    "size": sizes.get(sha, 0),
+                    "hits": counts["hits"],
+                    "misses": counts["misses"],
+                    "hit_ratio": round(counts["hits"] / model_lookups, 4) if model_lookups else None,
+                }
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "backend": self.backend.name if self.backend is not None else None,
+                "model_sha256": self.model_sha256,
+                "candidate_sha256": self.candidate_sha256,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "models": models,
+            }
+
+
+def cache_from_env() -> PredictionCache:
+    """
+    Construit le cache à partir des variables d'environnement :
+    CACHE_SIZE (0 = désactivé), CACHE_TTL_SECONDS, CACHE_BACKEND ("", "memory" ou "sqlite"), CACHE_SQLITE_PATH,
+    CACHE_MEMORY_BACKEND_SIZE (entrées du backend "memory").
+    """
+    backend_name = os.getenv("CACHE_BACKEND", "").lower()
+    if backend_name == "sqlite":
+        backend = SQLiteBackend(os.getenv("CACHE_SQLITE_PATH", "/tmp/diabete_cache.sqlite"))
+    elif backend_name == "memory":
+        backend = MemoryBackend(int(os.getenv("CACHE_MEMORY_BACKEND_SIZE", "100000")))
+    else:
+        backend = None
+    return PredictionCache(
+        maxsize=int(os.getenv("CACHE_SIZE", "10000")),
+        ttl=float(os.getenv("CACHE_TTL_SECONDS", "3600")),
+        backend=backend,
+    )
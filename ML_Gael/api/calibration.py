@@ -0,0 +1,259 @@
+# calibration.py
+
+# --- Calibration des probabilités et seuils de décision (points de fonctionnement) ---
+#
+# La forêt est entraînée avec class_weight="balanced" : ses probabilités ne sont pas calibrées et le seuil
+# de 0.5 n'a pas de signification clinique. train.py ajuste donc, sur les prédictions hors-pli de la
+# validation croisée, une calibration (isotonique, ou sigmoïde de Platt) puis calcule des seuils sur la
+# probabilité calibrée pour plusieurs points de fonctionnement, à demander explicitement :
+#   - "default"          : score BRUT du modèle >= 0.5 (décision historique de l'API, sans calibration) ;
+#   - "calibrated"       : probabilité calibrée >= 0.5 ;
+#   - "balanced"         : seuil maximisant sensibilité + spécificité (indice de Youden) ;
+#   - "high_sensitivity" : seuil le plus haut qui atteint la sensibilité cible (dépistage) ;
+#   - "high_specificity" : seuil le plus bas qui atteint la spécificité cible (confirmation).
+#
+# La décision par défaut reste donc celle du modèle servi : la calibration est ajustée sur les scores hors-pli
+# de copies du pipeline, pas sur ceux du modèle servi, et l'appliquer d'office changerait des décisions.
+#
+# Format (métadonnées du modèle, clé "calibration", dans manifest.json et le rapport) : quelques dizaines de
+# points (x = score brut, y = probabilité calibrée), appliqués par interpolation linéaire (np.interp,
+# vectorisé), plus la table des seuils. La table de scores, le cache et l'audit conservent le score brut :
+# la calibration est appliquée à la fin, au moment de la décision.
+#
+# Ajout de la calibration à un modèle existant (sans ré-entraînement du modèle servi) :
+#   python calibration.py --model modele_diabete_XX.pkl --data ../../data/diabetes_clean.csv
+
+import argparse
+import json
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+METHODS = ("isotonic", "sigmoid")
+DEFAULT_OPERATING_POINT = "default"
+CALIBRATED_OPERATING_POINT = "calibrated"
+
+# Cibles par défaut des points de fonctionnement à haute sensibilité / haute spécificité
+TARGET_SENSITIVITY = 0.99
+TARGET_SPECIFICITY = 0.99
+
+# Nombre de points de la table pour la méthode sigmoïde (la courbe est tabulée sur [0, 1])
+SIGMOID_KNOTS = 101
+
+
+class Calibration:
+    """
+    Calibration d'un modèle : apply(scores) renvoie les probabilités calibrées, threshold(nom) le seuil
+    d'un point de fonctionnement, probabilities(scores, nom) la probabilité sur laquelle ce seuil s'applique
+    (score brut pour "default", probabilité calibrée pour les autres). Sans calibration dans les métadonnées :
+    identité, seuil 0.5 uniquement.
+    """
+    __slots__ = ("method", "x", "y", "operating_points")
+
+    def __init__(self, x, y, operating_points: Dict[str, dict], method: str = "identity"):
+        self.method = method
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.operating_points = operating_points
+
+    @classmethod
+    def identity(cls) -> "Calibration":
+        return cls([0.0, 1.0], [0.0, 1.0], {DEFAULT_OPERATING_POINT: {"threshold": 0.5, "score": "raw"}})
+
+    @classmethod
+    def from_metadata(cls, metadata: Optional[dict]) -> "Calibration":
+        spec = (metadata or {}).get("calibration")
+        if not spec:
+            return cls.identity()
+        points = dict(spec["operating_points"])
+        default = points.get(DEFAULT_OPERATING_POINT) or {}
+        if default.get("score") != "raw":
+            # Métadonnées antérieures : "default" y désignait 0.5 sur la probabilité calibrée, conservé sous
+            # "calibrated" ; "default" redevient 0.5 sur le score brut
+            if default:
+                points.setdefault(CALIBRATED_OPERATING_POINT, default)
+            points = {DEFAULT_OPERATING_POINT: {"threshold": 0.5, "score": "raw"},
+                      **{k: v for k, v in points.items() if k != DEFAULT_OPERATING_POINT}}
+        return cls(spec["x"], spec["y"], points, spec.get("method", "isotonic"))
+
+    def to_metadata(self) -> dict:
+        return {
+            "method": self.method,
+            "x": [round(float(v), 6) for v in self.x],
+            "y": [round(float(v), 6) for v in self.y],
+            "operating_points": self.operating_points,
+        }
+
+    def apply(self, scores: np.ndarray) -> np.ndarray:
+        return np.interp(scores, self.x, self.y)
+
+    def apply_one(self, score: float) -> float:
+        return float(np.interp(score, self.x, self.y))
+
+    def threshold(self, operating_point: Optional[str] = None) -> float:
+        """
+        Seuil du point de fonctionnement (cf. probabilities) ; KeyError s'il n'existe pas pour ce modèle.
+        """
+        return self.operating_points[operating_point or DEFAULT_OPERATING_POINT]["threshold"]
+
+    def is_raw(self, operating_point: Optional[str] = None) -> bool:
+        return self.operating_points[operating_point or DEFAULT_OPERATING_POINT].get("score") == "raw"
+
+    def probabilities(self, scores: np.ndarray, operating_point: Optional[str] = None) -> np.ndarray:
+        """
+        Probabilité comparée au seuil du point de fonctionnement : score brut ("default") ou calibré.
+        """
+        return np.asarray(scores, dtype=np.float64) if self.is_raw(operating_point) else self.apply(scores)
+
+    def probability(self, score: float, operating_point: Optional[str] = None) -> float:
+        return float(score) if self.is_raw(operating_point) else self.apply_one(score)
+
+    def decide(self, scores: np.ndarray, operating_point: Optional[str] = None) -> np.ndarray:
+        """
+        Décision positive de chaque score brut au point de fonctionnement (défaut : score brut >= 0.5).
+        """
+        return self.probabilities(scores, operating_point) >= self.threshold(operating_point)
+
+    def describe(self) -> dict:
+        return {"method": self.method, "n_knots": len(self.x), "operating_points": self.operating_points}
+
+
+# --- Ajustement (entraînement) ---
+
+def fit_calibration(scores: np.ndarray, y: np.ndarray, method: str = "isotonic",
+                    target_sensitivity: float = TARGET_SENSITIVITY,
+                    target_specificity: float = TARGET_SPECIFICITY) -> Calibration:
+    """
+    Ajuste la calibration sur des scores hors-pli (jamais vus par le modèle qui les a produits) et calcule
+    les seuils des points de fonctionnement sur les probabilités calibrées.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    y = np.asarray(y).astype(bool)
+    if method == "isotonic":
+        from sklearn.isotonic import IsotonicRegression
+        iso = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds="clip").fit(scores, y)
+        x, fitted = iso.X_thresholds_, iso.y_thresholds_
+    elif method == "sigmoid":
+        from sklearn.linear_model import LogisticRegression
+        platt = LogisticRegression().fit(scores[:, None], y)
+        x = np.linspace(0.0, 1.0, SIGMOID_KNOTS)
+        fitted = platt.predict_proba(x[:, None])[:, 1]
+    else:
+        raise ValueError(f"method doit valoir {METHODS}, reçu {method!r}")
+
+    calibration = Calibration(x, fitted, {}, method)
+    calibration.operating_points = operating_points(calibration.apply(scores), y, target_sensitivity,
+                                                    target_specificity, raw_scores=scores)
+    return calibration
+
+
+def _rates(probabilities: np.ndarray, y: np.ndarray, threshold: float) -> dict:
+    positive = probabilities >= threshold
+    return {
+        "threshold": round(float(threshold), 6),
+        "sensitivity": round(float(positive[y].mean()), 4),
+        "specificity": round(float((~positive[~y]).mean()), 4),
+    }
+
+
+def operating_points(probabilities: np.ndarray, y: np.ndarray, target_sensitivity: float = TARGET_SENSITIVITY,
+                     target_specificity: float = TARGET_SPECIFICITY,
+                     raw_scores: Optional[np.ndarray] = None) -> Dict[str, dict]:
+    """
+    Seuils candidats = probabilités calibrées distinctes ; pour chaque point de fonctionnement : seuil,
+    sensibilité et spécificité obtenues hors-pli (et la cible visée). raw_scores : scores bruts, pour les taux
+    du point "default" (0.5 sur le score brut).
+    """
+    y = np.asarray(y).astype(bool)
+    candidates = np.unique(probabilities)
+    positive = probabilities[:, None] >= candidates[None, :]
+    sensitivity = positive[y].mean(axis=0)
+    specificity = (~positive[~y]).mean(axis=0)
+
+    # Sensibilité décroissante et spécificité croissante avec le seuil
+    reaches_sensitivity = np.flatnonzero(sensitivity >= target_sensitivity)
+    reaches_specificity = np.flatnonzero(specificity >= target_specificity)
+    high_sensitivity = candidates[reaches_sensitivity[-1]] if len(reaches_sensitivity) else candidates[0]
+    high_specificity = candidates[reaches_specificity[0]] if len(reaches_specificity) else candidates[-1]
+    balanced = candidates[np.argmax(sensitivity + specificity)]
+
+    raw_scores = probabilities if raw_scores is None else np.asarray(raw_scores, dtype=np.float64)
+    return {
+        DEFAULT_OPERATING_POINT: {**_rates(raw_scores, y, 0.5), "score": "raw"},
+        CALIBRATED_OPERATING_POINT: _rates(probabilities, y, 0.5),
+        "balanced": _rates(probabilities, y, balanced),
+        "high_sensitivity": {**_rates(probabilities, y, high_sensitivity), "target": target_sensitivity},
+        "high_specificity": {**_rates(probabilities, y, high_specificity), "target": target_specificity},
+    }
+
+
+def out_of_fold_scores(pipeline, X, y, n_folds: int = 5, random_state: int = 42, n_jobs: int = None) -> np.ndarray:
+    """
+    Probabilité positive de chaque ligne, prédite par une copie du pipeline entraînée sans cette ligne.
+    """
+    from sklearn.model_selection import StratifiedKFold, cross_val_predict
+    cv = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=random_state)
+    return cross_val_predict(pipeline, X, y, cv=cv, method="predict_proba", n_jobs=n_jobs)[:, 1]
+
+
+# --- Ajout à un modèle existant ---
+
+def _write_json(path: str, content: dict) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(content, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ajoute une calibration et des seuils de décision à un modèle existant.")
+    parser.add_argument("--model", default="modele_diabete_XX.pkl", help="Pipeline scikit-learn (.pkl)")
+    parser.add_argument("--artifact", help="Artefact NumPy à mettre à jour (défaut : <model sans .pkl>.model)")
+    parser.add_argument("--data", default="../../data/diabetes_clean.csv", help="CSV d'entraînement nettoyé ou .npy compact")
+    parser.add_argument("--method", choices=METHODS, default="isotonic")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--target-sensitivity", type=float, default=TARGET_SENSITIVITY)
+    parser.add_argument("--target-specificity", type=float, default=TARGET_SPECIFICITY)
+    args = parser.parse_args()
+
+    import joblib
+    from forest_engine import NumpyForest, file_sha256
+    from train import load_dataset
+
+    X, y = load_dataset(args.data)
+    scores = out_of_fold_scores(joblib.load(args.model), X, y, args.folds)
+    calibration = fit_calibration(scores, y.to_numpy(), args.method, args.target_sensitivity, args.target_specificity)
+    print(f"Calibration {args.method} : {len(calibration.x)} points")
+    for name, point in calibration.operating_points.items():
+        print(f"  {name:<17} seuil {point['threshold']:.4f}  sensibilité {point['sensitivity']:.4f}  "
+              f"spécificité {point['specificity']:.4f}")
+
+    base = os.path.splitext(args.model)[0]
+    model_sha256 = file_sha256(args.model)
+    # Rapport lu par forest_engine.load_model quand le pickle est servi (créé s'il n'existe pas)
+    report_path = f"{base}.report.json"
+    report = {"model": {"path": args.model, "sha256": model_sha256}}
+    if os.path.exists(report_path):
+        with open(report_path, encoding="utf-8") as f:
+            report = json.load(f)
+    if (report.get("model") or {}).get("sha256") == model_sha256:
+        report.setdefault("metadata", {})["calibration"] = calibration.to_metadata()
+        _write_json(report_path, report)
+        print(f"Rapport mis à jour : {report_path}")
+    else:
+        print(f"ATTENTION: {report_path} décrit un autre modèle, non modifié.")
+    artifact_path = args.artifact or f"{base}.model"
+    if NumpyForest.is_artifact(artifact_path):
+        manifest_path = os.path.join(artifact_path, "manifest.json")
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("model_sha256") != model_sha256:
+            raise SystemExit(f"{artifact_path} ne correspond pas à {args.model}.")
+        manifest.setdefault("metadata", {})["calibration"] = calibration.to_metadata()
+        _write_json(manifest_path, manifest)
+        print(f"Artefact mis à jour : {artifact_path}")
+
+
+if __name__ == "__main__":
+    main()
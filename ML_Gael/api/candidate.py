@@ -0,0 +1,253 @@
+# candidate.py
+
+# --- Évaluation d'un modèle candidat sur le trafic réel (shadow / canary) ---
+#
+# Avant de promouvoir une version du registre (cf. registry.py), on la fait scorer de vraies requêtes /predict :
+#   - "shadow" : l'utilisateur reçoit toujours la réponse du modèle servi ; une copie de la requête est scorée
+#                par le candidat en arrière-plan ;
+#   - "canary" : `percent` % des patients (choix déterministe sur les caractéristiques : un même patient reçoit
+#                toujours la même réponse) sont servis par le candidat ; le modèle servi score la copie en
+#                arrière-plan.
+#
+# Dans les deux cas, la copie est mise dans une file bornée et scorée par lots dans un thread dédié, après
+# l'envoi de la réponse : la comparaison n'ajoute rien au temps de réponse. Elle est abandonnée (et comptée)
+# si la file est pleine ou si le service est sous pression (pressure_fn, ex. file d'inférence chargée), au
+# moment de la mise en file comme au moment de scorer le lot.
+#
+# Résultats : accord des décisions, écart absolu des probabilités (moyen, max), durée du calcul par ligne, par
+# modèle et par rôle (primary : réponse du modèle servi, canary : réponse du candidat, shadow : copie scorée en
+# arrière-plan, durée du lot / nombre de lignes), dans stats() (GET /admin/candidate) et dans les métriques.
+
+import asyncio
+import collections
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+from metrics import CANDIDATE_COMPARISONS, CANDIDATE_DELTA, CANDIDATE_SHED, MODEL_INFERENCE
+
+MODES = ("shadow", "canary")
+
+
+class CandidateRouter:
+    """
+    Routage canary et comparaison en arrière-plan entre le modèle servi et un modèle candidat.
+
+    score_fn(X, model) renvoie le score positif de chaque ligne de X pour `model`, decision_fn(scores, model)
+    la décision de `model` pour ces scores (défaut : score >= 0.5) ; les modèles sont des objets avec les
+    attributs `version` et `sha256` (cf. ServedModel dans app.py).
+    """
+
+    def __init__(self, score_fn: Callable, queue_size: int = 1024, batch_rows: int = 64,
+                 pressure_fn: Optional[Callable[[], bool]] = None, decision_fn: Optional[Callable] = None):
+        self.score_fn = score_fn
+        self.decision_fn = decision_fn or (lambda scores, model: scores >= 0.5)
+        self.queue_size = max(1, queue_size)
+        self.batch_rows = max(1, batch_rows)
+        self.pressure_fn = pressure_fn
+        self.candidate = None
+        self.mode: Optional[str] = None
+        self.percent = 0.0
+        self._pending: collections.deque = collections.deque()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._reset_stats()
+
+    def _reset_stats(self) -> None:
+        self.compared = self.agreed = 0
+        self.delta_sum = self.delta_max = 0.0
+        self.shed: Dict[str, int] = collections.Counter()
+        self.latency: Dict[tuple, list] = {}  # (version, rôle) -> [lignes, somme des durées en s, max]
+
+    # --- Configuration ---
+
+    @property
+    def active(self) -> bool:
+        return self.candidate is not None
+
+    def configure(self, candidate, mode: str, percent: float = 0.0) -> None:
+        """
+        Installe un candidat (les statistiques repartent de zéro si la version ou le mode change).
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode doit valoir {MODES}, reçu {mode!r}")
+        if not 0 <= percent <= 100:
+            raise ValueError(f"percent doit être compris entre 0 et 100, reçu {percent}")
+        with self._lock:
+            if self.candidate is None or candidate.version != self.candidate.version or mode != self.mode:
+                self._pending.clear()
+                self._reset_stats()
+            self.candidate, self.mode, self.percent = candidate, mode, float(percent) if mode == "canary" else 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self.candidate, self.mode, self.percent = None, None, 0.0
+            self._pending.clear()
+
+    def settings(self) -> Optional[dict]:
+        if self.candidate is None:
+            return None
+        return {"version": self.candidate.version, "mode": self.mode, "percent": self.percent}
+
+    # --- Chemin des requêtes ---
+
+    def routes(self, values: Sequence[int]) -> bool:
+        """
+        Canary : True si ce patient doit être servi par le candidat (même patient -> même choix).
+        """
+        if self.mode != "canary" or self.percent <= 0:
+            return False
+        return zlib.crc32(repr(values).encode()) % 10000 < self.percent * 100
+
+    def observe(self, model, role: str, seconds: float, n_rows: int = 1) -> None:
+        """
+        Durée du calcul du score par ligne (`seconds`), pour n_rows lignes scorées par `model`.
+        """
+        series = MODEL_INFERENCE.labels(model.version, role)
+        for _ in range(n_rows):
+            series.observe(seconds)
+        key = (model.version, role)
+        with self._lock:
+            entry = self.latency.setdefault(key, [0, 0.0, 0.0])
+            entry[0] += n_rows
+            entry[1] += seconds * n_rows
+            entry[2] = max(entry[2], seconds)
+
+    def mirror(self, values: Sequence[int], score: float, served_by, other) -> None:
+        """
+        Met en file la comparaison d'une réponse (score calculé par `served_by`) avec `other`, sans attendre.
+        """
+        if other is None or other.sha256 == served_by.sha256:
+            return
+        if self.pressure_fn is not None and self.pressure_fn():
+            self._shed("pressure")
+            return
+        with self._lock:
+            full = len(self._pending) >= self.queue_size
+            if not full:
+                self._pending.append((values, score, served_by, other))
+            wake = len(self._pending) == 1
+        if full:
+            self._shed("queue_full")
+        elif wake and self._wake is not None:
+            self._wake.set()
+
+    def _shed(self, reason: str, n: int = 1) -> None:
+        CANDIDATE_SHED.labels(reason).inc(n)
+        with self._lock:
+            self.shed[reason] += n
+
+    # --- Comparaison en arrière-plan ---
+
+    def start(self) -> None:
+        """
+        Démarre la tâche de comparaison (à appeler depuis la boucle asyncio du serveur, ex. lifespan).
+        """
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="candidate")
+        self._wake = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor is not None:
+            # Attente de la comparaison en cours hors de la boucle d'événements
+            await asyncio.to_thread(self._executor.shutdown, wait=True)
+            self._executor = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while True:
+                with self._lock:
+                    batch = [self._pending.popleft() for _ in range(min(self.batch_rows, len(self._pending)))]
+                if not batch:
+                    break
+                if self.pressure_fn is not None and self.pressure_fn():
+                    self._shed("pressure", len(batch))
+                    continue
+                await loop.run_in_executor(self._executor, self._compare, batch)
+
+    def _compare(self, batch: list) -> None:
+        # Un groupe par couple (modèle qui a répondu, modèle à comparer) ; un seul en dehors d'une bascule
+        groups: Dict[tuple, list] = {}
+        for item in batch:
+            groups.setdefault((id(item[2]), id(item[3])), []).append(item)
+        candidate = self.candidate
+        if candidate is None:
+            return
+        for items in groups.values():
+            other = items[0][3]
+            X = np.array([values for values, _, _, _ in items], dtype=np.float64)
+            start = time.perf_counter()
+            try:
+                other_scores = self.score_fn(X, other)
+            except Exception as e:
+                print(f"ATTENTION: comparaison au modèle {other.version} impossible: {type(e).__name__}: {e}")
+                self._shed("error", len(items))
+                continue
+            elapsed = time.perf_counter() - start
+            served_scores = np.array([score for _, score, _, _ in items], dtype=np.float64)
+            # Rôle "shadow" : scoré hors du chemin des requêtes (le candidat en shadow, le modèle servi en canary)
+            self.observe(other, "shadow", elapsed / len(items), len(items))
+            candidate_version = candidate.version
+            # Chaque modèle décide au point de fonctionnement par défaut (cf. decision_fn)
+            agree = self.decision_fn(served_scores, items[0][2]) == self.decision_fn(other_scores, other)
+            deltas = np.abs(served_scores - other_scores)
+            n_agree = int(agree.sum())
+            CANDIDATE_COMPARISONS.labels(candidate_version, "agree").inc(n_agree)
+            CANDIDATE_COMPARISONS.labels(candidate_version, "disagree").inc(len(items) - n_agree)
+            delta_series = CANDIDATE_DELTA.labels(candidate_version)
+            for delta in deltas:
+                delta_series.observe(float(delta))
+            with self._lock:
+                self.compared += len(items)
+                self.agreed += n_agree
+                self.delta_sum += float(deltas.sum())
+                self.delta_max = max(self.delta_max, float(deltas.max()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "candidate": self.settings(),
+                "pending": len(self._pending),
+                "queue_size": self.queue_size,
+                "compared": self.compared,
+                "agreement": round(self.agreed / self.compared, 4) if self.compared else None,
+                "disagreements": self.compared - self.agreed,
+                "mean_abs_delta": round(self.delta_sum / self.compared, 6) if self.compared else None,
+                "max_abs_delta": round(self.delta_max, 6),
+                "shed": dict(self.shed),
+                "latency_ms": {
+                    f"{version}/{role}": {"n": n, "mean": round(total / n * 1000, 4), "max": round(peak * 1000, 4)}
+                    for (version, role), (n, total, peak) in sorted(self.latency.items())
+                },
+            }
+
+
+def candidate_from_env(score_fn: Callable, pressure_fn: Optional[Callable[[], bool]] = None,
+                       decision_fn: Optional[Callable] = None) -> CandidateRouter:
+    """
+    CANDIDATE_QUEUE_SIZE (comparaisons en attente), CANDIDATE_BATCH_ROWS (lignes scorées par lot).
+    """
+    return CandidateRouter(
+        score_fn,
+        queue_size=int(os.getenv("CANDIDATE_QUEUE_SIZE", "1024")),
+        batch_rows=int(os.getenv("CANDIDATE_BATCH_ROWS", "64")),
+        pressure_fn=pressure_fn,
+        decision_fn=decision_fn,
+    )
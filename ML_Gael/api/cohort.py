@@ -0,0 +1,270 @@
+# cohort.py
+
+# --- Scoring en flux de fichiers CSV de cohorte ---
+#
+# Lit un CSV brut (ex. data/test_without_class.csv : en-têtes "Sudden weight loss", valeurs Yes/No,
+# Male/Female) par blocs de taille fixe, applique l'encodage du schéma (cf. feature_schema.py), score chaque
+# bloc en un seul appel vectorisé et renvoie les lignes "ID,class,probability" au fil de l'eau.
+# La mémoire utilisée ne dépend que de la taille des blocs, pas de la taille du fichier.
+#
+# Les lignes invalides (âge non entier ou hors bornes, valeur binaire inconnue, nombre de champs incorrect) sont
+# conservées dans la sortie avec class et probability vides.
+#
+# Les champs entre guillemets peuvent contenir des retours à la ligne : le flux n'est découpé qu'aux fins
+# d'enregistrement (retour à la ligne hors guillemets), même si un enregistrement est réparti sur plusieurs morceaux.
+# Un enregistrement en attente est borné (MAX_RECORD_LINES lignes, MAX_RECORD_CHARS caractères) : au-delà, un
+# guillemet isolé (ex. ID 41"7) est supposé, sa première ligne est rejetée (ligne invalide) et les suivantes
+# sont relues normalement. Un enregistrement mal formé (guillemet non refermé...) donne une ligne invalide,
+# jamais une erreur au milieu du flux.
+#
+# Utilisé par l'endpoint POST /predict/csv de app.py, et en ligne de commande :
+#   python cohort.py ../../data/test_without_class.csv --out predictions_test.csv
+
+import argparse
+import codecs
+import csv
+import io
+import sys
+from collections import deque
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+
+from feature_schema import FEATURE_COLUMNS, column_indices, encode_text, normalize_column
+
+# Nombre de lignes scorées par bloc
+CHUNK_ROWS = 10000
+
+# Taille des blocs lus sur le disque (octets)
+READ_BLOCK_BYTES = 1 << 20
+
+# Taille maximale d'un enregistrement réparti sur plusieurs lignes (champ entre guillemets non refermé)
+MAX_RECORD_LINES = 100
+MAX_RECORD_CHARS = 1 << 16
+
+OUTPUT_HEADER = "ID,class,probability\r\n"
+
+
+class CohortScorer:
+    """
+    Scoreur incrémental : feed() reçoit du texte CSV par morceaux arbitraires (pas forcément alignés sur
+    les lignes) et renvoie le CSV de sortie des blocs complets ; close() traite le dernier bloc.
+
+    score_fn reçoit une matrice float64 (n, 16) dans l'ordre FEATURE_COLUMNS et renvoie n probabilités.
+    """
+
+    def __init__(self, score_fn: Callable[[np.ndarray], np.ndarray], chunk_rows: int = CHUNK_ROWS,
+                 threshold: float = 0.5):
+        self.score_fn = score_fn
+        self.chunk_rows = max(1, chunk_rows)
+        self.threshold = threshold
+        self.columns: Optional[List[int]] = None  # indice de chaque FEATURE_COLUMNS dans le fichier
+        self.id_column: Optional[int] = None
+        self.n_fields = 0
+        self.n_rows = self.n_invalid = 0
+        self._partial = ""
+        self._record: Optional[List[str]] = None  # lignes de l'enregistrement en cours (guillemet non refermé)
+        self._record_chars = 0
+        self._lines: List[str] = []  # enregistrements complets du bloc en cours
+        self._rejected: List[int] = []  # indices (dans _lines) des enregistrements rejetés
+
+    @property
+    def started(self) -> bool:
+        return self.columns is not None
+
+    def _read_header(self, line: str) -> None:
+        try:
+            header = next(csv.reader([line], strict=True))
+        except csv.Error as e:
+            raise ValueError(f"En-tête CSV illisible : {e}")
+        self.columns = column_indices(header)
+        normalized = [normalize_column(c) for c in header]
+        self.id_column = normalized.index("id") if "id" in normalized else None
+        self.n_fields = len(header)
+
+    def feed(self, text: str) -> str:
+        """
+        Ajoute un morceau de texte CSV. Renvoie la sortie des blocs complets ("" si aucun).
+        Lève ValueError si l'en-tête ne contient pas toutes les colonnes du modèle.
+        """
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        out: List[str] = []
+        self._process(lines, out)
+        return "".join(out)
+
+    def close(self, text: str = "") -> str:
+        """
+        Traite la fin du flux (dernière ligne sans retour à la ligne et bloc incomplet).
+        """
+        out = [self.feed(text + "\n")]
+        while self._record is not None:
+            # Guillemet jamais refermé : première ligne rejetée, les suivantes relues
+            self._process(self._reject(out), out)
+        if self.columns is None:
+            raise ValueError("CSV vide : en-tête absent.")
+        if self._lines:
+            out.append(self._flush())
+        return "".join(out)
+
+    def _process(self, lines: Iterable[str], out: List[str]) -> None:
+        queue = deque(lines)
+        while queue:
+            line = queue.popleft()
+            # Nombre impair de guillemets depuis le début de l'enregistrement : le retour à la ligne est à
+            # l'intérieur d'un champ ("" échappé compte double et ne change pas la parité). La parité est
+            # suivie ligne par ligne, l'enregistrement n'est recollé qu'une fois complet.
+            odd = line.count('"') % 2
+            if self._record is None:
+                if odd:
+                    self._record, self._record_chars = [line], len(line)
+                else:
+                    self._add(line, out)
+                continue
+            self._record.append(line)
+            self._record_chars += len(line) + 1
+            if odd:
+                record, self._record = self._record, None
+                self._add("\n".join(record), out)
+            elif len(self._record) > MAX_RECORD_LINES or self._record_chars > MAX_RECORD_CHARS:
+                queue.extendleft(reversed(self._reject(out)))
+
+    def _reject(self, out: List[str]) -> List[str]:
+        # Enregistrement en attente abandonné : sa première ligne devient une ligne invalide, les suivantes
+        # (renvoyées) sont à relire
+        record, self._record = self._record, None
+        self._add(record[0], out, rejected=True)
+        return record[1:]
+
+    def _add(self, line: str, out: List[str], rejected: bool = False) -> None:
+        line = line.rstrip("\r")
+        if not line.strip():
+            return
+        if self.columns is None:
+            self._read_header(line)
+            out.append(OUTPUT_HEADER)
+            return
+        if rejected:
+            self._rejected.append(len(self._lines))
+        self._lines.append(line)
+        if len(self._lines) >= self.chunk_rows:
+            out.append(self._flush())
+
+    def _flush(self) -> str:
+        lines, self._lines = self._lines, []
+        rejected, self._rejected = self._rejected, []
+        rows = [_parse_record(line) for line in lines]
+        first = self.n_rows
+        self.n_rows += len(rows)
+
+        # Lignes lisibles, au bon nombre de champs et non rejetées -> matrice de chaînes (n, n_champs)
+        complete = np.array([r is not None and len(r) == self.n_fields for r in rows], dtype=bool)
+        complete[rejected] = False
+        cells = np.array([r for r, ok in zip(rows, complete) if ok], dtype=str).reshape(-1, self.n_fields)
+        if self.id_column is not None:
+            # Enregistrement mal formé : ID relu sans contrôle, pour repérer la ligne dans la sortie
+            fields = [r if r is not None else next(csv.reader([line]), []) for r, line in zip(rows, lines)]
+            ids = [r[self.id_column] if len(r) > self.id_column else "" for r in fields]
+        else:
+            # Sans colonne ID : numéro de ligne (0 = première ligne de données)
+            ids = np.arange(first, first + len(rows)).astype(str)
+
+        # Encodage vectorisé du schéma : âge entier borné, Yes/No, Male/Female -> 0/1
+        codes, valid = encode_text(cells[:, self.columns])
+        X = codes[valid].astype(np.float64)
+        scores = self.score_fn(X) if len(X) else np.empty(0)
+
+        probability = np.full(len(rows), "", dtype=object)
+        label = np.full(len(rows), "", dtype=object)
+        row_valid = np.zeros(len(rows), dtype=bool)
+        row_valid[np.flatnonzero(complete)[valid]] = True
+        probability[row_valid] = np.char.mod("%.4f", scores)
+        label[row_valid] = np.where(scores >= self.threshold, "1", "0")
+        self.n_invalid += len(rows) - int(row_valid.sum())
+
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(zip(ids, label, probability))
+        return buffer.getvalue()
+
+
+def _parse_record(line: str) -> Optional[List[str]]:
+    """
+    Champs d'un enregistrement (None s'il est mal formé). Chaque enregistrement est lu seul : un guillemet non
+    refermé ne peut pas déborder sur les enregistrements suivants.
+    """
+    if '"' not in line:
+        return line.split(",")
+    try:
+        return next(csv.reader([line], strict=True))
+    except csv.Error:
+        return None
+
+
+def score_file(src, dst, score_fn: Callable[[np.ndarray], np.ndarray], chunk_rows: int = CHUNK_ROWS,
+               threshold: float = 0.5) -> CohortScorer:
+    """
+    Score un fichier binaire ouvert (src) vers un fichier texte (dst), bloc par bloc.
+    """
+    scorer = CohortScorer(score_fn, chunk_rows, threshold)
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    for block in iter(lambda: src.read(READ_BLOCK_BYTES), b""):
+        dst.write(scorer.feed(decoder.decode(block)))
+    dst.write(scorer.close(decoder.decode(b"", final=True)))
+    return scorer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score un CSV de cohorte en flux (sortie ID,class,probability).")
+    parser.add_argument("csv", help="CSV brut (ex. data/test_without_class.csv), '-' pour l'entrée standard")
+    parser.add_argument("--out", help="Fichier de sortie (défaut : sortie standard)")
+    parser.add_argument("--model", default="modele_diabete_XX.pkl")
+    parser.add_argument("--artifact", default="modele_diabete_XX.model", help="Artefact NumPy (cf. forest_engine.py)")
+    parser.add_argument("--table", default="modele_diabete_XX.table.npz", help="Table de scores (cf. score_table.py)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--operating-point", default=None, help="Seuil de décision (cf. calibration.py), défaut : default")
+    args = parser.parse_args()
+
+    import os
+    from calibration import Calibration
+    from forest_engine import load_model
+    from score_table import ScoreTable
+
+    model, model_sha256 = load_model(args.model, args.artifact)
+    model.check_feature_order(FEATURE_COLUMNS)
+    table = ScoreTable.load(args.table) if os.path.exists(args.table) else None
+    if table is not None and (table.model_sha256 != model_sha256 or table.feature_columns != FEATURE_COLUMNS):
+        print(f"ATTENTION: {args.table} ne correspond pas au modèle, table ignorée.", file=sys.stderr)
+        table = None
+    calibration = Calibration.from_metadata(model.metadata)
+    try:
+        threshold = calibration.threshold(args.operating_point)
+    except KeyError:
+        raise SystemExit(f"ERREUR: point de fonctionnement inconnu {args.operating_point!r} "
+                         f"(disponibles : {list(calibration.operating_points)})")
+
+    def score_fn(X):
+        # Même logique que l'API : table de scores pour le domaine couvert, modèle pour le reste, puis calibration
+        # (sauf au point "default", sur le score brut)
+        if table is None:
+            return calibration.probabilities(model.predict_proba(X)[:, 1], args.operating_point)
+        scores, covered = table.lookup(X)
+        if not covered.all():
+            scores[~covered] = model.predict_proba(X[~covered])[:, 1]
+        return calibration.probabilities(scores, args.operating_point)
+
+    src = sys.stdin.buffer if args.csv == "-" else open(args.csv, "rb")
+    dst = open(args.out, "w", newline="", encoding="utf-8") if args.out else sys.stdout
+    try:
+        scorer = score_file(src, dst, score_fn, args.chunk_rows, threshold)
+    except ValueError as e:
+        raise SystemExit(f"ERREUR: {e}")
+    finally:
+        if src is not sys.stdin.buffer:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    print(f"{scorer.n_rows} lignes scorées, {scorer.n_invalid} invalide(s).", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+# feature_schema.py
+
+# --- Schéma déclaratif des caractéristiques du modèle ---
+#
+# Source unique de vérité sur les entrées du modèle. On en dérive :
+#   - FEATURE_COLUMNS : l'ordre des colonnes à l'entraînement (ordre de SCHEMA) ;
+#   - patient_model() : le modèle Pydantic des API (bornes et descriptions incluses) ;
+#   - encode_text() / encode_frame() : l'encodage vectorisé des colonnes texte d'un CSV brut
+#     ("Sudden weight loss", Yes/No, Male/Female, classe Positive/Negative) vers les entiers du modèle,
+#     partagé par train.py, cohort.py, incremental.py et features.py.
+# Ajouter, renommer ou borner une caractéristique se fait ici seulement : l'entraînement, le scoring par lots
+# et les API ne peuvent plus diverger.
+#
+# Encodage (sans boucle Python par cellule) : chaque cellule de 8 caractères latin-1 au plus devient une clé
+# uint64 (ses octets), cherchée dans une table de hachage parfaite du vocabulaire (variantes de casse
+# comprises), en un seul passage pour toutes les colonnes qui partagent un vocabulaire. Les âges sont lus
+# chiffre par chiffre sur la vue uint32 des chaînes. Seules les valeurs distinctes non reconnues par ce
+# chemin (espaces, casse mixte, accents) sont normalisées en Python, puis rejetées si elles restent inconnues :
+# une cellule invalide invalide sa ligne, elle n'est jamais remplacée par 0.
+#
+# Source unique, comme forest_engine.py : les services de "ML Seb/part 3" et ML_Flavie l'importent depuis ce
+# répertoire (PYTHONPATH en local, copié par les Dockerfile de ML_Flavie), sans copie dans le dépôt.
+#
+# Régénérer le CSV nettoyé de l'entraînement à partir des données brutes (remplace la boucle du notebook) :
+#   python feature_schema.py clean ../../data/train_with_id.csv --out ../../data/diabetes_clean.csv
+
+import argparse
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Longueur maximale (en caractères) d'une valeur du vocabulaire : une clé uint64 = 8 octets
+_KEY_CHARS = 8
+
+# Nombre maximal de chiffres d'un entier lu par le chemin vectorisé (au-delà : chemin lent, puis bornes)
+_MAX_DIGITS = 9
+
+YES_NO = {"no": 0, "yes": 1, "0": 0, "1": 1}
+FEMALE_MALE = {"female": 0, "male": 1, "0": 0, "1": 1}
+NEGATIVE_POSITIVE = {"negative": 0, "positive": 1, "0": 0, "1": 1}
+
+MAX_AGE = 150
+
+
+def _text_keys(flat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Clés uint64 d'un tableau 1-D de chaînes (octets des 8 premiers caractères) et masque des clés exactes
+    (chaîne de 8 caractères au plus, tous latin-1) : deux chaînes exactes sont égales ssi leurs clés le sont.
+    """
+    width = flat.dtype.itemsize // 4
+    if width == 0:
+        return np.zeros(len(flat), dtype=np.uint64), np.ones(len(flat), dtype=bool)
+    points = np.ascontiguousarray(flat).view(np.uint32).reshape(len(flat), width)
+    head = points[:, :_KEY_CHARS]
+    keys = np.zeros((len(flat), _KEY_CHARS), dtype=np.uint8)
+    keys[:, :head.shape[1]] = head  # troncature à l'octet de poids faible, vérifiée ci-dessous
+    exact = np.ones(len(flat), dtype=bool)
+    if (head > 0xFF).any():
+        exact &= (head <= 0xFF).all(axis=1)
+    if width > _KEY_CHARS:
+        exact &= points[:, _KEY_CHARS] == 0
+    return keys.view(np.uint64).ravel(), exact
+
+
+class Feature:
+    """
+    Une entrée du modèle : entier borné [minimum, maximum], éventuellement encodé depuis un vocabulaire
+    texte -> code (clés en minuscules, sans espaces).
+    """
+    __slots__ = ("name", "minimum", "maximum", "vocabulary", "description", "_keys", "_codes", "_modulus")
+
+    def __init__(self, name: str, minimum: int = 0, maximum: int = 1, vocabulary: Optional[Dict[str, int]] = None,
+                 description: str = ""):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.vocabulary = vocabulary
+        self.description = description
+        self._keys = self._codes = self._modulus = None
+        if vocabulary is not None:
+            # Table de hachage parfaite des clés de toutes les variantes de casse (no, No, NO) : case = clé % modulus,
+            # le plus petit modulus sans collision (quelques dizaines de cases)
+            variants = {v: code for text, code in vocabulary.items()
+                        for v in (text, text.lower(), text.upper(), text.capitalize())}
+            keys, exact = _text_keys(np.array(list(variants), dtype=str))
+            if not exact.all():
+                raise ValueError(f"{name} : les valeurs du vocabulaire doivent faire au plus {_KEY_CHARS} caractères latin-1")
+            modulus = len(keys)
+            while len(np.unique(keys % np.uint64(modulus))) < len(keys):
+                modulus += 1
+            slots = (keys % np.uint64(modulus)).astype(np.intp)
+            self._modulus = np.uint64(modulus)
+            self._keys = np.zeros(modulus, dtype=np.uint64)
+            self._keys[slots] = keys
+            self._codes = np.full(modulus, -1, dtype=np.int32)  # -1 : case vide
+            self._codes[slots] = list(variants.values())
+
+    @property
+    def categorical(self) -> bool:
+        return self.vocabulary is not None
+
+    def parse(self, text: str) -> Optional[int]:
+        """
+        Version scalaire (lente) de l'encodage d'une cellule : None si la valeur n'est pas reconnue.
+        """
+        text = text.strip().lower()
+        if self.vocabulary is not None:
+            return self.vocabulary.get(text)
+        # isdigit() seul accepte les chiffres Unicode ('²', '٣') que int() refuse ou convertit
+        if not (text.isascii() and text.isdigit()):
+            return None
+        return int(text)
+
+
+# Ordre = ordre des colonnes à l'entraînement (cf. data/diabetes_clean.csv)
+SCHEMA: Tuple[Feature, ...] = (
+    Feature("age", 0, MAX_AGE, description=f"Âge du patient (0-{MAX_AGE})"),
+    Feature("gender", vocabulary=FEMALE_MALE, description="1 = Homme (Male), 0 = Femme (Female)"),
+    Feature("polyuria", vocabulary=YES_NO, description="Polyurie : 1 = Oui, 0 = Non"),
+    Feature("polydipsia", vocabulary=YES_NO, description="Polydipsie : 1 = Oui, 0 = Non"),
+    Feature("sudden_weight_loss", vocabulary=YES_NO, description="Perte de poids soudaine : 1 = Oui, 0 = Non"),
+    Feature("weakness", vocabulary=YES_NO, description="Faiblesse : 1 = Oui, 0 = Non"),
+    Feature("polyphagia", vocabulary=YES_NO, description="Polyphagie : 1 = Oui, 0 = Non"),
+    Feature("genital_thrush", vocabulary=YES_NO, description="Mycose génitale : 1 = Oui, 0 = Non"),
+    Feature("visual_blurring", vocabulary=YES_NO, description="Vision floue : 1 = Oui, 0 = Non"),
+    Feature("itching", vocabulary=YES_NO, description="Démangeaisons : 1 = Oui, 0 = Non"),
+    Feature("irritability", vocabulary=YES_NO, description="Irritabilité : 1 = Oui, 0 = Non"),
+    Feature("delayed_healing", vocabulary=YES_NO, description="Cicatrisation lente : 1 = Oui, 0 = Non"),
+    Feature("partial_paresis", vocabulary=YES_NO, description="Parésie partielle : 1 = Oui, 0 = Non"),
+    Feature("muscle_stiffness", vocabulary=YES_NO, description="Raideur musculaire : 1 = Oui, 0 = Non"),
+    Feature("alopecia", vocabulary=YES_NO, description="Alopécie : 1 = Oui, 0 = Non"),
+    Feature("obesity", vocabulary=YES_NO, description="Obésité : 1 = Oui, 0 = Non"),
+)
+
+# Classe à prédire (données d'entraînement uniquement)
+LABEL = Feature("class", vocabulary=NEGATIVE_POSITIVE, description="1 = Diabète (Positive), 0 = Negative")
+
+FEATURE_COLUMNS: List[str] = [f.name for f in SCHEMA]
+TARGET_COLUMN = LABEL.name
+
+
+def normalize_column(name: str) -> str:
+    """
+    Nom de colonne normalisé comme dans le notebook : minuscules, espaces remplacés par '_'.
+    """
+    return name.strip().lower().replace(" ", "_")
+
+
+def column_indices(header: Sequence[str], names: Sequence[str] = FEATURE_COLUMNS) -> List[int]:
+    """
+    Indice de chaque colonne `names` dans un en-tête brut ("Sudden weight loss") ; ValueError s'il en manque.
+    """
+    normalized = [normalize_column(c) for c in header]
+    missing = [c for c in names if c not in normalized]
+    if missing:
+        raise ValueError(f"Colonnes manquantes : {missing}")
+    return [normalized.index(c) for c in names]
+
+
+# --- Modèle Pydantic des API ---
+
+def patient_model(name: str = "PatientFeatures"):
+    """
+    Modèle Pydantic d'un patient, généré depuis SCHEMA : un champ entier borné par caractéristique, dans
+    l'ordre d'entraînement (list(Model.model_fields) == FEATURE_COLUMNS).
+    """
+    from pydantic import Field, create_model
+
+    fields = {
+        f.name: (int, Field(..., ge=f.minimum, le=f.maximum, description=f.description))
+        for f in SCHEMA
+    }
+    return create_model(name, __doc__="Caractéristiques d'un patient, dans l'ordre d'entraînement du modèle.", **fields)
+
+
+# --- Encodage vectorisé du texte ---
+
+def _lookup(keys: np.ndarray, exact: np.ndarray, feature: Feature) -> Tuple[np.ndarray, np.ndarray]:
+    slots = keys % feature._modulus
+    codes = feature._codes[slots]
+    return codes, exact & (codes >= 0) & (feature._keys[slots] == keys)
+
+
+def _parse_digits(flat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Entier décimal sans signe ni espace, au plus _MAX_DIGITS chiffres ; sinon : chemin lent
+    width = flat.dtype.itemsize // 4
+    values = np.zeros(len(flat), dtype=np.int64)
+    known = np.zeros(len(flat), dtype=bool)
+    if width == 0:
+        return values, known
+    points = np.ascontiguousarray(flat).view(np.uint32).reshape(len(flat), width)
+    known = points[:, 0] != 0
+    if width > _MAX_DIGITS:
+        known &= points[:, _MAX_DIGITS] == 0
+    for k in range(min(width, _MAX_DIGITS)):
+        digit = points[:, k].astype(np.int64) - ord("0")
+        present = points[:, k] != 0
+        known &= ~present | ((digit >= 0) & (digit <= 9))
+        values = np.where(present, values * 10 + digit, values)
+    return values, known
+
+
+def encode_text(cells, features: Sequence[Feature] = SCHEMA) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encode une matrice de chaînes (n, len(features)), colonnes dans l'ordre de `features`.
+    Renvoie (codes int64 (n, len(features)), masque des lignes valides : toutes les cellules reconnues et dans
+    les bornes) ; les cellules invalides valent 0.
+    """
+    cells = np.asarray(cells)
+    if cells.dtype.kind != "U":
+        cells = cells.astype(str)
+    cells = cells.reshape(len(cells), len(features))
+    n = len(cells)
+    codes = np.zeros((n, len(features)), dtype=np.int64)
+    valid = np.ones(n, dtype=bool)
+
+    # Colonnes regroupées par vocabulaire : une seule recherche pour les 14 colonnes Yes/No
+    groups: Dict[int, List[int]] = {}
+    for j, feature in enumerate(features):
+        groups.setdefault(id(feature.vocabulary), []).append(j)
+
+    # Clés de toutes les cellules en un seul passage (colonnes texte comme âge, ces dernières inutilisées)
+    keys, exact = _text_keys(np.ascontiguousarray(cells).ravel())
+    keys, exact = keys.reshape(n, len(features)), exact.reshape(n, len(features))
+
+    for columns in groups.values():
+        feature = features[columns[0]]
+        minimum = np.array([features[j].minimum for j in columns])
+        maximum = np.array([features[j].maximum for j in columns])
+        # Colonnes consécutives (cas de SCHEMA) : vue sans copie
+        block = columns
+        if columns == list(range(columns[0], columns[-1] + 1)):
+            block = slice(columns[0], columns[-1] + 1)
+        if feature.categorical:
+            values, known = _lookup(keys[:, block], exact[:, block], feature)
+        else:
+            values, known = _parse_digits(np.ascontiguousarray(cells[:, block]).ravel())
+            values, known = values.reshape(n, len(columns)), known.reshape(n, len(columns))
+
+        # Variantes rares (espaces, casse mixte...) : normalisation sur les seules valeurs distinctes
+        rows, positions = np.nonzero(~known)
+        if len(rows):
+            texts = cells[:, block][rows, positions]
+            distinct, inverse = np.unique(texts, return_inverse=True)
+            parsed = [feature.parse(text) for text in distinct.tolist()]
+            values[rows, positions] = np.array([-1 if v is None else v for v in parsed], dtype=np.int64)[inverse]
+            known[rows, positions] = np.array([v is not None for v in parsed], dtype=bool)[inverse]
+
+        known &= (values >= minimum) & (values <= maximum)
+        codes[:, block] = np.where(known, values, 0)
+        valid &= known.all(axis=1)
+    return codes, valid
+
+
+def encode_labels(values) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encode la classe (Positive/Negative ou 1/0) : renvoie (0/1 int64, masque des valeurs reconnues).
+    """
+    codes, known = encode_text(np.asarray(values).reshape(-1, 1), (LABEL,))
+    return codes[:, 0], known
+
+
+def encode_frame(df, with_label: bool = False) -> Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]:
+    """
+    Encode un DataFrame brut ou nettoyé (en-têtes quelconques, cf. normalize_column ; lu de préférence avec
+    dtype=str et keep_default_na=False). Renvoie (X int64 (n, 16) dans l'ordre FEATURE_COLUMNS, y ou None,
+    masque des lignes valides). with_label=True exige la colonne 'class'.
+    """
+    names = FEATURE_COLUMNS + [TARGET_COLUMN] if with_label else FEATURE_COLUMNS
+    indices = column_indices([str(c) for c in df.columns], names)
+    cells = df.iloc[:, indices].to_numpy(dtype=str)
+    X, valid = encode_text(cells[:, :len(SCHEMA)])
+    y = None
+    if with_label:
+        y, known = encode_labels(cells[:, len(SCHEMA)])
+        valid &= known
+    return X, y, valid
+
+
+def read_csv(path: str, with_label: bool = False) -> Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]:
+    """
+    encode_frame sur un fichier CSV (toutes les cellules lues comme texte : une valeur manquante est une
+    cellule vide, donc invalide).
+    """
+    import pandas as pd
+    return encode_frame(pd.read_csv(path, dtype=str, keep_default_na=False), with_label)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Schéma des caractéristiques du modèle et encodage des CSV bruts.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_clean = sub.add_parser("clean", help="Encode un CSV brut (Yes/No, Male/Female) en CSV nettoyé (0/1)")
+    p_clean.add_argument("csv")
+    p_clean.add_argument("--out", required=True)
+    sub.add_parser("show", help="Affiche le schéma")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        for f in SCHEMA + (LABEL,):
+            values = ", ".join(f"{k}={v}" for k, v in f.vocabulary.items()) if f.categorical else f"{f.minimum}..{f.maximum}"
+            print(f"{f.name:<20} {values}")
+        return
+
+    import pandas as pd
+    df = pd.read_csv(args.csv, dtype=str, keep_default_na=False)
+    with_label = TARGET_COLUMN in [normalize_column(str(c)) for c in df.columns]
+    X, y, valid = encode_frame(df, with_label)
+    clean = pd.DataFrame(X[valid], columns=FEATURE_COLUMNS)
+    if with_label:
+        clean[TARGET_COLUMN] = y[valid]
+    clean.to_csv(args.out, index=False)
+    n_invalid = int((~valid).sum())
+    if n_invalid:
+        print(f"ATTENTION: {n_invalid} ligne(s) invalide(s) ignorée(s) (lignes {list(np.flatnonzero(~valid)[:10] + 2)}...)")
+    print(f"{len(clean)} lignes -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
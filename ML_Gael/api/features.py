@@ -0,0 +1,168 @@
+# features.py
+
+# --- Caractéristiques du modèle et encodage compact ---
+#
+# Toutes les entrées du modèle sont binaires sauf 'age' : les 15 caractéristiques binaires
+# (gender + 14 symptômes) tiennent dans un seul entier de 15 bits (bit i = BINARY_FEATURES[i]).
+#
+# Format compact d'un jeu de données (PACKED_DTYPE, 4 octets par ligne au lieu de 17 colonnes int64) :
+#   age (uint8) | mask (uint16, gender + 14 symptômes) | label (uint8, classe ou 255 si inconnue)
+# stocké dans un .npy lisible par mmap :
+#   python features.py pack ../../data/diabetes_clean.csv --out ../../data/diabetes_clean.packed.npy
+#
+# Les colonnes, leur ordre et l'encodage des fichiers bruts ("Sudden weight loss", Yes/No, Male/Female)
+# sont définis par le schéma déclaratif de feature_schema.py.
+
+import argparse
+from typing import Optional, Tuple
+
+import numpy as np
+
+from feature_schema import FEATURE_COLUMNS, TARGET_COLUMN, encode_frame, normalize_column
+
+BINARY_FEATURES = FEATURE_COLUMNS[1:]
+
+# Nombre de combinaisons possibles des caractéristiques binaires (2^15 = 32768)
+N_SYMPTOM_COMBINATIONS = 1 << len(BINARY_FEATURES)
+
+# Poids de chaque bit, dans l'ordre de BINARY_FEATURES
+_BIT_WEIGHTS = (1 << np.arange(len(BINARY_FEATURES))).astype(np.uint16)
+
+# Enregistrement compact d'une ligne ; label = NO_LABEL pour un patient sans classe connue
+PACKED_DTYPE = np.dtype([("age", np.uint8), ("mask", np.uint16), ("label", np.uint8)])
+NO_LABEL = 255
+MAX_PACKED_AGE = np.iinfo(np.uint8).max
+
+
+def pack_symptoms(binary_values) -> np.ndarray:
+    """
+    Encode une matrice (n, 15) de 0/1 en un masque uint16 par ligne.
+    """
+    binary_values = np.asarray(binary_values)
+    return (binary_values.astype(np.uint16) * _BIT_WEIGHTS).sum(axis=-1, dtype=np.uint16)
+
+
+def unpack_symptoms(masks) -> np.ndarray:
+    """
+    Décode des masques uint16 en une matrice (n, 15) de 0/1 (opération inverse de pack_symptoms).
+    """
+    masks = np.asarray(masks, dtype=np.uint16)
+    return ((masks[..., None] & _BIT_WEIGHTS) != 0).astype(np.uint8)
+
+
+def is_binary(binary_values) -> np.ndarray:
+    """
+    Indique, pour chaque ligne, si toutes les caractéristiques binaires valent bien 0 ou 1.
+    """
+    binary_values = np.asarray(binary_values)
+    return ((binary_values == 0) | (binary_values == 1)).all(axis=-1)
+
+
+def symptoms_mask(binary_values) -> Optional[int]:
+    """
+    Masque 15 bits d'un seul patient (version scalaire de pack_symptoms), ou None si une valeur n'est pas 0/1.
+    """
+    mask = 0
+    for i, value in enumerate(binary_values):
+        if value == 1:
+            mask |= 1 << i
+        elif value != 0:
+            return None
+    return mask
+
+
+def feature_key(age: int, binary_values) -> Optional[int]:
+    """
+    Clé entière canonique des 16 caractéristiques : (age << 15) | masque des symptômes.
+    Renvoie None si le patient ne peut pas être encodé (âge négatif ou valeur binaire différente de 0/1).
+    """
+    mask = symptoms_mask(binary_values)
+    if mask is None or age < 0:
+        return None
+    return (int(age) << len(BINARY_FEATURES)) | mask
+
+
+def pack_rows(X, labels=None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encode une matrice (n, 16) dans l'ordre FEATURE_COLUMNS au format PACKED_DTYPE.
+    Renvoie (lignes compactes, masque des lignes valides : âge entier dans [0, 255] et valeurs binaires 0/1) ;
+    les lignes invalides sont mises à zéro.
+    """
+    X = np.asarray(X)
+    ages = X[:, 0]
+    valid = (ages >= 0) & (ages <= MAX_PACKED_AGE) & (ages == np.floor(ages)) & is_binary(X[:, 1:])
+    packed = np.zeros(len(X), dtype=PACKED_DTYPE)
+    packed["age"][valid] = ages[valid]
+    packed["mask"][valid] = pack_symptoms(X[valid, 1:])
+    packed["label"] = NO_LABEL if labels is None else np.asarray(labels)
+    return packed, valid
+
+
+def unpack_rows(packed) -> np.ndarray:
+    """
+    Matrice float64 (n, 16) dans l'ordre FEATURE_COLUMNS (opération inverse de pack_rows), prête pour predict_proba.
+    """
+    packed = np.asarray(packed)
+    X = np.empty((len(packed), len(FEATURE_COLUMNS)), dtype=np.float64)
+    X[:, 0] = packed["age"]
+    X[:, 1:] = unpack_symptoms(packed["mask"])
+    return X
+
+
+def packed_keys(packed) -> np.ndarray:
+    """
+    Clés entières des lignes compactes (version vectorisée de feature_key) : dédoublonnage, clés de cache.
+    """
+    packed = np.asarray(packed)
+    return (packed["age"].astype(np.int64) << len(BINARY_FEATURES)) | packed["mask"]
+
+
+def save_packed(path: str, packed: np.ndarray) -> None:
+    np.save(path, np.asarray(packed, dtype=PACKED_DTYPE))
+
+
+def load_packed(path: str, mmap_mode: Optional[str] = "r") -> np.ndarray:
+    """
+    Charge un jeu de données compact (.npy), par défaut en mmap (lecture seule, sans copie en mémoire).
+    """
+    packed = np.load(path, mmap_mode=mmap_mode)
+    if packed.dtype != PACKED_DTYPE:
+        raise ValueError(f"{path} n'est pas au format compact : {packed.dtype}")
+    return packed
+
+
+def pack_csv(csv_path: str, chunk_rows: int = 100000) -> Tuple[np.ndarray, int]:
+    """
+    Encode un CSV nettoyé ou brut (cf. feature_schema.py, colonne 'class' facultative) au format compact, par blocs.
+    Renvoie (lignes compactes valides, nombre de lignes invalides ignorées).
+    """
+    import pandas as pd
+
+    chunks, n_invalid = [], 0
+    for df in pd.read_csv(csv_path, chunksize=chunk_rows, dtype=str, keep_default_na=False):
+        with_label = TARGET_COLUMN in [normalize_column(c) for c in df.columns]
+        X, labels, valid = encode_frame(df, with_label)
+        packed, packable = pack_rows(X, labels)
+        valid &= packable
+        chunks.append(packed[valid])
+        n_invalid += int((~valid).sum())
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=PACKED_DTYPE), n_invalid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Format compact des jeux de données (âge uint8 + masque uint16).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_pack = sub.add_parser("pack", help="Encode un CSV nettoyé en .npy compact")
+    p_pack.add_argument("csv")
+    p_pack.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    packed, n_invalid = pack_csv(args.csv)
+    save_packed(args.out, packed)
+    unique = len(np.unique(packed_keys(packed)))
+    print(f"{len(packed)} lignes ({unique} patients distincts, {n_invalid} invalide(s) ignorée(s)), "
+          f"{packed.nbytes} octets -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
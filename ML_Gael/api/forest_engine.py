@@ -0,0 +1,418 @@
+# forest_engine.py
+
+# --- Moteur d'inférence NumPy pour le pipeline RandomForest ---
+#
+# Le pipeline entraîné (ColumnTransformer(StandardScaler sur 'age') + RandomForestClassifier) est
+# "aplati" en tableaux NumPy contigus :
+#   - préprocesseur : colonne source, décalage (moyenne) et échelle de chaque colonne de sortie
+#   - arbres        : feature, threshold, children (gauche/droite entrelacés), value (probabilité
+#                     positive de chaque nœud), tous les arbres concaténés, et la racine de chaque arbre
+#
+# L'évaluation parcourt tous les arbres pour tout un lot en même temps (un pas de profondeur par
+# itération), sans scikit-learn, pandas ni joblib au moment de servir.
+#
+# Sans export NumPy, ArrayPipeline enveloppe le pipeline scikit-learn pour qu'il accepte directement
+# des tableaux NumPy (pas de DataFrame ni de vérification des noms de colonnes à chaque appel).
+#
+# --- Format d'artefact sur disque (version 1) ---
+#
+#   modele_diabete_XX.model/
+#     manifest.json   ordre des colonnes, paramètres du scaler, version de scikit-learn,
+#                     empreintes du pickle source et des données d'entraînement, description des tableaux
+#     feature.npy  threshold.npy  children.npy  value.npy  roots.npy
+#
+# Les .npy sont ouverts avec mmap_mode='r' : le chargement prend quelques millisecondes (rien n'est
+# désérialisé) et les pages sont partagées entre tous les processus qui lisent le même fichier.
+#
+# Source unique : les services de "ML Seb/part 3" et ML_Flavie importent ce fichier depuis ce répertoire
+# (PYTHONPATH=../../ML_Gael/api en local ; copié dans les images par les Dockerfile de ML_Flavie), il n'en
+# existe pas de copie.
+#
+# Usage :
+#   python forest_engine.py export --model modele_diabete_XX.pkl --out modele_diabete_XX.model [--data ../../data/diabetes_clean.csv]
+#   python forest_engine.py verify --model modele_diabete_XX.pkl --artifact modele_diabete_XX.model --data ../../data/diabetes_clean.csv
+#   python forest_engine.py bench  --model modele_diabete_XX.pkl --artifact modele_diabete_XX.model
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+# Valeur utilisée par scikit-learn pour marquer les feuilles (tree_.feature == TREE_LEAF)
+TREE_LEAF = -2
+
+# Version du format d'artefact (manifest.json + .npy) et tableaux qui le composent
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+TREE_ARRAYS = ("feature", "threshold", "children", "value", "roots")
+
+# Classifieurs dont la probabilité est la moyenne des probabilités des arbres (seuls exportables)
+FOREST_CLASSIFIERS = ("RandomForestClassifier", "ExtraTreesClassifier")
+
+
+def file_sha256(path: str) -> str:
+    """
+    Empreinte SHA-256 d'un fichier (lien entre un pickle, son artefact, sa table de scores et le registre).
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _is_passthrough(transformer) -> bool:
+    if isinstance(transformer, str):
+        return transformer == "passthrough"
+    # Depuis scikit-learn 1.4, le 'remainder' passthrough est un FunctionTransformer identité
+    return type(transformer).__name__ == "FunctionTransformer" and transformer.func is None
+
+
+def export_preprocessor(preprocessor, feature_names):
+    """
+    Traduit un ColumnTransformer (StandardScaler et/ou passthrough) en trois tableaux :
+    colonne source, décalage et échelle de chaque colonne de sortie.
+    """
+    feature_names = list(feature_names)
+    source, offset, scale = [], [], []
+    for name, transformer, columns in preprocessor.transformers_:
+        if transformer == "drop" or len(columns) == 0:
+            continue
+        indices = [feature_names.index(c) if isinstance(c, str) else int(c) for c in columns]
+        if _is_passthrough(transformer):
+            mean, std = np.zeros(len(indices)), np.ones(len(indices))
+        elif type(transformer).__name__ == "StandardScaler":
+            mean = transformer.mean_ if transformer.with_mean else np.zeros(len(indices))
+            std = transformer.scale_ if transformer.with_std else np.ones(len(indices))
+        else:
+            raise ValueError(f"Transformation non supportée par le moteur NumPy : {name} ({type(transformer).__name__})")
+        source.extend(indices)
+        offset.extend(mean)
+        scale.extend(std)
+    return np.asarray(source, dtype=np.int64), np.asarray(offset, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+
+def export_forest(classifier) -> dict:
+    """
+    Concatène les arbres d'un RandomForestClassifier binaire en tableaux contigus, directement dans
+    les types utilisés à l'inférence (indices intp) pour pouvoir être lus par mmap sans conversion.
+    Les feuilles bouclent sur elles-mêmes (enfants = nœud) pour permettre un parcours à profondeur fixe.
+    """
+    if len(classifier.classes_) != 2:
+        raise ValueError("Le moteur NumPy ne gère que la classification binaire.")
+
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    for estimator in classifier.estimators_:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count)
+        is_leaf = tree.feature == TREE_LEAF
+
+        # Même normalisation que DecisionTreeClassifier.predict_proba
+        value = tree.value[:, 0, :]
+        normalizer = value.sum(axis=1)
+        normalizer[normalizer == 0.0] = 1.0
+
+        left = np.where(is_leaf, node_ids, tree.children_left) + offset
+        right = np.where(is_leaf, node_ids, tree.children_right) + offset
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        # Enfants entrelacés [gauche, droite] : une seule lecture par niveau de profondeur
+        children.append(np.stack([left, right], axis=1).ravel())
+        values.append(value[:, 1] / normalizer)
+        roots.append(offset)
+        offset += tree.node_count
+
+    return {
+        "feature": np.concatenate(features).astype(np.intp),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "children": np.concatenate(children).astype(np.intp),
+        "value": np.concatenate(values).astype(np.float64),
+        "roots": np.asarray(roots, dtype=np.intp),
+    }
+
+
+class _ArrayPreprocessor:
+    """
+    Préprocesseur exporté (colonne source, décalage, échelle) appliqué à une matrice NumPy
+    dont les colonnes sont dans l'ordre feature_names.
+    """
+
+    def transform(self, X) -> np.ndarray:
+        """
+        Équivalent du ColumnTransformer : sélection/réordonnancement des colonnes puis (x - moyenne) / échelle.
+        """
+        if hasattr(X, "columns"):
+            X = X[self.feature_names].to_numpy()
+        X = np.asarray(X, dtype=np.float64)[:, self.source]
+        X -= self.offset
+        X /= self.scale
+        return X
+
+    def check_feature_order(self, columns) -> None:
+        """
+        Vérifie (une seule fois, au démarrage) que les colonnes fournies par l'API sont dans l'ordre d'entraînement.
+        """
+        if list(columns) != self.feature_names:
+            raise ValueError(f"Ordre des colonnes incompatible avec le modèle : {list(columns)} != {self.feature_names}")
+
+
+class ArrayPipeline(_ArrayPreprocessor):
+    """
+    Enveloppe un pipeline scikit-learn (ColumnTransformer + classifieur) pour accepter des tableaux NumPy.
+    Le préprocesseur est appliqué directement en NumPy ; le classifieur, entraîné sur la sortie (sans noms
+    de colonnes) du ColumnTransformer, ne refait donc aucune vérification de noms de colonnes.
+    """
+
+    def __init__(self, pipeline, metadata: dict = None):
+        self.pipeline = pipeline
+        self.metadata = metadata or {}
+        self.feature_names = [str(c) for c in pipeline.feature_names_in_]
+        self.source, self.offset, self.scale = export_preprocessor(pipeline[:-1][0], self.feature_names)
+        self.classifier = pipeline[-1]
+        self.classes_ = self.classifier.classes_
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self.classifier.predict_proba(self.transform(X))
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class NumpyForest(_ArrayPreprocessor):
+    """
+    Évaluateur vectorisé d'un pipeline exporté. Interface compatible avec le pipeline
+    scikit-learn pour les usages de l'API (predict_proba / predict).
+    """
+
+    def __init__(self, arrays: dict, manifest: dict):
+        self.manifest = manifest
+        self.feature_names = list(manifest["feature_names"])
+        self.model_sha256 = manifest.get("model_sha256") or ""
+        preprocessor = manifest["preprocessor"]
+        self.source = np.asarray(preprocessor["source"], dtype=np.intp)
+        self.offset = np.asarray(preprocessor["offset"], dtype=np.float64)
+        self.scale = np.asarray(preprocessor["scale"], dtype=np.float64)
+        self.classes_ = np.asarray(manifest["classes"])
+        self.max_depth = int(manifest["max_depth"])
+        # Métadonnées libres (ex. profil de latence enregistré par train.py)
+        self.metadata = manifest.get("metadata") or {}
+
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.children = arrays["children"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.n_trees = len(self.roots)
+
+    @property
+    def left(self) -> np.ndarray:
+        return self.children[0::2]
+
+    @property
+    def right(self) -> np.ndarray:
+        return self.children[1::2]
+
+    @classmethod
+    def from_pipeline(cls, pipeline, model_sha256: str = "", training_data_sha256: str = None,
+                      metadata: dict = None) -> "NumpyForest":
+        import sklearn
+
+        classifier = pipeline[-1]
+        if type(classifier).__name__ not in FOREST_CLASSIFIERS:
+            raise ValueError(f"Le moteur NumPy ne gère que les forêts aléatoires, pas {type(classifier).__name__}.")
+        source, offset, scale = export_preprocessor(pipeline[:-1][0], pipeline.feature_names_in_)
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "sklearn_version": sklearn.__version__,
+            "model_sha256": model_sha256,
+            "training_data_sha256": training_data_sha256,
+            "feature_names": [str(c) for c in pipeline.feature_names_in_],
+            "preprocessor": {"source": source.tolist(), "offset": offset.tolist(), "scale": scale.tolist()},
+            "classes": classifier.classes_.tolist(),
+            "n_trees": len(classifier.estimators_),
+            "max_depth": int(max(e.tree_.max_depth for e in classifier.estimators_)),
+            "metadata": metadata or {},
+        }
+        return cls(export_forest(classifier), manifest)
+
+    def save(self, directory: str) -> None:
+        """
+        Écrit l'artefact : un .npy par tableau, puis manifest.json (écrit en dernier, de façon atomique :
+        un répertoire sans manifeste n'est jamais considéré comme un artefact valide).
+        """
+        os.makedirs(directory, exist_ok=True)
+        arrays = {}
+        for name in TREE_ARRAYS:
+            array = np.ascontiguousarray(getattr(self, name))
+            np.save(os.path.join(directory, f"{name}.npy"), array)
+            arrays[name] = {"file": f"{name}.npy", "dtype": array.dtype.str, "shape": list(array.shape)}
+        manifest = dict(self.manifest, arrays=arrays, n_nodes=len(self.value))
+
+        tmp_path = os.path.join(directory, MANIFEST_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, os.path.join(directory, MANIFEST_FILE))
+        self.manifest = manifest
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: str = "r") -> "NumpyForest":
+        with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Version d'artefact non supportée : {manifest.get('format_version')} (attendue : {FORMAT_VERSION})")
+
+        arrays = {}
+        for name in TREE_ARRAYS:
+            spec = manifest["arrays"][name]
+            array = np.load(os.path.join(directory, spec["file"]), mmap_mode=mmap_mode)
+            if array.dtype.str != spec["dtype"] or list(array.shape) != spec["shape"]:
+                raise ValueError(f"Tableau {name} incohérent avec le manifeste : {array.dtype.str} {array.shape}")
+            arrays[name] = array
+        return cls(arrays, manifest)
+
+    @staticmethod
+    def is_artifact(path: str) -> bool:
+        return bool(path) and os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+    def predict_proba(self, X) -> np.ndarray:
+        # Les arbres de scikit-learn comparent les valeurs en float32 : on reproduit cette conversion
+        Xt = self.transform(X).astype(np.float32).astype(np.float64)
+        n_rows, n_features = Xt.shape
+        flat = Xt.ravel()
+        row_offset = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+        # nodes[i, t] : nœud courant de la ligne i dans l'arbre t (les feuilles bouclent sur elles-mêmes)
+        nodes = np.tile(self.roots, (n_rows, 1))
+        for _ in range(self.max_depth):
+            go_right = np.take(flat, row_offset + np.take(self.feature, nodes)) > np.take(self.threshold, nodes)
+            nodes = np.take(self.children, 2 * nodes + go_right)
+        positive = np.take(self.value, nodes).mean(axis=1)
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def _load_pipeline(path: str):
+    import joblib
+    return joblib.load(path)
+
+
+def _report_metadata(model_path: str, model_sha256: str) -> dict:
+    """
+    Métadonnées du rapport d'entraînement (<modèle>.report.json, cf. train.py) s'il décrit bien ce fichier modèle.
+    """
+    report_path = os.path.splitext(model_path)[0] + ".report.json"
+    try:
+        with open(report_path, encoding="utf-8") as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if report.get("model", {}).get("sha256") != model_sha256:
+        return {}
+    return report.get("metadata") or {}
+
+
+def load_model(model_path: str, artifact_path: str = None):
+    """
+    Charge l'artefact NumPy (artifact_path, mmap) s'il existe et a été exporté depuis model_path,
+    sinon le pipeline scikit-learn (pickle) enveloppé dans ArrayPipeline. Dans les deux cas, le modèle
+    renvoyé accepte des tableaux NumPy. Renvoie (modèle, empreinte SHA-256 du pickle source).
+    Lève FileNotFoundError si aucun des deux n'est disponible.
+    """
+    model_sha256 = file_sha256(model_path) if os.path.exists(model_path) else None
+    if NumpyForest.is_artifact(artifact_path):
+        try:
+            forest = NumpyForest.load(artifact_path)
+        except ValueError as e:
+            print(f"ATTENTION: artefact {artifact_path} illisible ({e}), utilisation du pickle.")
+        else:
+            if model_sha256 is None or forest.model_sha256 == model_sha256:
+                return forest, forest.model_sha256
+            print(f"ATTENTION: {artifact_path} ne correspond pas à {model_path}, artefact ignoré (relancez forest_engine.py export).")
+    pipeline = _load_pipeline(model_path)
+    return ArrayPipeline(pipeline, _report_metadata(model_path, model_sha256)), model_sha256
+
+
+def _time_per_call(fn, n_calls: int) -> float:
+    fn()  # premier appel (allocations, imports) exclu de la mesure
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        fn()
+    return (time.perf_counter() - start) / n_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Moteur d'inférence NumPy du pipeline RandomForest.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="Convertit le pipeline .pkl en artefact NumPy (manifest.json + .npy)")
+    p_export.add_argument("--model", default="modele_diabete_XX.pkl")
+    p_export.add_argument("--out", default="modele_diabete_XX.model")
+    p_export.add_argument("--data", help="CSV d'entraînement (empreinte enregistrée dans le manifeste)")
+
+    p_verify = sub.add_parser("verify", help="Compare le moteur NumPy à predict_proba sur un CSV")
+    p_verify.add_argument("--model", default="modele_diabete_XX.pkl")
+    p_verify.add_argument("--artifact", default="modele_diabete_XX.model")
+    p_verify.add_argument("--data", default="../../data/diabetes_clean.csv")
+    p_verify.add_argument("--tol", type=float, default=1e-9)
+
+    p_bench = sub.add_parser("bench", help="Compare les temps de chargement et latences scikit-learn / NumPy")
+    p_bench.add_argument("--model", default="modele_diabete_XX.pkl")
+    p_bench.add_argument("--artifact", default="modele_diabete_XX.model")
+    p_bench.add_argument("--data", default="../../data/diabetes_clean.csv")
+    p_bench.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        data_sha256 = file_sha256(args.data) if args.data else None
+        model_sha256 = file_sha256(args.model)
+        forest = NumpyForest.from_pipeline(_load_pipeline(args.model), model_sha256, data_sha256,
+                                           _report_metadata(args.model, model_sha256))
+        forest.save(args.out)
+        print(f"Export : {forest.n_trees} arbres, {len(forest.value)} nœuds, profondeur max {forest.max_depth} -> {args.out}")
+        return
+
+    import pandas as pd
+    from feature_schema import FEATURE_COLUMNS, read_csv
+    pipeline = _load_pipeline(args.model)
+    forest = NumpyForest.load(args.artifact)
+    # CSV nettoyé ou brut (en-têtes "Sudden weight loss", Yes/No) : encodage du schéma, comme cohort.py
+    codes, _, valid = read_csv(args.data)
+    if not valid.all():
+        print(f"ATTENTION: {int((~valid).sum())} ligne(s) invalide(s) ignorée(s) dans {args.data}")
+    X = pd.DataFrame(codes[valid], columns=FEATURE_COLUMNS)[forest.feature_names]
+
+    if args.command == "verify":
+        expected = pipeline.predict_proba(X)
+        max_error = float(np.abs(forest.predict_proba(X.to_numpy()) - expected).max())
+        print(f"{len(X)} lignes, écart maximal : {max_error:.3e} (tolérance {args.tol:.0e})")
+        if max_error > args.tol:
+            raise SystemExit(1)
+        return
+
+    # bench
+    row_df, row_np = X.iloc[:1], X.to_numpy()[:1]
+    batch = pd.concat([X] * (1000 // len(X) + 1)).iloc[:1000]
+    batch_np = batch.to_numpy()
+    wrapped = ArrayPipeline(pipeline)
+    results = {
+        "chargement pickle (joblib)": _time_per_call(lambda: _load_pipeline(args.model), 5),
+        "chargement artefact (mmap)": _time_per_call(lambda: NumpyForest.load(args.artifact), 50),
+        "scikit-learn, 1 ligne": _time_per_call(lambda: pipeline.predict_proba(row_df), args.calls),
+        "ArrayPipeline, 1 ligne": _time_per_call(lambda: wrapped.predict_proba(row_np), args.calls),
+        "NumPy,        1 ligne": _time_per_call(lambda: forest.predict_proba(row_np), args.calls),
+        "scikit-learn, 1000 lignes": _time_per_call(lambda: pipeline.predict_proba(batch), max(args.calls // 10, 1)),
+        "NumPy,        1000 lignes": _time_per_call(lambda: forest.predict_proba(batch_np), max(args.calls // 10, 1)),
+    }
+    for label, seconds in results.items():
+        print(f"{label:<28} {seconds * 1000:8.3f} ms/appel")
+
+
+if __name__ == "__main__":
+    main()
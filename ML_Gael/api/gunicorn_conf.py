@@ -0,0 +1,52 @@
+# gunicorn_conf.py
+
+# --- Configuration du serveur de production (plusieurs workers) ---
+#
+# Lancement : gunicorn -c gunicorn_conf.py app:app
+#
+# Le fichier ne s'appelle volontairement pas gunicorn.conf.py : Gunicorn charge automatiquement ce nom depuis le
+# répertoire courant, et un simple `gunicorn app:app` hériterait sans le savoir du préchargement, des workers
+# Uvicorn et de gc.freeze. Ici la configuration ne s'applique que si elle est demandée avec -c.
+#
+# Avec preload_app, app.py est importé UNE seule fois dans le processus maître ; API_PRELOAD_ARTIFACTS lui
+# demande de charger le modèle (et la table de scores...) dès cet import, puis les workers sont créés par fork :
+# ils partagent les pages mémoire du modèle (copy-on-write) au lieu de le charger chacun. Chaque worker exécute
+# ensuite seulement le lot de chauffe (lifespan) avant de répondre 200 sur /health/ready.
+
+import gc
+import glob
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# Nombre de workers (variable API_WORKERS du fichier .env)
+workers = int(os.getenv("API_WORKERS", "2"))
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Chargement du modèle dans le maître, à l'import de app.py, avant le fork des workers
+preload_app = True
+os.environ.setdefault("API_PRELOAD_ARTIFACTS", "1")
+
+# Métriques additionnées entre workers (cf. metrics.py) : sans ce répertoire, chaque scrape de /metrics ne verrait
+# que les compteurs du worker qui répond
+os.environ.setdefault("METRICS_MULTIPROC_DIR", "/tmp/diabete_metrics")
+
+timeout = int(os.getenv("API_TIMEOUT", "30"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    # États laissés par une exécution précédente : les compteurs repartent de zéro avec le nouveau maître
+    directory = os.environ["METRICS_MULTIPROC_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.json*")):
+        os.remove(path)
+
+
+def when_ready(server):
+    # Appelé après le préchargement et avant le fork des workers : tous les objets déjà créés (modèle compris)
+    # passent dans la génération permanente du ramasse-miettes. Les workers ne les parcourent plus, ce qui évite
+    # de modifier (et donc de dupliquer) les pages partagées. Le module app n'est pas réimporté ici.
+    gc.freeze()
+    server.log.info(f"Modèle préchargé, démarrage de {workers} worker(s)")
@@ -0,0 +1,576 @@
+# incremental.py
+
+# --- Ré-entraînement incrémental à partir des cas étiquetés ---
+#
+# Les nouveaux cas étiquetés (dépôts CSV, journal d'audit complété par l'issue confirmée) sont ajoutés à un
+# magasin de données compact, et le modèle servi est mis à jour sans repartir de zéro :
+#
+#   - Magasin (répertoire, cf. TrainingStore) : un segment .npy au format compact de features.py (4 octets par
+#     ligne, lu par mmap) par ajout, et manifest.json (segments, sources, statistiques cumulées des
+#     caractéristiques). Un segment est "applied" une fois la forêt entraînée dessus, "pending" sinon (dérive
+#     refusée, une seule classe) : seuls les segments appliqués forment l'historique (statistiques, rejeu). Un
+#     fichier source déjà appliqué (même empreinte) est ignoré ; celui d'un segment en attente est repris, sans
+#     nouvel ajout, par une nouvelle mise à jour (typiquement avec --force).
+#   - Évaluation chronologique : chaque segment est un pli de validation, évalué une seule fois par le modèle
+#     qui ne l'a pas encore vu, juste avant la mise à jour. Seul le nouveau pli est évalué ; les résultats des
+#     plis précédents restent dans le manifeste.
+#   - Mise à jour (forêts aléatoires uniquement) : la forêt grandit (warm_start) de quelques arbres, entraînés
+#     sur les nouvelles lignes plus un échantillon de rejeu de l'historique de même taille (--replay-ratio) ;
+#     le nombre d'arbres ajoutés est proportionnel à la part des nouvelles données. Les arbres existants et le
+#     préprocesseur ne sont pas modifiés : le temps de mise à jour dépend des nouvelles données, pas de
+#     l'historique.
+#   - Dérive : un ré-entraînement complet (python train.py --data <magasin>) est demandé, sans produire de
+#     modèle, si la ROC-AUC du nouveau pli chute de plus de MAX_AUC_DROP sous la référence, si la
+#     distribution d'une caractéristique ou de la classe change (PSI > PSI_LIMIT), ou si la forêt a dépassé
+#     MAX_GROWTH fois sa taille initiale. Les segments refusés restent dans le magasin : le ré-entraînement
+#     complet les utilise. La calibration (cf. calibration.py) est conservée telle quelle jusqu'au prochain
+#     ré-entraînement complet.
+#   - Le modèle mis à jour est écrit dans --out (obligatoire, distinct de --model) : le modèle servi n'est jamais
+#     remplacé sur place, la nouvelle version passe par le registre (cf. registry.py).
+#
+# Usage :
+#   python incremental.py init --data ../../data/diabetes_clean.csv --model modele_diabete_XX.pkl
+#   python incremental.py update --add nouveaux_cas.csv audit/audit-2026-10-*.jsonl --model modele_diabete_XX.pkl \
+#       --out modele_diabete_XX.inc.pkl
+#   python incremental.py status
+
+import argparse
+import datetime
+import glob
+import json
+import math
+import os
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from feature_schema import encode_labels, encode_text, read_csv
+from features import (BINARY_FEATURES, FEATURE_COLUMNS, MAX_PACKED_AGE, NO_LABEL, PACKED_DTYPE, load_packed, pack_rows,
+                      unpack_rows, unpack_symptoms)
+
+STORE_MANIFEST = "manifest.json"
+
+# Seuils de dérive : au-delà, la mise à jour incrémentale est refusée et un ré-entraînement complet demandé
+MAX_AUC_DROP = 0.05
+PSI_LIMIT = 0.25
+MAX_GROWTH = 3.0
+# En dessous de ce nombre de nouvelles lignes, les contrôles de dérive statistiques ne sont pas appliqués
+MIN_DRIFT_ROWS = 30
+
+# Lignes de l'historique rejouées par nouvelle ligne lors de l'entraînement des arbres ajoutés
+REPLAY_RATIO = 1.0
+
+# Tranches d'âge (10 ans) pour la comparaison des distributions
+AGE_EDGES = np.arange(0, MAX_PACKED_AGE + 11, 10)
+
+# État d'un segment : forêt entraînée dessus, ou en attente (mise à jour refusée ou impossible)
+SEGMENT_APPLIED = "applied"
+SEGMENT_PENDING = "pending"
+
+
+class StoreError(Exception):
+    """
+    Magasin absent ou incohérent.
+    """
+
+
+# --- Statistiques des caractéristiques ---
+
+def distribution(packed: np.ndarray) -> dict:
+    """
+    Effectifs cumulables d'un ensemble de lignes compactes : lignes, positifs, valeurs à 1 de chaque
+    caractéristique binaire, histogramme de l'âge.
+    """
+    return {
+        "n": int(len(packed)),
+        "positives": int((packed["label"] == 1).sum()),
+        "ones": unpack_symptoms(packed["mask"]).sum(axis=0, dtype=np.int64).tolist() if len(packed) else [0] * len(BINARY_FEATURES),
+        "age": np.histogram(packed["age"], AGE_EDGES)[0].tolist(),
+    }
+
+
+def merge_distribution(a: dict, b: dict) -> dict:
+    return {
+        "n": a["n"] + b["n"],
+        "positives": a["positives"] + b["positives"],
+        "ones": [x + y for x, y in zip(a["ones"], b["ones"])],
+        "age": [x + y for x, y in zip(a["age"], b["age"])],
+    }
+
+
+def psi(expected, actual) -> float:
+    """
+    Population Stability Index entre deux histogrammes (effectifs) ; 0 = distributions identiques.
+    """
+    expected = np.asarray(expected, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    # Lissage : une tranche vide ne rend pas l'indice infini
+    p = (expected + 0.5) / (expected.sum() + 0.5 * len(expected))
+    q = (actual + 0.5) / (actual.sum() + 0.5 * len(actual))
+    return float(((q - p) * np.log(q / p)).sum())
+
+
+def distribution_shift(history: dict, new: dict) -> dict:
+    """
+    PSI de chaque caractéristique (et de la classe) entre l'historique et les nouvelles lignes.
+    """
+    shift = {"age": psi(history["age"], new["age"]),
+             "class": psi([history["n"] - history["positives"], history["positives"]],
+                          [new["n"] - new["positives"], new["positives"]])}
+    for name, h_ones, n_ones in zip(BINARY_FEATURES, history["ones"], new["ones"]):
+        shift[name] = psi([history["n"] - h_ones, h_ones], [new["n"] - n_ones, n_ones])
+    return {name: round(value, 4) for name, value in shift.items()}
+
+
+# --- Magasin de données ---
+
+class TrainingStore:
+    """
+    Magasin des lignes étiquetées : segments compacts en ajout seul et manifeste (sources, statistiques, plis).
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        path = os.path.join(root, STORE_MANIFEST)
+        if not os.path.isfile(path):
+            raise StoreError(f"Aucun magasin dans {root} (python incremental.py init).")
+        with open(path, encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+    @classmethod
+    def create(cls, root: str) -> "TrainingStore":
+        if os.path.exists(os.path.join(root, STORE_MANIFEST)):
+            raise StoreError(f"Un magasin existe déjà dans {root}.")
+        os.makedirs(root, exist_ok=True)
+        _write_json(os.path.join(root, STORE_MANIFEST), {
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "segments": [],
+            "baseline": None,
+            "stats": distribution(np.zeros(0, dtype=PACKED_DTYPE)),
+        })
+        return cls(root)
+
+    @staticmethod
+    def is_store(path: str) -> bool:
+        return bool(path) and os.path.isfile(os.path.join(path, STORE_MANIFEST))
+
+    @property
+    def segments(self) -> List[dict]:
+        return self.manifest["segments"]
+
+    @property
+    def applied_segments(self) -> List[dict]:
+        # Manifestes antérieurs aux segments en attente : tout segment est appliqué
+        return [s for s in self.segments if s.get("status", SEGMENT_APPLIED) == SEGMENT_APPLIED]
+
+    @property
+    def n_rows(self) -> int:
+        """
+        Lignes de l'historique (segments appliqués).
+        """
+        return self.manifest["stats"]["n"]
+
+    def segment_of(self, source_sha256: str) -> Optional[dict]:
+        """
+        Segment qui contient déjà ce fichier source (None s'il n'a jamais été ingéré).
+        """
+        for segment in self.segments:
+            if any(source["sha256"] == source_sha256 for source in segment["sources"]):
+                return segment
+        return None
+
+    def rows(self, entry: dict) -> np.ndarray:
+        return np.asarray(self._segment(entry))
+
+    def _segment(self, entry: dict) -> np.ndarray:
+        return load_packed(os.path.join(self.root, entry["file"]))
+
+    def load(self) -> np.ndarray:
+        """
+        Toutes les lignes du magasin, dans l'ordre d'ajout (pour un ré-entraînement complet).
+        """
+        parts = [np.asarray(self._segment(s)) for s in self.segments]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=PACKED_DTYPE)
+
+    def sample(self, n: int, rng: np.random.Generator) -> np.ndarray:
+        """
+        n lignes tirées uniformément dans l'historique (segments appliqués), sans charger les segments (seules
+        les lignes tirées sont lues dans les fichiers en mmap).
+        """
+        segments = self.applied_segments
+        sizes = np.array([s["rows"] for s in segments], dtype=np.int64)
+        n = min(n, int(sizes.sum()))
+        if n <= 0:
+            return np.zeros(0, dtype=PACKED_DTYPE)
+        picked = np.sort(rng.choice(int(sizes.sum()), size=n, replace=False))
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        owner = np.searchsorted(starts, picked, side="right") - 1
+        return np.concatenate([np.asarray(self._segment(segments[i])[picked[owner == i] - starts[i]])
+                               for i in np.unique(owner)])
+
+    def append(self, packed: np.ndarray, sources: List[Tuple[str, str]], evaluation: Optional[dict] = None,
+               applied: bool = True) -> dict:
+        """
+        Ajoute un segment (fichier .npy écrit avant la mise à jour atomique du manifeste) et renvoie son entrée ;
+        sources : (chemin, empreinte SHA-256) des fichiers dont il provient. Un segment en attente
+        (applied=False) n'entre pas dans l'historique.
+        """
+        number = len(self.segments) + 1
+        entry = {
+            "file": f"segment-{number:04d}.npy",
+            "rows": int(len(packed)),
+            "positives": int((packed["label"] == 1).sum()),
+            "sources": [{"path": path, "sha256": sha256} for path, sha256 in sources],
+            "added_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "status": SEGMENT_APPLIED if applied else SEGMENT_PENDING,
+            "evaluation": evaluation,
+        }
+        np.save(os.path.join(self.root, entry["file"]), np.asarray(packed, dtype=PACKED_DTYPE))
+        self.manifest["segments"].append(entry)
+        if applied:
+            self.manifest["stats"] = merge_distribution(self.manifest["stats"], distribution(packed))
+        self.save()
+        return entry
+
+    def mark_applied(self, entries: List[dict], evaluation: Optional[dict] = None) -> None:
+        """
+        Segments en attente intégrés à l'historique (après une mise à jour réussie qui les a utilisés).
+        """
+        for entry in entries:
+            if entry.get("status") != SEGMENT_PENDING:
+                continue
+            entry["status"] = SEGMENT_APPLIED
+            if evaluation is not None:
+                entry["evaluation"] = evaluation
+            self.manifest["stats"] = merge_distribution(self.manifest["stats"], distribution(self.rows(entry)))
+        self.save()
+
+    def save(self) -> None:
+        _write_json(os.path.join(self.root, STORE_MANIFEST), self.manifest)
+
+
+def _write_json(path: str, content: dict) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(content, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# --- Lecture des sources étiquetées ---
+
+def read_labelled(path: str) -> Tuple[np.ndarray, int]:
+    """
+    Lignes compactes étiquetées d'une source : CSV nettoyé (0/1) ou brut (Yes/No, Male/Female, classe
+    Positive/Negative), .npy compact, ou journal d'audit JSONL dont les enregistrements portent l'issue
+    confirmée (clé "outcome"). Renvoie (lignes valides, lignes ignorées : invalides ou sans étiquette).
+    """
+    if path.endswith(".npy"):
+        packed = np.asarray(load_packed(path))
+        labelled = packed["label"] != NO_LABEL
+        return packed[labelled], int((~labelled).sum())
+
+    if path.endswith(".jsonl"):
+        records = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+        with_outcome = [r for r in records if r.get("outcome") is not None]
+        cells = np.array([[r["inputs"].get(c, "") for c in FEATURE_COLUMNS] for r in with_outcome], dtype=str)
+        labels = np.array([str(r["outcome"]) for r in with_outcome], dtype=str)
+        packed, n_invalid = _encode_text(cells.reshape(-1, len(FEATURE_COLUMNS)), labels)
+        return packed, n_invalid + len(records) - len(with_outcome)
+
+    X, y, valid = read_csv(path, with_label=True)
+    return _pack_valid(X, y, valid)
+
+
+def _encode_text(cells: np.ndarray, labels: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Encodage vectorisé (cf. feature_schema.py) d'une matrice de chaînes (n, 16) et des étiquettes.
+    """
+    X, valid = encode_text(cells)
+    y, known_label = encode_labels(labels)
+    return _pack_valid(X, y, valid & known_label)
+
+
+def _pack_valid(X: np.ndarray, y: np.ndarray, valid: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Lignes compactes valides et nombre de lignes écartées.
+    """
+    packed, packable = pack_rows(X, y.astype(np.uint8))
+    valid = valid & packable
+    return packed[valid], int((~valid).sum())
+
+
+# --- Évaluation et dérive ---
+
+def evaluate(model, calibration, packed: np.ndarray) -> dict:
+    """
+    Performance du modèle sur un pli qu'il n'a jamais vu (le nouveau segment), au point de fonctionnement
+    par défaut (score brut >= 0.5).
+    """
+    from sklearn.metrics import roc_auc_score
+
+    y = packed["label"].astype(bool)
+    scores = model.predict_proba(unpack_rows(packed))[:, 1]
+    positive = calibration.decide(scores)
+    return {
+        "rows": int(len(packed)),
+        "roc_auc": round(float(roc_auc_score(y, scores)), 4) if 0 < y.sum() < len(y) else None,
+        "accuracy": round(float((positive == y).mean()), 4),
+        "sensitivity": round(float(positive[y].mean()), 4) if y.any() else None,
+        "specificity": round(float((~positive[~y]).mean()), 4) if (~y).any() else None,
+    }
+
+
+def drift_reasons(evaluation: dict, shift: dict, baseline_auc: Optional[float], n_trees: int, base_trees: int,
+                  max_auc_drop: float = MAX_AUC_DROP, psi_limit: float = PSI_LIMIT,
+                  max_growth: float = MAX_GROWTH) -> List[str]:
+    """
+    Raisons d'exiger un ré-entraînement complet plutôt qu'une mise à jour incrémentale (liste vide : aucune).
+    """
+    reasons = []
+    if evaluation["rows"] >= MIN_DRIFT_ROWS:
+        auc = evaluation["roc_auc"]
+        if baseline_auc is not None and auc is not None and auc < baseline_auc - max_auc_drop:
+            reasons.append(f"ROC-AUC du nouveau pli {auc} < référence {baseline_auc} - {max_auc_drop}")
+        drifted = {name: value for name, value in shift.items() if value > psi_limit}
+        if drifted:
+            reasons.append(f"distribution modifiée (PSI > {psi_limit}) : {drifted}")
+    if n_trees > max_growth * base_trees:
+        reasons.append(f"forêt de {n_trees} arbres, plus de {max_growth} fois sa taille initiale ({base_trees})")
+    return reasons
+
+
+# --- Mise à jour du modèle ---
+
+def grow_forest(pipeline, packed: np.ndarray, n_add: int) -> None:
+    """
+    Ajoute n_add arbres à la forêt du pipeline, entraînés sur `packed` ; arbres existants et préprocesseur
+    inchangés.
+    """
+    import pandas as pd
+
+    classifier = pipeline[-1]
+    X = pd.DataFrame(unpack_rows(packed).astype(np.int64), columns=FEATURE_COLUMNS)
+    Xt = pipeline[:-1].transform(X)
+    classifier.set_params(warm_start=True, n_estimators=len(classifier.estimators_) + n_add)
+    try:
+        classifier.fit(Xt, packed["label"].astype(np.int64))
+    finally:
+        classifier.set_params(warm_start=False)
+
+
+def update(store: TrainingStore, model_path: str, artifact_path: Optional[str], sources: List[str], out_path: str,
+           out_artifact: Optional[str], replay_ratio: float = REPLAY_RATIO, force: bool = False, seed: int = 42,
+           max_auc_drop: float = MAX_AUC_DROP, psi_limit: float = PSI_LIMIT, max_growth: float = MAX_GROWTH) -> dict:
+    """
+    Ingère les sources, évalue le modèle sur le nouveau pli, contrôle la dérive puis, sans dérive (ou avec
+    force), fait grandir la forêt et écrit le modèle mis à jour. Les sources d'un segment en attente sont
+    reprises telles quelles. Le segment n'est intégré à l'historique qu'une fois le modèle écrit ; sinon il
+    reste en attente. Renvoie le compte rendu de la mise à jour.
+    """
+    import joblib
+    from calibration import Calibration
+    from forest_engine import FOREST_CLASSIFIERS, NumpyForest, file_sha256, load_model
+
+    start = time.perf_counter()
+    if os.path.abspath(out_path) == os.path.abspath(model_path):
+        raise ValueError(f"{out_path} : le modèle mis à jour doit être écrit dans un nouveau fichier, pas sur --model.")
+    pipeline = joblib.load(model_path)
+    if type(pipeline[-1]).__name__ not in FOREST_CLASSIFIERS:
+        raise ValueError(f"Mise à jour incrémentale impossible pour {type(pipeline[-1]).__name__} : "
+                         f"ré-entraînement complet (train.py --data {store.root}).")
+    model, model_sha256 = load_model(model_path, artifact_path)
+    metadata = dict(model.metadata)
+    calibration = Calibration.from_metadata(metadata)
+
+    # 1. Nouvelles lignes : sources jamais ingérées, puis segments en attente repris (sources appliquées ignorées)
+    parts, n_ignored, ingested, pending = [], 0, [], []
+    for path in sources:
+        sha256 = file_sha256(path)
+        segment = store.segment_of(sha256)
+        if segment is None:
+            packed, n_invalid = read_labelled(path)
+            parts.append(packed)
+            n_ignored += n_invalid
+            ingested.append((path, sha256))
+        elif segment.get("status", SEGMENT_APPLIED) == SEGMENT_APPLIED:
+            print(f"{path} déjà ingéré, ignoré.")
+        elif segment not in pending:
+            print(f"{path} en attente dans {segment['file']}, repris.")
+            pending.append(segment)
+    if not ingested and not pending:
+        return {"rows": 0, "updated": False, "full_retrain_required": False, "reasons": []}
+    fresh = np.concatenate(parts) if parts else np.zeros(0, dtype=PACKED_DTYPE)
+    new = np.concatenate([fresh] + [store.rows(segment) for segment in pending])
+
+    # 2. Évaluation du nouveau pli par le modèle actuel, et dérive par rapport à l'historique
+    evaluation = evaluate(model, calibration, new) if len(new) else {"rows": 0, "roc_auc": None}
+    shift = distribution_shift(store.manifest["stats"], distribution(new)) if len(new) else {}
+    incremental = dict(metadata.get("incremental") or {})
+    base_trees = incremental.get("base_trees") or len(pipeline[-1].estimators_)
+    history_rows = store.n_rows
+    n_add = max(1, math.ceil(len(pipeline[-1].estimators_) * len(new) / max(history_rows, 1))) if len(new) else 0
+    baseline = metadata.get("cv_roc_auc") or (store.manifest.get("baseline") or {}).get("roc_auc")
+    reasons = drift_reasons(evaluation, shift, baseline, len(pipeline[-1].estimators_) + n_add, base_trees,
+                            max_auc_drop, psi_limit, max_growth)
+
+    # 3. Rejeu tiré dans l'historique seul (segments appliqués)
+    rng = np.random.default_rng(seed + len(store.segments))
+    replay = store.sample(int(round(replay_ratio * len(new))), rng)
+    segment_evaluation = {**evaluation, "psi": shift, "reasons": reasons}
+
+    report = {
+        "rows": int(len(new)),
+        "ignored_rows": n_ignored,
+        "replay_rows": int(len(replay)),
+        "history_rows": history_rows,
+        "evaluation": evaluation,
+        "baseline_roc_auc": baseline,
+        "psi": shift,
+        "reasons": reasons,
+        "full_retrain_required": bool(reasons),
+        "updated": False,
+    }
+
+    def keep_pending(report_reasons: List[str]) -> dict:
+        # Mise à jour refusée ou impossible : nouvelles sources enregistrées en attente, reprises plus tard
+        if ingested:
+            store.append(fresh, ingested, {**segment_evaluation, "reasons": report_reasons}, applied=False)
+        report["reasons"] = report_reasons
+        report["pending_segments"] = [s["file"] for s in store.segments if s.get("status") == SEGMENT_PENDING]
+        report["seconds"] = round(time.perf_counter() - start, 3)
+        return report
+
+    if not len(new):
+        # Aucune ligne valide : rien à apprendre, les sources sont simplement notées comme ingérées
+        store.append(fresh, ingested, segment_evaluation)
+        store.mark_applied(pending)
+        report["seconds"] = round(time.perf_counter() - start, 3)
+        return report
+    if reasons and not force:
+        return keep_pending(reasons)
+
+    # 4. Croissance de la forêt sur nouvelles lignes + rejeu (les deux classes sont nécessaires)
+    training = np.concatenate([new, replay])
+    if len(np.unique(training["label"])) < 2:
+        return keep_pending(reasons + ["une seule classe dans les nouvelles lignes et le rejeu"])
+    grow_start = time.perf_counter()
+    grow_forest(pipeline, training, n_add)
+    grow_seconds = time.perf_counter() - grow_start
+
+    # 5. Modèle, rapport et artefact NumPy mis à jour (métadonnées conservées, historique des mises à jour)
+    incremental.update({
+        "base_trees": base_trees,
+        "n_updates": incremental.get("n_updates", 0) + 1,
+        "parent_sha256": model_sha256,
+        "store_rows": store.n_rows + int(len(new)),
+        "last_update": {"rows": int(len(new)), "trees_added": n_add, "fit_seconds": round(grow_seconds, 3),
+                        "evaluation": evaluation},
+    })
+    metadata["incremental"] = incremental
+    joblib.dump(pipeline, out_path)
+    out_sha256 = file_sha256(out_path)
+    report_path = f"{os.path.splitext(out_path)[0]}.report.json"
+    _write_json(report_path, {"model": {"path": out_path, "sha256": out_sha256}, "metadata": metadata})
+    if out_artifact:
+        NumpyForest.from_pipeline(pipeline, out_sha256, None, metadata).save(out_artifact)
+
+    # 6. Modèle écrit : les nouvelles lignes entrent dans l'historique
+    if ingested:
+        store.append(fresh, ingested, segment_evaluation)
+    store.mark_applied(pending, segment_evaluation)
+
+    report.update({"updated": True, "trees_added": n_add, "n_trees": len(pipeline[-1].estimators_),
+                   "fit_seconds": round(grow_seconds, 3), "model_sha256": out_sha256,
+                   "seconds": round(time.perf_counter() - start, 3)})
+    return report
+
+
+# --- Ligne de commande ---
+
+def init_store(root: str, data_path: str, model_path: Optional[str], folds: int = 5) -> TrainingStore:
+    """
+    Crée le magasin avec les données d'entraînement du modèle actuel (premier segment) et, si le modèle est
+    donné, sa ROC-AUC hors-pli comme référence de la dérive.
+    """
+    from forest_engine import file_sha256
+
+    store = TrainingStore.create(root)
+    packed, n_invalid = read_labelled(data_path)
+    store.append(packed, [(data_path, file_sha256(data_path))])
+    if model_path:
+        import joblib
+        from sklearn.metrics import roc_auc_score
+        import pandas as pd
+        from calibration import out_of_fold_scores
+
+        X = pd.DataFrame(unpack_rows(packed).astype(np.int64), columns=FEATURE_COLUMNS)
+        y = packed["label"].astype(np.int64)
+        scores = out_of_fold_scores(joblib.load(model_path), X, y, folds)
+        store.manifest["baseline"] = {"roc_auc": round(float(roc_auc_score(y, scores)), 4),
+                                      "model_sha256": file_sha256(model_path), "folds": folds}
+        store.save()
+    print(f"Magasin créé dans {root} : {len(packed)} lignes ({n_invalid} ignorée(s)), référence {store.manifest['baseline']}")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ré-entraînement incrémental à partir des nouveaux cas étiquetés.")
+    parser.add_argument("--store", default=os.getenv("TRAINING_STORE_DIR") or "training_store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_init = sub.add_parser("init", help="Crée le magasin avec les données d'entraînement actuelles")
+    p_init.add_argument("--data", default="../../data/diabetes_clean.csv")
+    p_init.add_argument("--model", help="Modèle actuel : sa ROC-AUC hors-pli sert de référence")
+    p_update = sub.add_parser("update", help="Ajoute des cas étiquetés et met le modèle à jour")
+    p_update.add_argument("--add", nargs="+", required=True, help="CSV, .npy compacts ou journaux d'audit .jsonl")
+    p_update.add_argument("--model", default="modele_diabete_XX.pkl")
+    p_update.add_argument("--artifact", default=None, help="Artefact NumPy du modèle (défaut : <model sans .pkl>.model)")
+    p_update.add_argument("--out", required=True, help="Modèle mis à jour (.pkl, distinct de --model)")
+    p_update.add_argument("--replay-ratio", type=float, default=REPLAY_RATIO)
+    p_update.add_argument("--max-auc-drop", type=float, default=MAX_AUC_DROP)
+    p_update.add_argument("--psi-limit", type=float, default=PSI_LIMIT)
+    p_update.add_argument("--max-growth", type=float, default=MAX_GROWTH)
+    p_update.add_argument("--force", action="store_true", help="Met à jour malgré la dérive détectée")
+    sub.add_parser("status", help="Segments du magasin et évaluation de chaque pli")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "init":
+            init_store(args.store, args.data, args.model)
+        elif args.command == "update":
+            store = TrainingStore(args.store)
+            sources = [path for pattern in args.add for path in sorted(glob.glob(pattern)) or [pattern]]
+            out = args.out
+            artifact = args.artifact or f"{os.path.splitext(args.model)[0]}.model"
+            report = update(store, args.model, artifact, sources, out, f"{os.path.splitext(out)[0]}.model",
+                            args.replay_ratio, args.force, max_auc_drop=args.max_auc_drop,
+                            psi_limit=args.psi_limit, max_growth=args.max_growth)
+            print(json.dumps(report, indent=2, ensure_ascii=False))
+            if report["updated"]:
+                print(f"Modèle mis à jour : {out} (+{report['trees_added']} arbres en {report['fit_seconds']}s). "
+                      "Pensez à régénérer la table de scores (score_table.py), puis à publier le modèle "
+                      f"(python registry.py publish --model {out} --artifact {os.path.splitext(out)[0]}.model).")
+            elif report["reasons"]:
+                print(f"ATTENTION: ré-entraînement complet nécessaire : python train.py --data {args.store} "
+                      "(ou mise à jour forcée : même commande avec --force)")
+                raise SystemExit(2)
+        else:
+            store = TrainingStore(args.store)
+            baseline = store.manifest.get("baseline") or {}
+            print(f"{store.n_rows} lignes, {len(store.segments)} segment(s), référence ROC-AUC {baseline.get('roc_auc')}")
+            for s in store.segments:
+                evaluation = s.get("evaluation") or {}
+                print(f"  {s['file']}  {s.get('status', SEGMENT_APPLIED):<8} {s['rows']:>7} lignes  {s['added_at']}  "
+                      f"ROC-AUC {evaluation.get('roc_auc')}  "
+                      f"{'; '.join(evaluation.get('reasons') or [])}  ({', '.join(src['path'] for src in s['sources'])})")
+    except (StoreError, ValueError) as e:
+        raise SystemExit(f"ERREUR: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,503 @@
+# metrics.py
+
+# --- Métriques au format texte Prometheus ---
+#
+# Compteurs, jauges et histogrammes minimalistes (sans dépendance), exposés par GET /metrics :
+#   - http_requests_total{method, path, status}      requêtes terminées, par statut
+#   - http_request_duration_seconds{path}            latence totale vue par le serveur
+#   - http_requests_in_flight                        requêtes en cours
+#   - predict_stage_duration_seconds{path, stage}    découpage de la latence de /predict :
+#       parse          réception du corps, décodage JSON et validation pydantic (avant l'entrée dans la route)
+#       feature_build  construction de la ligne de caractéristiques et de la clé de cache
+#       inference      cache, table de scores ou modèle (ordonnanceur compris)
+#       serialize      construction et encodage JSON de la réponse (jusqu'à l'envoi des en-têtes)
+#   - model_load_seconds, model_warmup_seconds, model_info{model_version, model_sha256, engine}
+#   - predictions_total{model_version, source}       prédictions par version du modèle (cache, table, model, batch)
+#   - model_swaps_total                              bascules à chaud du modèle (cf. registry.py)
+#   - model_inference_seconds{model_version, role}   calcul du score par modèle : servi (primary), canary, shadow
+#   - candidate_comparisons_total{candidate_version, agreement}, candidate_probability_delta{candidate_version},
+#     candidate_shed_total{reason}                   comparaison au modèle candidat (cf. candidate.py)
+#
+# MetricsMiddleware (ASGI pur, sans BaseHTTPMiddleware) crée pour chaque requête un RequestTimer accessible
+# dans la route par current_timer() ; la route appelle timer.mark("étape") à la fin de chaque étape.
+# Coût mesuré : ~15 µs par requête, invisible dans bench.py (cf. README, section 12).
+#
+# Plusieurs workers (Gunicorn) : chaque processus a ses propres séries. Avec METRICS_MULTIPROC_DIR, chaque worker
+# écrit son état dans ce répertoire (toutes les METRICS_SYNC_INTERVAL_S secondes et à chaque /metrics) et /metrics
+# renvoie la somme de tous les workers : les compteurs ne semblent plus repartir de zéro selon le worker interrogé.
+# Les compteurs et histogrammes des workers arrêtés restent comptés ; les jauges ne comptent que les workers en vie.
+
+import abc
+import asyncio
+import contextvars
+import copy
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Bornes des histogrammes (secondes) : de 50 µs (lecture de la table de scores) à 2.5 s
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(abc.ABC):
+    """
+    Famille de séries (une par combinaison de valeurs de labels). labels(*valeurs) renvoie la série,
+    créée au premier appel puis réutilisée : le chemin chaud ne fait qu'une recherche dans un dict.
+    """
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} : labels attendus {self.labelnames}, reçus {values}")
+            with self._lock:
+                child = self._children.setdefault(tuple(str(v) for v in values), self._new_child())
+            self._children.setdefault(values, child)
+        return child
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """
+        Nouvelle série vide.
+        """
+
+    def _items(self) -> List[tuple]:
+        # Une même série peut être enregistrée sous plusieurs clés (valeurs non converties en str)
+        with self._lock:
+            seen, items = set(), []
+            for key, child in self._children.items():
+                if id(child) not in seen:
+                    seen.add(id(child))
+                    items.append((tuple(str(v) for v in key), child))
+        return sorted(items, key=lambda item: item[0])
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    @abc.abstractmethod
+    def _samples(self) -> List[str]:
+        """
+        Lignes de la famille au format texte (sans HELP ni TYPE).
+        """
+
+    @abc.abstractmethod
+    def state(self) -> list:
+        """
+        État sérialisable en JSON : une entrée [labels, valeurs...] par série.
+        """
+
+    @abc.abstractmethod
+    def _add_state(self, entry: list) -> None:
+        """
+        Ajoute une entrée de state() (d'un autre processus) aux séries de cette famille.
+        """
+
+    def merged(self, states: Iterable[list]) -> "_Metric":
+        """
+        Copie vide de la famille (même nom, labels, bornes) contenant la somme des états de plusieurs processus.
+        """
+        total = copy.copy(self)
+        total._lock = threading.Lock()
+        total._children = {}
+        for state in states:
+            for entry in state:
+                total._add_state(entry)
+        return total
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+                for key, child in self._items()]
+
+    def state(self) -> list:
+        return [[list(key), child.value] for key, child in self._items()]
+
+    def _add_state(self, entry: list) -> None:
+        key, value = entry
+        self.labels(*key).inc(value)
+
+
+class Gauge(Counter):
+    """
+    multiprocess_mode : agrégation entre workers (cf. MultiProcessMetrics), "sum" (ex. requêtes en cours) ou
+    "max" (valeur identique dans chaque worker, ex. modèle servi).
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), multiprocess_mode: str = "sum"):
+        super().__init__(name, documentation, labelnames)
+        if multiprocess_mode not in ("sum", "max"):
+            raise ValueError(f"multiprocess_mode doit valoir 'sum' ou 'max', reçu {multiprocess_mode!r}")
+        self.multiprocess_mode = multiprocess_mode
+
+    def _add_state(self, entry: list) -> None:
+        key, value = entry
+        child = self.labels(*key)
+        if self.multiprocess_mode == "max":
+            # Jauges positives (durées, indicateurs) : la série vide vaut 0
+            child.set(max(child.value, value))
+        else:
+            child.inc(value)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._children.clear()
+
+
+class _HistogramSeries:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # par intervalle (non cumulé), dernier = +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramSeries:
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, series in self._items():
+            with series._lock:
+                counts, total = list(series.counts), series.sum
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+    def state(self) -> list:
+        entries = []
+        for key, series in self._items():
+            with series._lock:
+                entries.append([list(key), list(series.counts), series.sum])
+        return entries
+
+    def _add_state(self, entry: list) -> None:
+        key, counts, total = entry
+        series = self.labels(*key)
+        with series._lock:
+            series.counts = [a + b for a, b in zip(series.counts, counts)]
+            series.sum += total
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self, metrics: Optional[List[_Metric]] = None) -> str:
+        lines = []
+        for metric in self.metrics if metrics is None else metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def state(self) -> dict:
+        return {metric.name: metric.state() for metric in self.metrics}
+
+
+class MultiProcessMetrics:
+    """
+    Agrégation des métriques de plusieurs workers par un répertoire partagé : chaque processus y écrit son
+    état (<pid>.json, remplacé atomiquement) et render() additionne les fichiers de tous les processus.
+    """
+
+    def __init__(self, directory: str, registry: Registry, sync_interval: float = 1.0):
+        self.directory = directory
+        self.registry = registry
+        self.sync_interval = sync_interval
+        self._task = None
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def path(self) -> str:
+        # Calculé à chaque appel : les workers sont créés par fork après l'import du module
+        return os.path.join(self.directory, f"{os.getpid()}.json")
+
+    def write(self) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"pid": os.getpid(), "metrics": self.registry.state()}, f)
+        os.replace(tmp, self.path)
+
+    def _read_all(self) -> List[Tuple[dict, bool]]:
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                # Fichier supprimé ou en cours de remplacement : ignoré pour ce scrape
+                continue
+            snapshots.append((snapshot, _alive(snapshot.get("pid"))))
+        return snapshots
+
+    def render(self) -> str:
+        self.write()
+        snapshots = self._read_all()
+        merged = []
+        for metric in self.registry.metrics:
+            # Jauges : seulement les workers en vie (les requêtes en cours d'un worker arrêté n'existent plus)
+            states = [snapshot["metrics"].get(metric.name, []) for snapshot, alive in snapshots
+                      if alive or metric.kind != "gauge"]
+            merged.append(metric.merged(states))
+        return self.registry.render(merged)
+
+    def start(self) -> None:
+        """
+        Démarre l'écriture périodique (à appeler depuis la boucle asyncio du serveur, ex. lifespan).
+        """
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Arrête l'écriture périodique et écrit l'état final (les compteurs du worker arrêté restent comptés).
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._sync()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            self._sync()
+
+    def _sync(self) -> None:
+        try:
+            self.write()
+        except OSError as e:
+            print(f"ATTENTION: écriture des métriques dans {self.directory} impossible: {e}")
+
+
+def _alive(pid) -> bool:
+    # Signal 0 : vérifie seulement que le processus existe
+    try:
+        os.kill(int(pid), 0)
+    except PermissionError:
+        return True
+    except (TypeError, ValueError, ProcessLookupError):
+        return False
+    return True
+
+
+# --- Métriques du service ---
+
+REGISTRY = Registry()
+REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "Requêtes HTTP terminées.", ("method", "path", "status")))
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Latence des requêtes HTTP (réception -> fin de la réponse).", ("path",)))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "Requêtes HTTP en cours de traitement."))
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "predict_stage_duration_seconds", "Durée de chaque étape du traitement d'une prédiction.", ("path", "stage")))
+MODEL_LOAD_SECONDS = REGISTRY.register(Gauge(
+    "model_load_seconds", "Durée du chargement du modèle et de la table de scores.", multiprocess_mode="max"))
+MODEL_WARMUP_SECONDS = REGISTRY.register(Gauge(
+    "model_warmup_seconds", "Durée du lot de chauffe exécuté avant de déclarer le service prêt.", multiprocess_mode="max"))
+MODEL_INFO = REGISTRY.register(Gauge(
+    "model_info", "Modèle servi (valeur toujours 1, version dans les labels).",
+    ("model_version", "model_sha256", "engine"), multiprocess_mode="max"))
+PREDICTIONS = REGISTRY.register(Counter(
+    "predictions_total", "Prédictions servies, par version du modèle et origine du score.",
+    ("model_version", "source")))
+MODEL_SWAPS = REGISTRY.register(Counter(
+    "model_swaps_total", "Bascules à chaud du modèle servi (activation ou retour arrière)."))
+MODEL_INFERENCE = REGISTRY.register(Histogram(
+    "model_inference_seconds", "Durée du calcul du score par ligne, par modèle et rôle (primary, canary, shadow).",
+    ("model_version", "role")))
+CANDIDATE_COMPARISONS = REGISTRY.register(Counter(
+    "candidate_comparisons_total", "Prédictions scorées par le modèle servi et le candidat (même décision ou non).",
+    ("candidate_version", "agreement")))
+CANDIDATE_DELTA = REGISTRY.register(Histogram(
+    "candidate_probability_delta", "Écart absolu de probabilité entre le modèle servi et le candidat.",
+    ("candidate_version",), buckets=(0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)))
+CANDIDATE_SHED = REGISTRY.register(Counter(
+    "candidate_shed_total", "Comparaisons abandonnées pour ne pas charger le service.", ("reason",)))
+
+IN_FLIGHT.set(0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def multiprocess_from_env(registry: Registry = REGISTRY) -> Optional[MultiProcessMetrics]:
+    """
+    METRICS_MULTIPROC_DIR (vide = chaque processus expose ses propres séries), METRICS_SYNC_INTERVAL_S.
+    """
+    directory = os.getenv("METRICS_MULTIPROC_DIR", "")
+    if not directory:
+        return None
+    return MultiProcessMetrics(directory, registry, float(os.getenv("METRICS_SYNC_INTERVAL_S", "1")))
+
+
+def set_model(model_version: str, model_sha256: str, engine: str, load_seconds: Optional[float]) -> None:
+    MODEL_INFO.clear()
+    MODEL_INFO.labels(model_version, model_sha256, engine).set(1)
+    if load_seconds is not None:
+        MODEL_LOAD_SECONDS.set(load_seconds)
+
+
+# --- Chronométrage des étapes d'une requête ---
+
+class RequestTimer:
+    """
+    Chronomètre d'une requête : mark(stage) enregistre le temps écoulé depuis la marque précédente
+    (ou depuis la réception de la requête) dans predict_stage_duration_seconds.
+    """
+
+    __slots__ = ("path", "started", "last", "stages")
+
+    def __init__(self, path: str, started: float):
+        self.path = path
+        self.started = self.last = started
+        self.stages: Dict[str, float] = {}
+
+    def mark(self, stage: str) -> float:
+        now = time.perf_counter()
+        elapsed = now - self.last
+        self.last = now
+        self.stages[stage] = elapsed
+        STAGE_DURATION.labels(self.path, stage).observe(elapsed)
+        return elapsed
+
+
+_current_timer: contextvars.ContextVar = contextvars.ContextVar("request_timer", default=None)
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return _current_timer.get()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI : compteur par statut, latence totale, requêtes en cours, et étape 'serialize' pour les
+    routes qui ont marqué des étapes (temps entre la dernière marque et l'envoi des en-têtes de réponse).
+    """
+
+    def __init__(self, app, excluded_paths: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.excluded_paths = frozenset(excluded_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timer = RequestTimer(scope["path"], started)
+        token = _current_timer.set(timer)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if timer.stages:
+                    timer.mark("serialize")
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            _current_timer.reset(token)
+            # Chemin du modèle de route (ex. /predict) plutôt que l'URL brute : nombre de séries borné
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            REQUESTS.labels(scope["method"], path, status[0]).inc()
+            REQUEST_DURATION.labels(path).observe(time.perf_counter() - started)
@@ -0,0 +1,244 @@
+# profiler.py
+
+# --- Profilage à la demande des requêtes lentes ---
+#
+# Désactivé par défaut. Une fois activé (variables d'environnement ou POST /admin/profiling), un thread
+# échantillonne la pile de tous les threads du processus (sys._current_frames) toutes les `interval_ms`
+# pendant les requêtes profilées : boucle d'événements (réception, validation pydantic, sérialisation) et
+# threads d'inférence (predict_proba). Les pauses du ramasse-miettes sont relevées par gc.callbacks.
+#
+# Une requête est conservée si :
+#   - sample_every_n > 0 : c'est la N-ième ;
+#   - slow_ms > 0 : elle a duré plus que le seuil (toutes les requêtes sont alors échantillonnées, puisque la
+#     durée n'est connue qu'à la fin).
+#
+# Pour chaque requête conservée, deux fichiers dans `directory` :
+#   <horodatage>_<pid>_<n>.collapsed  piles au format "collapsed" (thread;fonction;...;fonction nombre), lisible
+#                                     par flamegraph.pl ou https://www.speedscope.app
+#   <horodatage>_<pid>_<n>.json       chemin, corps de la requête (vecteur de caractéristiques), durée, étapes
+#                                     (cf. metrics.py), pauses du ramasse-miettes, nombre d'échantillons
+#
+# Désactivé, le middleware ne fait qu'un test booléen par requête.
+
+import gc
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from metrics import current_timer
+
+# Taille maximale du corps de requête recopié dans le fichier .json
+MAX_BODY_BYTES = 64 * 1024
+
+
+def _collapse(frame) -> str:
+    """
+    Pile d'un thread (de la racine vers la fonction en cours) au format collapsed.
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _Session:
+    __slots__ = ("started", "stacks", "gc_pauses_ms")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stacks: Counter = Counter()
+        self.gc_pauses_ms: List[float] = []
+
+
+class RequestProfiler:
+    """
+    Échantillonneur partagé par les requêtes profilées en cours (un seul thread, actif seulement pendant
+    qu'au moins une requête est profilée).
+    """
+
+    def __init__(self, directory: str = "profiles", sample_every_n: int = 0, slow_ms: float = 0.0,
+                 interval_ms: float = 1.0):
+        self.directory = directory
+        self.interval_ms = interval_ms
+        self.sample_every_n = 0
+        self.slow_ms = 0.0
+        self.enabled = False
+        self._requests = itertools.count(1)
+        self._sessions: Dict[int, _Session] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._gc_started: Optional[float] = None
+        self.written = 0
+        self.configure(sample_every_n=sample_every_n, slow_ms=slow_ms, interval_ms=interval_ms)
+
+    def configure(self, sample_every_n: Optional[int] = None, slow_ms: Optional[float] = None,
+                  interval_ms: Optional[float] = None) -> None:
+        if sample_every_n is not None:
+            self.sample_every_n = max(0, int(sample_every_n))
+        if slow_ms is not None:
+            self.slow_ms = max(0.0, float(slow_ms))
+        if interval_ms is not None:
+            self.interval_ms = max(0.1, float(interval_ms))
+        enabled = self.sample_every_n > 0 or self.slow_ms > 0
+        if enabled and self._gc_timer not in gc.callbacks:
+            gc.callbacks.append(self._gc_timer)
+        elif not enabled and self._gc_timer in gc.callbacks:
+            gc.callbacks.remove(self._gc_timer)
+        self.enabled = enabled
+
+    def settings(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "sample_every_n": self.sample_every_n,
+            "slow_ms": self.slow_ms,
+            "interval_ms": self.interval_ms,
+            "directory": os.path.abspath(self.directory),
+            "profiles_written": self.written,
+        }
+
+    # --- Sessions ---
+
+    def admit(self) -> bool:
+        """
+        À l'arrivée d'une requête : True si c'est la N-ième (elle sera écrite quelle que soit sa durée).
+        """
+        return self.sample_every_n > 0 and next(self._requests) % self.sample_every_n == 0
+
+    def begin(self) -> int:
+        session = _Session()
+        with self._lock:
+            self._sessions[id(session)] = session
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return id(session)
+
+    def end(self, session_id: int) -> _Session:
+        with self._lock:
+            session = self._sessions.pop(session_id)
+            if not self._sessions:
+                self._wake.clear()
+        return session
+
+    def _sample_loop(self) -> None:
+        own_id = threading.get_ident()
+        while True:
+            self._wake.wait()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            frames = sys._current_frames()
+            stacks = [f"{names.get(ident, ident)};{_collapse(frame)}"
+                      for ident, frame in frames.items() if ident != own_id]
+            del frames
+            with self._lock:
+                for session in self._sessions.values():
+                    session.stacks.update(stacks)
+            time.sleep(self.interval_ms / 1000)
+
+    def _gc_timer(self, phase: str, info: dict) -> None:
+        if phase == "start":
+            self._gc_started = time.perf_counter()
+        elif self._gc_started is not None:
+            pause_ms = (time.perf_counter() - self._gc_started) * 1000
+            self._gc_started = None
+            with self._lock:
+                for session in self._sessions.values():
+                    session.gc_pauses_ms.append(round(pause_ms, 3))
+
+    # --- Écriture ---
+
+    def write(self, session: _Session, duration_ms: float, reason: str, details: dict) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self.written += 1
+            n = self.written
+        stem = os.path.join(self.directory, f"{time.strftime('%Y%m%dT%H%M%S')}_{os.getpid()}_{n}")
+        with open(stem + ".collapsed", "w") as f:
+            for stack, count in session.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(stem + ".json", "w") as f:
+            json.dump({
+                **details,
+                "reason": reason,
+                "duration_ms": round(duration_ms, 3),
+                "gc_pauses_ms": session.gc_pauses_ms,
+                "samples": sum(session.stacks.values()),
+                "interval_ms": self.interval_ms,
+            }, f, indent=2, ensure_ascii=False)
+        return stem
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI : profile les requêtes des chemins donnés selon la configuration de `profiler`.
+    À placer à l'intérieur de MetricsMiddleware pour relever les durées des étapes.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler, paths: Iterable[str] = ("/predict",)):
+        self.app = app
+        self.profiler = profiler
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        profiler = self.profiler
+        if not profiler.enabled or scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        # Une requête sur N, ou toutes si un seuil de lenteur est fixé (sa durée n'est connue qu'à la fin)
+        nth = profiler.admit()
+        if not nth and profiler.slow_ms <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        body = []
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request" and sum(map(len, body)) < MAX_BODY_BYTES:
+                body.append(message.get("body", b""))
+            return message
+
+        session_id = profiler.begin()
+        try:
+            await self.app(scope, receive_wrapper, send)
+        finally:
+            session = profiler.end(session_id)
+            duration_ms = (time.perf_counter() - session.started) * 1000
+            slow = profiler.slow_ms > 0 and duration_ms >= profiler.slow_ms
+            if slow or nth:
+                timer = current_timer()
+                raw = b"".join(body)[:MAX_BODY_BYTES]
+                try:
+                    payload = json.loads(raw) if raw else None
+                except ValueError:
+                    payload = raw.decode("utf-8", errors="replace")
+                try:
+                    profiler.write(session, duration_ms, "slow" if slow else "sampled", {
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "request": payload,
+                        "stages_ms": {k: round(v * 1000, 3) for k, v in timer.stages.items()} if timer else {},
+                    })
+                except OSError as e:
+                    # Le profilage ne doit jamais faire échouer la requête
+                    print(f"ATTENTION: profil non écrit dans {profiler.directory}: {e}")
+
+
+def profiler_from_env() -> RequestProfiler:
+    """
+    PROFILE_SAMPLE_EVERY (N, 0 = désactivé), PROFILE_SLOW_MS (0 = désactivé), PROFILE_INTERVAL_MS, PROFILE_DIR.
+    """
+    return RequestProfiler(
+        directory=os.getenv("PROFILE_DIR", "profiles"),
+        sample_every_n=int(os.getenv("PROFILE_SAMPLE_EVERY", "0")),
+        slow_ms=float(os.getenv("PROFILE_SLOW_MS", "0")),
+        interval_ms=float(os.getenv("PROFILE_INTERVAL_MS", "1")),
+    )
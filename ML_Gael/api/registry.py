@@ -0,0 +1,335 @@
+# registry.py
+
+# --- Registre local des modèles (répertoire versionné) ---
+#
+# Un nouveau modèle est publié dans le registre au lieu d'être copié dans l'image Docker : l'API le charge,
+# le chauffe et le bascule à chaud (cf. app.py, POST /admin/models/{version}/activate ou surveillance de
+# CURRENT), sans reconstruction ni redémarrage.
+#
+#   models/
+#     CURRENT                 version à servir (une ligne), remplacée atomiquement (os.replace)
+#     HISTORY                 versions successivement activées ("horodatage version", une par ligne ; suivi de
+#                             "rollback" pour un retour arrière)
+#     CANDIDATE               version candidate évaluée sur le trafic réel (JSON : version, mode, percent ;
+#                             cf. candidate.py), absent = pas de candidat
+#     v0001/
+#       manifest.json         version, date, empreinte SHA-256 de chaque fichier, métadonnées du rapport
+#       model.pkl             pipeline scikit-learn (obligatoire)
+#       model.report.json     rapport d'entraînement (cf. train.py), s'il existe
+#       model.model/          artefact NumPy (cf. forest_engine.py), s'il existe
+#       table.npz             table de scores (cf. score_table.py), si elle existe
+#
+# Une version est construite dans un répertoire temporaire puis renommée : elle apparaît complète ou pas du
+# tout. Les fichiers d'une version publiée ne sont jamais modifiés ; leurs empreintes sont revérifiées avant
+# chaque chargement.
+#
+# Usage :
+#   python registry.py publish --model modele_diabete_XX.pkl --artifact modele_diabete_XX.model --table modele_diabete_XX.table.npz [--activate]
+#   python registry.py list
+#   python registry.py activate v0002
+#   python registry.py rollback                           (répété : v0003 -> v0002 -> v0001, pas d'aller-retour)
+#   python registry.py candidate v0003 --mode shadow       (ou --mode canary --percent 10, ou --clear)
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from typing import List, Optional, Tuple
+
+from forest_engine import file_sha256
+
+CURRENT_FILE = "CURRENT"
+HISTORY_FILE = "HISTORY"
+CANDIDATE_FILE = "CANDIDATE"
+MANIFEST_FILE = "manifest.json"
+MODEL_FILE = "model.pkl"
+REPORT_FILE = "model.report.json"
+ARTIFACT_DIR = "model.model"
+TABLE_FILE = "table.npz"
+
+_VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+class RegistryError(Exception):
+    """
+    Version inconnue, incomplète ou altérée (empreinte différente du manifeste).
+    """
+
+
+def _tree_sha256(path: str) -> str:
+    """
+    Empreinte d'un fichier, ou d'un répertoire (empreintes de ses fichiers, dans l'ordre des noms).
+    """
+    if os.path.isfile(path):
+        return file_sha256(path)
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(path)):
+        digest.update(f"{name}:{_tree_sha256(os.path.join(path, name))}\n".encode())
+    return digest.hexdigest()
+
+
+def _write_atomic(path: str, text: str) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+class ModelVersion:
+    """
+    Une version publiée : chemins de ses fichiers et manifeste.
+    """
+
+    def __init__(self, root: str, manifest: dict):
+        self.manifest = manifest
+        self.version = manifest["version"]
+        self.directory = os.path.join(root, self.version)
+        files = manifest["files"]
+        self.model_path = os.path.join(self.directory, MODEL_FILE)
+        self.artifact_path = os.path.join(self.directory, ARTIFACT_DIR) if ARTIFACT_DIR in files else None
+        self.table_path = os.path.join(self.directory, TABLE_FILE) if TABLE_FILE in files else None
+
+    @property
+    def model_sha256(self) -> str:
+        return self.manifest["files"][MODEL_FILE]
+
+    def verify(self) -> None:
+        """
+        Recalcule les empreintes de tous les fichiers et lève RegistryError si l'un d'eux a changé.
+        """
+        for name, expected in self.manifest["files"].items():
+            path = os.path.join(self.directory, name)
+            if not os.path.exists(path):
+                raise RegistryError(f"{self.version}: fichier {name} manquant")
+            if _tree_sha256(path) != expected:
+                raise RegistryError(f"{self.version}: empreinte de {name} différente du manifeste")
+
+
+class ModelRegistry:
+    """
+    Registre de modèles sur disque (cf. en-tête du fichier). Sûr pour plusieurs processus en lecture ;
+    publish() et activate() sont faits par un seul opérateur à la fois.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    # --- Lecture ---
+
+    def versions(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if not name.startswith(".") and os.path.isfile(os.path.join(self.root, name, MANIFEST_FILE)))
+
+    def get(self, version: str) -> ModelVersion:
+        path = os.path.join(self.root, version, MANIFEST_FILE)
+        if not _VERSION_PATTERN.match(version) or not os.path.isfile(path):
+            raise RegistryError(f"version inconnue: {version!r}")
+        with open(path, encoding="utf-8") as f:
+            return ModelVersion(self.root, json.load(f))
+
+    def current(self) -> Optional[str]:
+        """
+        Version à servir (contenu de CURRENT), None si aucune n'a été activée.
+        """
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def history(self) -> List[str]:
+        return [version for version, _ in self._history_entries()]
+
+    def _history_entries(self) -> List[Tuple[str, bool]]:
+        # (version, retour arrière ?) dans l'ordre des activations
+        try:
+            with open(os.path.join(self.root, HISTORY_FILE), encoding="utf-8") as f:
+                fields = [line.split() for line in f]
+        except FileNotFoundError:
+            return []
+        return [(f[1], f[2:] == ["rollback"]) for f in fields if len(f) in (2, 3)]
+
+    def lineage(self) -> List[str]:
+        """
+        Pile des versions en service : une activation empile, un retour arrière dépile. Le sommet est la version
+        courante, l'élément en dessous la cible du prochain retour arrière.
+        """
+        stack: List[str] = []
+        for version, rollback in self._history_entries():
+            if rollback and stack:
+                stack.pop()
+            if not stack or stack[-1] != version:
+                stack.append(version)
+        return stack
+
+    def previous(self) -> Optional[str]:
+        """
+        Cible d'un retour arrière : la version activée avant la version courante. Les retours arrière successifs
+        remontent l'historique (v3 -> v2 -> v1) au lieu d'alterner entre les deux dernières versions.
+        """
+        stack = self.lineage()
+        return stack[-2] if len(stack) >= 2 else None
+
+    def candidate(self) -> Optional[dict]:
+        """
+        Candidat désigné ({"version", "mode", "percent"}), None s'il n'y en a pas.
+        """
+        try:
+            with open(os.path.join(self.root, CANDIDATE_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    # --- Écriture ---
+
+    def publish(self, model_path: str, artifact_path: Optional[str] = None, table_path: Optional[str] = None,
+                version: Optional[str] = None) -> ModelVersion:
+        """
+        Copie un modèle (et son artefact NumPy, sa table de scores, son rapport) dans une nouvelle version.
+        """
+        version = version or self._next_version()
+        if not _VERSION_PATTERN.match(version):
+            raise RegistryError(f"nom de version invalide: {version!r}")
+        final = os.path.join(self.root, version)
+        if os.path.exists(final):
+            raise RegistryError(f"la version {version} existe déjà (une version publiée n'est jamais modifiée)")
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.root, prefix=f".{version}-")
+        try:
+            shutil.copy2(model_path, os.path.join(staging, MODEL_FILE))
+            report_path = os.path.splitext(model_path)[0] + ".report.json"
+            if os.path.exists(report_path):
+                shutil.copy2(report_path, os.path.join(staging, REPORT_FILE))
+            if artifact_path:
+                shutil.copytree(artifact_path, os.path.join(staging, ARTIFACT_DIR))
+            if table_path:
+                shutil.copy2(table_path, os.path.join(staging, TABLE_FILE))
+
+            files = {name: _tree_sha256(os.path.join(staging, name)) for name in sorted(os.listdir(staging))}
+            metadata = {}
+            if REPORT_FILE in files:
+                with open(os.path.join(staging, REPORT_FILE), encoding="utf-8") as f:
+                    metadata = json.load(f).get("metadata") or {}
+            manifest = {
+                "version": version,
+                "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+                "source": os.path.abspath(model_path),
+                "files": files,
+                "metadata": metadata,
+            }
+            with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+            os.chmod(staging, 0o755)
+            os.rename(staging, final)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return ModelVersion(self.root, manifest)
+
+    def activate(self, version: str, rollback: bool = False) -> None:
+        """
+        Désigne la version à servir (CURRENT remplacé atomiquement) et l'ajoute à l'historique.
+        rollback : activation faite par un retour arrière (cf. lineage).
+        Si c'était la version candidate, elle cesse de l'être (promotion).
+        """
+        self.get(version)
+        if (self.candidate() or {}).get("version") == version:
+            self.clear_candidate()
+        _write_atomic(os.path.join(self.root, CURRENT_FILE), version + "\n")
+        stamp = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+        with open(os.path.join(self.root, HISTORY_FILE), "a", encoding="utf-8") as f:
+            f.write(f"{stamp} {version}{' rollback' if rollback else ''}\n")
+
+    def rollback(self) -> str:
+        """
+        Réactive la version précédente (cf. previous) et la renvoie.
+        """
+        previous = self.previous()
+        if previous is None:
+            raise RegistryError("aucune version précédente dans l'historique")
+        self.activate(previous, rollback=True)
+        return previous
+
+    def set_candidate(self, version: str, mode: str, percent: float = 0.0) -> None:
+        self.get(version)
+        _write_atomic(os.path.join(self.root, CANDIDATE_FILE),
+                      json.dumps({"version": version, "mode": mode, "percent": percent}) + "\n")
+
+    def clear_candidate(self) -> None:
+        try:
+            os.remove(os.path.join(self.root, CANDIDATE_FILE))
+        except FileNotFoundError:
+            pass
+
+    def _next_version(self) -> str:
+        numbers = [int(v[1:]) for v in self.versions() if re.fullmatch(r"v\d+", v)]
+        return f"v{max(numbers, default=0) + 1:04d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registre local des modèles.")
+    parser.add_argument("--root", default=os.getenv("MODEL_REGISTRY_DIR") or "models")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_publish = sub.add_parser("publish", help="Publie un modèle dans une nouvelle version")
+    p_publish.add_argument("--model", required=True)
+    p_publish.add_argument("--artifact", help="Artefact NumPy du modèle (cf. forest_engine.py export)")
+    p_publish.add_argument("--table", help="Table de scores (cf. score_table.py)")
+    p_publish.add_argument("--version", help="Nom de la version (défaut : v0001, v0002...)")
+    p_publish.add_argument("--activate", action="store_true", help="Active la version publiée")
+    sub.add_parser("list", help="Liste les versions publiées")
+    p_activate = sub.add_parser("activate", help="Désigne la version à servir")
+    p_activate.add_argument("version")
+    sub.add_parser("rollback", help="Réactive la version précédente")
+    p_candidate = sub.add_parser("candidate", help="Désigne la version candidate (shadow ou canary)")
+    p_candidate.add_argument("version", nargs="?")
+    p_candidate.add_argument("--mode", choices=("shadow", "canary"), default="shadow")
+    p_candidate.add_argument("--percent", type=float, default=0.0, help="Part du trafic servie par le candidat (canary)")
+    p_candidate.add_argument("--clear", action="store_true", help="Arrête l'évaluation du candidat")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    try:
+        if args.command == "publish":
+            published = registry.publish(args.model, args.artifact, args.table, args.version)
+            print(f"Version {published.version} publiée dans {published.directory} "
+                  f"(modèle {published.model_sha256[:12]}, fichiers : {', '.join(published.manifest['files'])})")
+            if args.activate:
+                registry.activate(published.version)
+                print(f"Version {published.version} activée")
+        elif args.command == "list":
+            current = registry.current()
+            for version in registry.versions():
+                entry = registry.get(version)
+                flag = "*" if version == current else " "
+                print(f"{flag} {version}  {entry.manifest['created']}  {entry.model_sha256[:12]}  "
+                      f"{', '.join(entry.manifest['files'])}")
+        elif args.command == "activate":
+            registry.activate(args.version)
+            print(f"Version {args.version} activée")
+        elif args.command == "rollback":
+            print(f"Retour à la version {registry.rollback()}")
+        elif args.command == "candidate":
+            if args.clear:
+                registry.clear_candidate()
+                print("Plus de version candidate")
+            elif args.version is None:
+                print(registry.candidate())
+            else:
+                if not 0 <= args.percent <= 100:
+                    raise SystemExit("--percent doit être compris entre 0 et 100.")
+                registry.set_candidate(args.version, args.mode, args.percent)
+                print(f"Version {args.version} candidate ({args.mode}"
+                      f"{f', {args.percent:g} %' if args.mode == 'canary' else ''})")
+    except RegistryError as e:
+        raise SystemExit(f"ERREUR: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# scheduler.py
+
+# --- Ordonnanceur d'inférence (micro-batching) ---
+#
+# Chaque appel à /predict coûte surtout le surcoût fixe d'un appel à predict_proba : scorer 64 lignes
+# d'un coup prend à peine plus de temps que d'en scorer une. L'ordonnanceur met donc les requêtes en
+# file d'attente et regroupe tout ce qui arrive dans une courte fenêtre (ex. 2 ms ou 64 lignes) en un
+# seul appel vectorisé, exécuté dans un pool de threads de taille fixe, puis répond à chaque requête.
+#
+#   - file bornée : quand elle est pleine, submit() lève QueueFullError (-> 429) au lieu de laisser
+#     la latence grandir sans limite
+#   - au plus `workers` lots en cours d'exécution : la file se remplit quand le CPU est saturé
+#   - compteurs (lots, lignes, rejets, taille moyenne des lots) exposés par stats()
+#   - submit(row, model) : chaque ligne est scorée par le modèle avec lequel elle a été soumise, même si le
+#     modèle servi est remplacé entre-temps (bascule à chaud, cf. app.py)
+#   - arrêt (stop) : les lots en cours se terminent (ou sont annulés passé un délai), les requêtes encore en
+#     file ou déjà retirées de la file reçoivent SchedulerNotRunningError (-> 503) ; aucune n'attend indéfiniment
+#
+# Dans app.py, l'ordonnanceur ne sert que les patients absents de la table de scores : avec la table livrée
+# (tout le domaine validé, âge 0-150 et caractéristiques binaires), /predict ne l'atteint que si la table est
+# absente (SCORE_TABLE_PATH manquant, version du registre publiée sans table).
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+
+class QueueFullError(Exception):
+    """
+    File d'attente de l'ordonnanceur pleine : la requête doit être rejetée (429).
+    """
+
+
+class SchedulerNotRunningError(Exception):
+    """
+    Ordonnanceur non démarré (démarrage ou arrêt du service en cours) : la requête doit être rejetée (503).
+    """
+
+
+def _fail(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_exception(SchedulerNotRunningError("Service en cours d'arrêt."))
+
+
+class MicroBatcher:
+    """
+    Regroupe les lignes soumises par les requêtes concurrentes en lots traités par predict_fn.
+
+    predict_fn reçoit une matrice float64 (n, n_features), et le modèle passé à submit() s'il y en a un,
+    et renvoie un tableau de n scores.
+    """
+
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray], max_batch_rows: int = 64,
+                 max_wait_ms: float = 2.0, max_queue: int = 1024, workers: Optional[int] = None,
+                 stop_timeout: float = 5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_rows = max(1, max_batch_rows)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_queue = max_queue
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.stop_timeout = stop_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._collector: Optional[asyncio.Task] = None
+        # Lots en cours : la boucle asyncio ne garde qu'une référence faible vers ses tâches
+        self._tasks: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+        self.batches = self.rows = self.rejected = self.max_batch_seen = 0
+
+    @property
+    def running(self) -> bool:
+        return self._collector is not None and not self._collector.done()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        """
+        Démarre la boucle de regroupement (à appeler depuis la boucle asyncio du serveur, ex. lifespan).
+        """
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        self._slots = asyncio.Semaphore(self.workers)
+        self._collector = asyncio.get_running_loop().create_task(self._collect())
+
+    async def stop(self) -> None:
+        """
+        Arrête la boucle de regroupement, attend les lots en cours (annulés au-delà de stop_timeout) et rejette
+        les requêtes restées en file.
+        """
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+            self._collector = None
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=self.stop_timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        # Requêtes encore en file : le service s'arrête, elles ne seront pas traitées
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            _fail(future)
+        if self._executor is not None:
+            # Attente des threads du pool hors de la boucle d'événements
+            await asyncio.to_thread(self._executor.shutdown, wait=True)
+            self._executor = None
+
+    async def submit(self, row: Sequence[float], model: Any = None) -> float:
+        """
+        Met une ligne (n_features valeurs) en file et attend son score (calculé par predict_fn(X, model)).
+        Lève QueueFullError si la file est pleine, SchedulerNotRunningError si l'ordonnanceur est arrêté.
+        """
+        if not self.running:
+            raise SchedulerNotRunningError("Ordonnanceur d'inférence non démarré.")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((row, future, model))
+        except asyncio.QueueFull:
+            with self._lock:
+                self.rejected += 1
+            raise QueueFullError(f"File d'inférence pleine ({self.max_queue} requêtes en attente).")
+        return await future
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # Un lot ne commence à se former que lorsqu'un thread du pool est libre
+            await self._slots.acquire()
+            batch = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_rows:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+            except BaseException:
+                # Annulation (arrêt) pendant la formation du lot : les requêtes déjà retirées de la file
+                # ne sont plus visibles par stop(), on les rejette ici
+                self._slots.release()
+                for _, future, _ in batch:
+                    _fail(future)
+                raise
+            task = loop.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _predict(self, groups: Dict[int, list]) -> List[np.ndarray]:
+        # Un seul groupe, sauf pour un lot formé pendant une bascule de modèle
+        results = []
+        for items in groups.values():
+            X = np.array([row for row, _, _ in items], dtype=np.float64)
+            model = items[0][2]
+            results.append(self.predict_fn(X) if model is None else self.predict_fn(X, model))
+        return results
+
+    async def _run(self, batch: List[tuple]) -> None:
+        groups: Dict[int, list] = {}
+        for item in batch:
+            groups.setdefault(id(item[2]), []).append(item)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self._executor, self._predict, groups)
+        except asyncio.CancelledError:
+            # Lot annulé par stop() : ses requêtes ne recevront pas de score
+            for _, future, _ in batch:
+                _fail(future)
+            raise
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            # Une requête abandonnée (client déconnecté) a son futur déjà annulé
+            for items, scores in zip(groups.values(), results):
+                for (_, future, _), score in zip(items, scores):
+                    if not future.done():
+                        future.set_result(float(score))
+        finally:
+            self._slots.release()
+            with self._lock:
+                self.batches += 1
+                self.rows += len(batch)
+                self.max_batch_seen = max(self.max_batch_seen, len(batch))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self.running,
+                "workers": self.workers,
+                "max_batch_rows": self.max_batch_rows,
+                "max_wait_ms": self.max_wait * 1000,
+                "max_queue": self.max_queue,
+                "queue_depth": self.queue_depth,
+                "batches": self.batches,
+                "rows": self.rows,
+                "rejected": self.rejected,
+                "mean_batch_rows": round(self.rows / self.batches, 2) if self.batches else None,
+                "max_batch_rows_seen": self.max_batch_seen,
+            }
+
+
+def scheduler_from_env(predict_fn: Callable[[np.ndarray], np.ndarray]) -> MicroBatcher:
+    """
+    Construit l'ordonnanceur à partir des variables d'environnement :
+    BATCH_WINDOW_MS, BATCH_MAX_ROWS, INFERENCE_QUEUE_SIZE, INFERENCE_WORKERS (0 = min(4, nombre de CPU)).
+    """
+    return MicroBatcher(
+        predict_fn,
+        max_batch_rows=int(os.getenv("BATCH_MAX_ROWS", "64")),
+        max_wait_ms=float(os.getenv("BATCH_WINDOW_MS", "2")),
+        max_queue=int(os.getenv("INFERENCE_QUEUE_SIZE", "1024")),
+        workers=int(os.getenv("INFERENCE_WORKERS", "0")) or None,
+    )
@@ -0,0 +1,227 @@
+# score_table.py
+
+# --- Table de scores pré-calculée ---
+#
+# Le domaine d'entrée du modèle est fini : 2^15 combinaisons binaires x un âge entier borné.
+# On évalue donc le pipeline hors-ligne sur tout le domaine ("compilation") et l'API sert
+# ensuite /predict par une simple lecture en mémoire, sans appel à scikit-learn.
+#
+# Format compact (fichier .npz) :
+#   - age_bucket : âge -> indice de tranche. Les arbres ne comparent l'âge qu'à quelques seuils,
+#                  donc tous les âges situés entre deux seuils consécutifs ont le même score.
+#   - codes      : (n_tranches, 32768) indices (uint8/uint16/uint32 selon la taille) dans la palette
+#   - palette    : probabilités distinctes en float64, ce qui garantit un résultat identique au modèle
+#
+# Compilation :
+#   python score_table.py --model modele_diabete_XX.pkl --out modele_diabete_XX.table.npz
+
+import argparse
+import time
+from typing import Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS, MAX_PACKED_AGE, N_SYMPTOM_COMBINATIONS, PACKED_DTYPE, pack_rows, symptoms_mask, unpack_rows
+from forest_engine import file_sha256
+
+# Bornes d'âge par défaut (celles du slider de l'application Streamlit, 0 inclus)
+AGE_MIN = 0
+AGE_MAX = 150
+
+
+def _smallest_uint(n_values: int):
+    """
+    Plus petit type entier non signé capable d'indexer n_values valeurs.
+    """
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if n_values <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.uint64
+
+
+def _features_frame(ages: np.ndarray, masks: np.ndarray) -> pd.DataFrame:
+    """
+    Construit le DataFrame (âges x masques) attendu par le pipeline.
+    """
+    packed = np.zeros(len(ages), dtype=PACKED_DTYPE)
+    packed["age"], packed["mask"] = ages, masks
+    return pd.DataFrame(unpack_rows(packed).astype(np.int64), columns=FEATURE_COLUMNS)
+
+
+def _tree_estimators(classifier) -> list:
+    """
+    Liste des arbres d'un ensemble (RandomForest, GradientBoosting...) ; vide si le modèle n'est pas à base d'arbres.
+    """
+    estimators = getattr(classifier, "estimators_", None)
+    if estimators is None:
+        return []
+    trees = [est for est in np.ravel(np.asarray(estimators, dtype=object))]
+    return trees if all(hasattr(t, "tree_") for t in trees) else []
+
+
+def age_buckets(pipeline, ages: np.ndarray) -> np.ndarray:
+    """
+    Regroupe les âges en tranches de score identique.
+
+    Deux âges tombent dans la même tranche s'ils sont du même côté de tous les seuils d'âge
+    utilisés par les arbres. Pour un modèle qui n'est pas à base d'arbres, chaque âge a sa propre tranche.
+    """
+    identity = np.arange(len(ages))
+    trees = _tree_estimators(pipeline[-1])
+    if not trees:
+        return identity
+
+    # Âge transformé par le préprocesseur, tel que le voient les arbres (float32, comme dans scikit-learn)
+    transformed = np.asarray(pipeline[:-1].transform(_features_frame(ages, np.zeros(len(ages), dtype=np.uint16))))
+    varying = np.flatnonzero(np.ptp(transformed, axis=0) > 0)
+    if len(varying) != 1:
+        return identity
+    age_column = varying[0]
+    age_values = transformed[:, age_column].astype(np.float32).astype(np.float64)
+
+    thresholds = np.unique(np.concatenate([
+        t.tree_.threshold[t.tree_.feature == age_column] for t in trees
+    ]))
+    # Nombre de seuils strictement inférieurs à l'âge : définit de quel côté de chaque seuil on se trouve
+    side = np.searchsorted(thresholds, age_values, side="left")
+    _, bucket = np.unique(side, return_inverse=True)
+    return bucket.ravel()
+
+
+class ScoreTable:
+    """
+    Table de correspondance (âge, symptômes) -> probabilité positive.
+    """
+
+    def __init__(self, codes, palette, age_bucket, age_min, feature_columns, model_sha256):
+        self.codes = codes
+        self.palette = palette
+        self.age_bucket = age_bucket
+        self.age_min = int(age_min)
+        self.age_max = self.age_min + len(age_bucket) - 1
+        self.feature_columns = list(feature_columns)
+        self.model_sha256 = str(model_sha256)
+
+    @classmethod
+    def compile(cls, pipeline, model_sha256: str = "", age_min: int = AGE_MIN, age_max: int = AGE_MAX) -> "ScoreTable":
+        """
+        Évalue le pipeline sur tout le domaine d'entrée (une tranche d'âge à la fois).
+        """
+        if not 0 <= age_min <= age_max <= MAX_PACKED_AGE:
+            raise ValueError(f"Domaine d'âge invalide : [{age_min}, {age_max}] (format compact : 0 à {MAX_PACKED_AGE}).")
+        ages = np.arange(age_min, age_max + 1)
+        bucket = age_buckets(pipeline, ages)
+        n_buckets = int(bucket.max()) + 1
+        masks = np.arange(N_SYMPTOM_COMBINATIONS, dtype=np.uint16)
+
+        scores = np.empty((n_buckets, N_SYMPTOM_COMBINATIONS), dtype=np.float64)
+        for b in range(n_buckets):
+            # Un âge représentatif par tranche suffit
+            age = ages[np.argmax(bucket == b)]
+            frame = _features_frame(np.full(N_SYMPTOM_COMBINATIONS, age), masks)
+            scores[b] = pipeline.predict_proba(frame)[:, 1]
+
+        palette, codes = np.unique(scores, return_inverse=True)
+        codes = codes.reshape(scores.shape).astype(_smallest_uint(len(palette)))
+        return cls(codes, palette, bucket.astype(_smallest_uint(n_buckets)), age_min, FEATURE_COLUMNS, model_sha256)
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path,
+            codes=self.codes,
+            palette=self.palette,
+            age_bucket=self.age_bucket,
+            age_min=np.int64(self.age_min),
+            feature_columns=np.array(self.feature_columns),
+            model_sha256=np.array(self.model_sha256),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "ScoreTable":
+        with np.load(path) as data:
+            return cls(
+                data["codes"], data["palette"], data["age_bucket"], data["age_min"],
+                data["feature_columns"].tolist(), data["model_sha256"].item(),
+            )
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.palette.nbytes + self.age_bucket.nbytes
+
+    def lookup_one(self, age: int, binary_values) -> Optional[float]:
+        """
+        Probabilité positive d'un patient, ou None s'il est hors du domaine couvert par la table.
+        """
+        if not self.age_min <= age <= self.age_max:
+            return None
+        mask = symptoms_mask(binary_values)
+        if mask is None:
+            return None
+        return float(self.palette[self.codes[self.age_bucket[age - self.age_min], mask]])
+
+    def lookup(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Version vectorisée : X est une matrice (n, 16) dans l'ordre FEATURE_COLUMNS.
+        Renvoie (probabilités, masque des lignes couvertes) ; les lignes non couvertes valent NaN.
+        """
+        # Même validation que le format compact (âge entier, valeurs 0/1), puis recherche par (âge, masque)
+        packed, valid = pack_rows(X)
+        ages = packed["age"]
+        covered = valid & (ages >= self.age_min) & (ages <= self.age_max)
+        proba = np.full(len(packed), np.nan)
+        if covered.any():
+            bucket = self.age_bucket[ages[covered].astype(np.int64) - self.age_min]
+            proba[covered] = self.palette[self.codes[bucket, packed["mask"][covered]]]
+        return proba, covered
+
+
+def verify(table: ScoreTable, pipeline, n_samples: int = 10000, seed: int = 42) -> int:
+    """
+    Compare la table au pipeline sur un échantillon aléatoire du domaine. Renvoie le nombre d'écarts.
+    """
+    rng = np.random.default_rng(seed)
+    ages = rng.integers(table.age_min, table.age_max + 1, n_samples)
+    masks = rng.integers(0, N_SYMPTOM_COMBINATIONS, n_samples).astype(np.uint16)
+    frame = _features_frame(ages, masks)
+    expected = pipeline.predict_proba(frame)[:, 1]
+    got, covered = table.lookup(frame.to_numpy())
+    assert covered.all()
+    return int(np.count_nonzero(got != expected))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile la table de scores exhaustive du modèle.")
+    parser.add_argument("--model", default="modele_diabete_XX.pkl", help="Pipeline scikit-learn (.pkl)")
+    parser.add_argument("--out", default="modele_diabete_XX.table.npz", help="Fichier de sortie (.npz)")
+    parser.add_argument("--age-min", type=int, default=AGE_MIN)
+    parser.add_argument("--age-max", type=int, default=AGE_MAX)
+    parser.add_argument("--ages-from", help="CSV d'entraînement : limite la table aux âges observés (min-max)")
+    parser.add_argument("--verify", type=int, default=10000, help="Nombre de points de contrôle (0 pour désactiver)")
+    args = parser.parse_args()
+
+    age_min, age_max = args.age_min, args.age_max
+    if args.ages_from:
+        observed = pd.read_csv(args.ages_from, usecols=["age"])["age"]
+        age_min, age_max = int(observed.min()), int(observed.max())
+
+    pipeline = joblib.load(args.model)
+    start = time.perf_counter()
+    table = ScoreTable.compile(pipeline, file_sha256(args.model), age_min, age_max)
+    elapsed = time.perf_counter() - start
+    print(f"Table compilée en {elapsed:.1f}s : âges {age_min}-{age_max} en {table.codes.shape[0]} tranches, "
+          f"{len(table.palette)} probabilités distinctes, {table.nbytes / 1024:.0f} Ko en mémoire.")
+
+    if args.verify:
+        mismatches = verify(table, pipeline, args.verify)
+        print(f"Vérification sur {args.verify} points : {mismatches} écart(s).")
+        if mismatches:
+            raise SystemExit(1)
+
+    table.save(args.out)
+    print(f"Table sauvegardée : {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# conftest.py
+
+# --- Configuration commune des tests de l'API ---
+#
+# Les modules de l'API sont plats (importés depuis ML_Gael/api, comme au lancement du service) : le répertoire
+# parent est ajouté au chemin d'import. Lancement, depuis ML_Gael/api :
+#   python -m pytest -q tests
+
+import os
+import sys
+
+import pytest
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+# Le journal d'audit est désactivé pour tout import de app.py pendant les tests
+os.environ.setdefault("AUDIT_DIR", "")
+
+MODEL_PATH = os.path.join(API_DIR, "modele_diabete_XX.pkl")
+ARTIFACT_PATH = os.path.join(API_DIR, "modele_diabete_XX.model")
+TABLE_PATH = os.path.join(API_DIR, "modele_diabete_XX.table.npz")
+DATA_PATH = os.path.join(API_DIR, "..", "..", "data", "diabetes_clean.csv")
+
+
+@pytest.fixture(scope="session")
+def pipeline():
+    import joblib
+    return joblib.load(MODEL_PATH)
+
+
+@pytest.fixture(scope="session")
+def training_data():
+    """
+    (X float64 dans l'ordre FEATURE_COLUMNS, y) du jeu d'entraînement nettoyé.
+    """
+    import pandas as pd
+    from features import FEATURE_COLUMNS
+    df = pd.read_csv(DATA_PATH)
+    return df[FEATURE_COLUMNS].to_numpy(dtype=float), df["class"].to_numpy()
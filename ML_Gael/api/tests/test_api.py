@@ -0,0 +1,88 @@
+# test_api.py
+
+# --- Endpoints de prédiction par lots : erreurs par ligne, taille maximale, format colonnaire ---
+
+import pytest
+
+from conftest import ARTIFACT_PATH, MODEL_PATH, TABLE_PATH
+
+PATIENT = {
+    "age": 40, "gender": 1, "polyuria": 0, "polydipsia": 1, "sudden_weight_loss": 0, "weakness": 1,
+    "polyphagia": 0, "genital_thrush": 0, "visual_blurring": 1, "itching": 0, "irritability": 0,
+    "delayed_healing": 1, "partial_paresis": 0, "muscle_stiffness": 0, "alopecia": 0, "obesity": 0,
+}
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    """
+    Module app.py importé avec les fichiers du modèle du dépôt (sans registre, surveillance ni audit), et client
+    de test une fois le service prêt.
+    """
+    from fastapi.testclient import TestClient
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("MODEL_PATH", MODEL_PATH)
+        mp.setenv("MODEL_ARTIFACT_PATH", ARTIFACT_PATH)
+        mp.setenv("SCORE_TABLE_PATH", TABLE_PATH)
+        mp.setenv("MODEL_REGISTRY_DIR", str(tmp_path_factory.mktemp("registry")))
+        mp.setenv("MODEL_REGISTRY_POLL_S", "0")
+        mp.setenv("AUDIT_DIR", "")
+        import app as app_module
+        with TestClient(app_module.app) as client:
+            assert app_module.service_ready.wait(60)
+            yield app_module, client
+
+
+def test_batch_reports_errors_per_row(api):
+    _, client = api
+    rows = [PATIENT, {**PATIENT, "age": 200}, {k: v for k, v in PATIENT.items() if k != "obesity"},
+            {**PATIENT, "gender": "x"}, PATIENT]
+    response = client.post("/predict/batch", json=rows)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["n_rows"], body["n_errors"]) == (5, 3)
+    results = body["results"]
+    assert [r["index"] for r in results] == [0, 1, 2, 3, 4]
+    assert [("error" in r) for r in results] == [False, True, True, True, False]
+    assert results[1]["error"][0]["loc"] == ["age"]
+    assert results[2]["error"][0]["type"] == "missing"
+    assert results[0]["probability_positive"] == results[4]["probability_positive"]
+
+    # Même réponse que /predict pour une ligne valide
+    single = client.post("/predict", json=PATIENT).json()
+    assert single["probability_positive"] == results[0]["probability_positive"]
+    assert single["prediction"] == results[0]["prediction"]
+
+
+def test_batch_size_limit(api, monkeypatch):
+    app_module, client = api
+    monkeypatch.setattr(app_module, "MAX_BATCH_SIZE", 3)
+    assert client.post("/predict/batch", json=[PATIENT] * 3).status_code == 200
+    response = client.post("/predict/batch", json=[PATIENT] * 4)
+    assert response.status_code == 413
+    assert "maximum 3" in response.json()["detail"]
+    columns = {c: [v] * 4 for c, v in PATIENT.items()}
+    assert client.post("/predict/batch/columnar", json=columns).status_code == 413
+
+
+def test_columnar_batch(api):
+    _, client = api
+    columns = {c: [v, v] for c, v in PATIENT.items()}
+    columns["age"] = [40, 999]
+    response = client.post("/predict/batch/columnar", json=columns)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["n_rows"], body["n_errors"]) == (2, 1)
+    row_wise = client.post("/predict/batch", json=[PATIENT]).json()["results"][0]
+    assert body["results"][0]["probability_positive"] == row_wise["probability_positive"]
+
+    # Longueurs différentes, colonne manquante : 422 sans prédiction
+    uneven = {**columns, "obesity": [0]}
+    response = client.post("/predict/batch/columnar", json=uneven)
+    assert response.status_code == 422
+    assert "même longueur" in response.json()["detail"]
+    missing = {c: v for c, v in columns.items() if c != "itching"}
+    response = client.post("/predict/batch/columnar", json=missing)
+    assert response.status_code == 422
+    assert "itching" in response.json()["detail"]
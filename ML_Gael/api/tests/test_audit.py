@@ -0,0 +1,55 @@
+# test_audit.py
+
+# --- Journal d'audit : enregistrements invalides, robustesse de la tâche d'écriture ---
+
+import asyncio
+import glob
+import json
+import os
+
+from audit import AuditLog
+
+
+def written_entries(directory) -> list:
+    entries = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.jsonl"))):
+        with open(path, encoding="utf-8") as f:
+            entries.extend(json.loads(line) for line in f)
+    return entries
+
+
+def test_unserializable_record_is_dropped_alone(tmp_path):
+    log = AuditLog(str(tmp_path))
+    log.record({"n": 1})
+    log.record({"n": object()})
+    log.record({"n": 3})
+    assert log.flush() == 2
+    assert [e["n"] for e in written_entries(tmp_path)] == [1, 3]
+    stats = log.stats()
+    assert (stats["written"], stats["dropped"]) == (2, 1)
+
+
+def test_writer_task_survives_unexpected_errors(tmp_path, monkeypatch):
+    log = AuditLog(str(tmp_path), flush_interval=0.01)
+    calls = []
+    flush = log.flush
+
+    def failing_once():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("panne simulée")
+        return flush()
+
+    monkeypatch.setattr(log, "flush", failing_once)
+
+    async def scenario():
+        log.start()
+        log.record({"n": 1})
+        await asyncio.sleep(0.1)
+        running = log.stats()["running"]
+        await log.stop()
+        return running
+
+    assert asyncio.run(scenario())
+    assert [e["n"] for e in written_entries(tmp_path)] == [1]
+    assert log.stats()["write_errors"] == 1
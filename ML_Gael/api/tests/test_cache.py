@@ -0,0 +1,162 @@
+# test_cache.py
+
+# --- Cache des prédictions : TTL, LRU, liaison au modèle, backend SQLite ---
+
+import asyncio
+
+import cache
+from cache import MemoryBackend, PredictionCache, SQLiteBackend
+
+
+class FakeClock:
+    """
+    Horloge monotone pilotée par le test.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_expiry(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    c = PredictionCache(maxsize=10, ttl=60)
+    c.bind_model("A")
+    c.set(1, 0.25)
+    clock.now += 59
+    assert c.get(1) == 0.25
+    clock.now += 2
+    assert c.get(1) is None
+    stats = c.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"], stats["size"]) == (1, 1, 1, 0)
+
+
+def test_lru_eviction():
+    c = PredictionCache(maxsize=2, ttl=60)
+    c.bind_model("A")
+    c.set(1, 0.1)
+    c.set(2, 0.2)
+    assert c.get(1) == 0.1  # 1 devient la plus récente : 2 sera évincée
+    c.set(3, 0.3)
+    assert c.get(2) is None
+    assert c.get(1) == 0.1 and c.get(3) == 0.3
+    assert c.stats()["evictions"] == 1
+
+
+def test_bind_model_invalidates_entries():
+    c = PredictionCache(maxsize=10, ttl=60)
+    c.bind_model("A")
+    c.set(1, 0.1)
+    c.bind_model("B")
+    assert c.get(1) is None
+    # Score calculé par l'ancien modèle pendant la bascule : pas gardé localement
+    c.set(2, 0.2, "A")
+    assert c.stats()["size"] == 0
+
+
+def test_candidate_entries_and_stats_per_model():
+    c = PredictionCache(maxsize=10, ttl=60)
+    c.bind_model("A")
+    c.bind_candidate("B")
+    c.set(1, 0.1, "A")
+    c.set(1, 0.9, "B")
+    assert c.get(1, "A") == 0.1
+    assert c.get(1, "B") == 0.9
+    assert c.get(2, "B") is None
+    models = c.stats()["models"]
+    assert models["A"] == {"role": "served", "size": 1, "hits": 1, "misses": 0, "hit_ratio": 1.0}
+    assert models["B"] == {"role": "candidate", "size": 1, "hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+    # Promotion du candidat : ses entrées restent, celles de l'ancien modèle partent
+    c.bind_model("B")
+    assert c.get(1, "B") == 0.9
+    assert c.stats()["candidate_sha256"] is None
+    assert list(c.stats()["models"]) == ["B"]
+    assert c.get(1, "A") is None
+
+
+def test_clear_candidate_drops_its_entries():
+    c = PredictionCache(maxsize=10, ttl=60)
+    c.bind_model("A")
+    c.bind_candidate("B")
+    c.set(1, 0.9, "B")
+    c.bind_candidate(None)
+    assert c.stats()["size"] == 0
+
+
+def test_shared_backend_hit():
+    backend = MemoryBackend()
+    writer = PredictionCache(maxsize=10, ttl=60, backend=backend)
+    reader = PredictionCache(maxsize=10, ttl=60, backend=backend)
+    writer.bind_model("A")
+    reader.bind_model("A")
+    writer.set(1, 0.4)
+    assert reader.get(1) == 0.4
+    assert reader.stats()["shared_hits"] == 1
+    # Deuxième lecture servie par le niveau local
+    assert reader.get(1) == 0.4
+    assert reader.stats()["shared_hits"] == 1
+
+
+def test_memory_backend_is_bounded_and_purged(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    backend = MemoryBackend(maxsize=3)
+    for key in range(4):
+        backend.set("A", key, 0.1, ttl=60)
+    assert len(backend) == 3 and backend.get("A", 0) is None
+    # La lecture rafraîchit l'ordre LRU : la clé 1 survit à l'écriture suivante
+    assert backend.get("A", 1) == 0.1
+    backend.set("A", 4, 0.1, ttl=60)
+    assert backend.get("A", 1) == 0.1 and backend.get("A", 2) is None
+
+    clock.now += 120
+    assert backend.get("A", 1) is None and len(backend) == 2
+    assert backend.purge() == 2 and len(backend) == 0
+
+    # Purge périodique des entrées expirées, sans lecture
+    backend = MemoryBackend(maxsize=10000)
+    backend.PURGE_EVERY = 10
+    for key in range(9):
+        backend.set("A", key, 0.1, ttl=-1)
+    assert len(backend) == 9
+    backend.set("A", 9, 0.1, ttl=60)
+    assert len(backend) == 1
+
+
+def test_async_accessors_with_sqlite(tmp_path):
+    c = PredictionCache(maxsize=10, ttl=60, backend=SQLiteBackend(str(tmp_path / "cache.sqlite")))
+    c.bind_model("A")
+
+    async def scenario():
+        await c.aset(1, 0.3)
+        c.clear()
+        return await c.aget(1), await c.aget(2)
+
+    assert asyncio.run(scenario()) == (0.3, None)
+    assert c.stats()["shared_hits"] == 1
+
+
+def test_sqlite_errors_are_misses(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite"))
+    backend.set("A", 1, 0.5, 60)
+    assert backend.get("A", 1) == 0.5
+    # Base inutilisable (ici table absente ; même erreur qu'une base verrouillée) : miss, pas d'exception
+    backend._connection().execute("DROP TABLE predictions")
+    assert backend.get("A", 1) is None
+    backend.set("A", 2, 0.2, 60)
+
+
+def test_sqlite_purges_expired_rows(tmp_path, monkeypatch):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(SQLiteBackend, "PURGE_EVERY", 3)
+    backend.set("A", 1, 0.1, -1)
+    backend.set("A", 2, 0.2, -1)
+    count = backend._connection().execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+    assert count == 2
+    backend.set("A", 3, 0.3, 60)  # 3e écriture : purge
+    rows = backend._connection().execute("SELECT key FROM predictions").fetchall()
+    assert rows == [(3,)]
@@ -0,0 +1,48 @@
+# test_calibration.py
+
+# --- Points de fonctionnement : "default" sur le score brut, calibration sur demande ---
+
+import numpy as np
+
+from calibration import Calibration, fit_calibration
+
+# Calibration qui remonte tous les scores : 0.4 brut -> 0.6 calibré
+LEGACY_METADATA = {
+    "calibration": {
+        "method": "isotonic",
+        "x": [0.0, 0.4, 1.0],
+        "y": [0.0, 0.6, 1.0],
+        "operating_points": {"default": {"threshold": 0.5}, "balanced": {"threshold": 0.7}},
+    }
+}
+
+
+def test_default_decides_on_raw_score():
+    calibration = Calibration.from_metadata(LEGACY_METADATA)
+    scores = np.array([0.3, 0.4, 0.5, 0.6])
+    assert calibration.decide(scores).tolist() == [False, False, True, True]
+    assert calibration.probability(0.4) == 0.4
+    # Ancien "default" (calibré) conservé sous "calibrated"
+    assert list(calibration.operating_points) == ["default", "balanced", "calibrated"]
+    assert calibration.decide(scores, "calibrated").tolist() == [False, True, True, True]
+    assert np.allclose(calibration.probabilities(scores, "balanced"), calibration.apply(scores))
+    assert calibration.probability(0.4, "balanced") == 0.6
+
+
+def test_model_without_calibration():
+    calibration = Calibration.from_metadata({})
+    assert list(calibration.operating_points) == ["default"]
+    assert calibration.decide(np.array([0.49, 0.5])).tolist() == [False, True]
+
+
+def test_fitted_calibration_keeps_raw_default():
+    rng = np.random.default_rng(0)
+    y = rng.integers(0, 2, 500)
+    scores = np.clip(0.3 * y + rng.random(500) * 0.7, 0, 1)
+    calibration = Calibration.from_metadata({"calibration": fit_calibration(scores, y).to_metadata()})
+    default = calibration.operating_points["default"]
+    assert default["score"] == "raw" and default["threshold"] == 0.5
+    positive = scores >= 0.5
+    assert default["sensitivity"] == round(float(positive[y == 1].mean()), 4)
+    assert calibration.decide(scores).tolist() == positive.tolist()
+    assert {"calibrated", "balanced", "high_sensitivity", "high_specificity"} <= set(calibration.operating_points)
@@ -0,0 +1,135 @@
+# test_candidate.py
+
+# --- Modèle candidat : routage canary, mise en file des comparaisons, accord et écarts ---
+
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from candidate import CandidateRouter
+
+
+def make_model(version, offset=0.0):
+    return SimpleNamespace(version=version, sha256=f"sha-{version}", offset=offset)
+
+
+def age_score(X, model):
+    # Score déterministe : âge / 100, décalé par modèle
+    return X[:, 0] / 100 + model.offset
+
+
+SERVED = make_model("v0001")
+CANDIDATE = make_model("v0002", 0.1)
+
+
+def patients(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [[int(rng.integers(20, 90))] + rng.integers(0, 2, 15).tolist() for _ in range(n)]
+
+
+def test_canary_routing_is_deterministic_and_matches_percent():
+    router = CandidateRouter(age_score)
+    population = patients(5000)
+    router.configure(CANDIDATE, "shadow", 50)
+    assert router.percent == 0 and not any(router.routes(p) for p in population[:100])
+
+    router.configure(CANDIDATE, "canary", 30)
+    routed = [router.routes(p) for p in population]
+    assert routed == [router.routes(p) for p in population]
+    assert abs(np.mean(routed) - 0.30) < 0.03
+    # Un patient servi à 30 % l'est encore à 60 %
+    router.configure(CANDIDATE, "canary", 60)
+    assert all(router.routes(p) for p, r in zip(population, routed) if r)
+
+    router.configure(CANDIDATE, "canary", 0)
+    assert not any(router.routes(p) for p in population[:100])
+    router.configure(CANDIDATE, "canary", 100)
+    assert all(router.routes(p) for p in population[:100])
+
+
+def test_mirror_skips_same_model_and_sheds():
+    pressure = {"on": False}
+    router = CandidateRouter(age_score, queue_size=2, pressure_fn=lambda: pressure["on"])
+    router.configure(CANDIDATE, "shadow")
+    values = patients(1)[0]
+
+    router.mirror(values, 0.5, SERVED, None)
+    router.mirror(values, 0.5, SERVED, make_model("v0001"))  # même empreinte : rien à comparer
+    assert router.stats()["pending"] == 0
+
+    for _ in range(3):
+        router.mirror(values, 0.5, SERVED, CANDIDATE)
+    pressure["on"] = True
+    router.mirror(values, 0.5, SERVED, CANDIDATE)
+    stats = router.stats()
+    assert stats["pending"] == 2
+    assert stats["shed"] == {"queue_full": 1, "pressure": 1}
+
+
+def test_compare_counts_agreement_and_deltas():
+    router = CandidateRouter(age_score)
+    router.configure(CANDIDATE, "shadow")
+    # 30 ans : 0.30 / 0.40 (accord) ; 45 ans : 0.45 / 0.55 (désaccord au seuil 0.5)
+    batch = [([age] + [0] * 15, age / 100, SERVED, CANDIDATE) for age in (30, 45)]
+    router._compare(batch)
+    stats = router.stats()
+    assert (stats["compared"], stats["agreement"], stats["disagreements"]) == (2, 0.5, 1)
+    assert stats["mean_abs_delta"] == pytest.approx(0.1)
+    assert stats["max_abs_delta"] == pytest.approx(0.1)
+    assert stats["latency_ms"]["v0002/shadow"]["n"] == 2
+
+    def failing(X, model):
+        raise RuntimeError("modèle illisible")
+
+    router.score_fn = failing
+    router._compare(batch)
+    assert router.stats()["compared"] == 2
+    assert router.stats()["shed"] == {"error": 2}
+
+
+def test_configure_resets_stats_on_version_or_mode_change():
+    router = CandidateRouter(age_score)
+    batch = [([45] + [0] * 15, 0.45, SERVED, CANDIDATE)]
+    with pytest.raises(ValueError):
+        router.configure(CANDIDATE, "blue-green")
+    with pytest.raises(ValueError):
+        router.configure(CANDIDATE, "canary", 120)
+
+    router.configure(CANDIDATE, "canary", 10)
+    router._compare(batch)
+    router.mirror(batch[0][0], 0.45, SERVED, CANDIDATE)
+    # Même version, même mode : seul le pourcentage change
+    router.configure(CANDIDATE, "canary", 20)
+    assert (router.stats()["compared"], router.stats()["pending"], router.percent) == (1, 1, 20.0)
+
+    router.configure(CANDIDATE, "shadow")
+    assert (router.stats()["compared"], router.stats()["pending"]) == (0, 0)
+    router._compare(batch)
+    router.configure(make_model("v0003"), "shadow")
+    assert router.stats()["compared"] == 0
+    assert router.settings() == {"version": "v0003", "mode": "shadow", "percent": 0.0}
+
+    router.clear()
+    assert not router.active and router.settings() is None
+
+
+def test_background_comparison():
+    router = CandidateRouter(age_score, batch_rows=4)
+    router.configure(CANDIDATE, "shadow")
+
+    async def scenario():
+        router.start()
+        for values in patients(10):
+            router.mirror(values, values[0] / 100, SERVED, CANDIDATE)
+        for _ in range(100):
+            if router.stats()["compared"] == 10:
+                break
+            await asyncio.sleep(0.01)
+        await router.stop()
+
+    asyncio.run(scenario())
+    stats = router.stats()
+    assert (stats["compared"], stats["pending"]) == (10, 0)
+    assert stats["mean_abs_delta"] == pytest.approx(0.1)
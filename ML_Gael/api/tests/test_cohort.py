@@ -0,0 +1,103 @@
+# test_cohort.py
+
+# --- Scoring en flux des CSV de cohorte : morceaux arbitraires, lignes invalides, champs multi-lignes ---
+
+import csv
+import io
+import os
+import time
+
+import numpy as np
+
+import cohort
+from cohort import CohortScorer
+from conftest import API_DIR
+
+COHORT_PATH = os.path.join(API_DIR, "..", "..", "data", "test_without_class.csv")
+
+
+def age_score(X: np.ndarray) -> np.ndarray:
+    # Score déterministe : âge / 100, plus une part par symptôme présent
+    return X[:, 0] / 100 + X[:, 1:].sum(axis=1) / 1000
+
+
+def score_in_pieces(text: str, sizes, chunk_rows: int = 7):
+    scorer = CohortScorer(age_score, chunk_rows)
+    out, position, i = [], 0, 0
+    while position < len(text):
+        size = sizes[i % len(sizes)]
+        out.append(scorer.feed(text[position:position + size]))
+        position += size
+        i += 1
+    out.append(scorer.close())
+    return "".join(out), scorer
+
+
+def read_cohort() -> str:
+    with open(COHORT_PATH, encoding="utf-8-sig", newline="") as f:
+        return f.read()
+
+
+def test_split_chunks_give_the_same_output():
+    text = read_cohort()
+    whole, scorer = score_in_pieces(text, [len(text)], chunk_rows=10000)
+    for sizes in ([1], [3, 17, 64], [1000]):
+        assert score_in_pieces(text, sizes)[0] == whole
+    rows = list(csv.reader(io.StringIO(whole)))
+    assert rows[0] == ["ID", "class", "probability"]
+    assert len(rows) - 1 == scorer.n_rows == 104
+    assert scorer.n_invalid == 0
+    assert rows[1][0] == "417" and rows[1][2] == "0.5050"
+
+
+def test_invalid_rows_are_kept_with_empty_scores():
+    header, first = read_cohort().splitlines()[:2]
+    bad_age = first.replace(",50,", ",abc,", 1)
+    bad_value = first.replace("Female", "Femme", 1)
+    missing_field = first.rsplit(",", 1)[0]
+    text = "\n".join([header, first, bad_age, bad_value, missing_field, first]) + "\n"
+    out, scorer = score_in_pieces(text, [5], chunk_rows=2)
+    rows = list(csv.reader(io.StringIO(out)))[1:]
+    assert [r[1:] for r in rows] == [["1", "0.5050"], ["", ""], ["", ""], ["", ""], ["1", "0.5050"]]
+    assert (scorer.n_rows, scorer.n_invalid) == (5, 3)
+
+
+def test_quoted_fields_may_contain_newlines():
+    header, first = read_cohort().splitlines()[:2]
+    multiline_id = '"417\r\nbis",' + first.split(",", 1)[1]
+    broken_value = first.replace("Female", '"Fe\nmale"', 1)
+    text = "\r\n".join([header, multiline_id, broken_value, first]) + "\r\n"
+    for sizes in ([len(text)], [1], [4, 9]):
+        out, scorer = score_in_pieces(text, sizes, chunk_rows=2)
+        rows = list(csv.reader(io.StringIO(out)))[1:]
+        assert rows == [["417\r\nbis", "1", "0.5050"], ["417", "", ""], ["417", "1", "0.5050"]]
+        assert (scorer.n_rows, scorer.n_invalid) == (3, 1)
+
+
+def test_stray_quote_rejects_its_line_only():
+    header, first = read_cohort().splitlines()[:2]
+    stray = '41"7,' + first.split(",", 1)[1]
+    unterminated = first.replace("Female", '"Female', 1)
+    text = "\n".join([header, first, stray] + [first] * 250 + [unterminated, first, first]) + "\n"
+    for sizes in ([len(text)], [7, 300]):
+        out, scorer = score_in_pieces(text, sizes, chunk_rows=64)
+        rows = list(csv.reader(io.StringIO(out)))[1:]
+        assert len(rows) == scorer.n_rows == 255
+        assert rows[1] == ['41"7', "", ""]
+        assert rows[252] == ["417", "", ""]
+        assert all(r == ["417", "1", "0.5050"] for i, r in enumerate(rows) if i not in (1, 252))
+        assert scorer.n_invalid == 2
+
+
+def test_stray_quote_stays_linear(monkeypatch):
+    monkeypatch.setattr(cohort, "MAX_RECORD_LINES", 10 ** 9)
+    header, first = read_cohort().splitlines()[:2]
+    stray = '41"7,' + first.split(",", 1)[1]
+    for n in (2000, 20000):
+        text = "\n".join([header, stray] + [first] * n) + "\n"
+        start = time.perf_counter()
+        _, scorer = score_in_pieces(text, [4096])
+        elapsed = time.perf_counter() - start
+        # Coupé par MAX_RECORD_CHARS : toutes les lignes sauf la première sont relues et scorées
+        assert (scorer.n_rows, scorer.n_invalid) == (n + 1, 1)
+    assert elapsed < 5
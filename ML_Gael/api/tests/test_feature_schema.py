@@ -0,0 +1,81 @@
+# test_feature_schema.py
+
+# --- Schéma des caractéristiques : encodage vectorisé des cellules valides et invalides ---
+
+import numpy as np
+import pytest
+
+from feature_schema import (FEATURE_COLUMNS, MAX_AGE, SCHEMA, column_indices, encode_labels, encode_text,
+                            normalize_column)
+
+VALID_ROW = ["50", "Female"] + ["No", "Yes"] * 7
+
+
+def encode_one(row):
+    codes, valid = encode_text([row])
+    return codes[0].tolist(), bool(valid[0])
+
+
+def test_valid_cells_are_encoded():
+    rows = [
+        VALID_ROW,
+        ["0", "Male"] + ["yes", "NO"] * 7,
+        [str(MAX_AGE), "1"] + ["1", "0"] * 7,
+        # Variantes rares (espaces, casse mixte, zéros en tête) : chemin lent
+        [" 042", " mAlE "] + ["Yes ", " no"] * 7,
+    ]
+    codes, valid = encode_text(np.array(rows))
+    assert valid.all()
+    assert codes.tolist() == [
+        [50, 0] + [0, 1] * 7,
+        [0, 1] + [1, 0] * 7,
+        [MAX_AGE, 1] + [1, 0] * 7,
+        [42, 1] + [1, 0] * 7,
+    ]
+
+
+@pytest.mark.parametrize("column, value", [
+    (0, "4.5"),                 # âge non entier
+    (0, "-3"),                  # âge négatif
+    (0, str(MAX_AGE + 1)),      # âge hors bornes
+    (0, "1234567890"),          # au-delà du chemin vectorisé
+    (0, ""),                    # cellule vide
+    (0, "²"),                   # chiffre Unicode (isdigit, refusé par int)
+    (0, "٤٢"),                  # chiffres arabes-indiens
+    (1, "Femme"),               # valeur inconnue
+    (2, "Oui"),
+    (5, "2"),                   # code hors bornes
+    (15, "Yes please"),         # plus de 8 caractères
+    (3, "Yés"),                 # hors vocabulaire, non latin-1 après normalisation
+])
+def test_invalid_cell_invalidates_its_row_only(column, value):
+    bad = list(VALID_ROW)
+    bad[column] = value
+    codes, valid = encode_text([VALID_ROW, bad, VALID_ROW])
+    assert valid.tolist() == [True, False, True]
+    # Une cellule invalide vaut 0, les autres cellules de la ligne restent encodées
+    expected = encode_one(VALID_ROW)[0]
+    expected[column] = 0
+    assert codes[1].tolist() == expected
+
+
+def test_empty_input():
+    codes, valid = encode_text(np.empty((0, len(SCHEMA)), dtype=str))
+    assert codes.shape == (0, len(SCHEMA)) and valid.shape == (0,)
+
+
+def test_labels():
+    codes, known = encode_labels(["Positive", "negative", "1", "0", "maybe"])
+    assert codes.tolist() == [1, 0, 1, 0, 0]
+    assert known.tolist() == [True, True, True, True, False]
+
+
+def test_column_indices_on_raw_header():
+    header = ["ID", "Age", "Gender", "Polyuria", "Polydipsia", "sudden weight loss", "weakness", "Polyphagia",
+              "Genital thrush", "visual blurring", "Itching", "Irritability", "delayed healing", "partial paresis",
+              "muscle stiffness", "Alopecia", "Obesity", "class"]
+    assert normalize_column(" Sudden weight loss ") == "sudden_weight_loss"
+    assert column_indices(header) == list(range(1, 17))
+    assert [normalize_column(header[i]) for i in column_indices(header)] == FEATURE_COLUMNS
+    with pytest.raises(ValueError, match="obesity"):
+        column_indices(header[:-2])
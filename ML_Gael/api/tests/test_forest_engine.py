@@ -0,0 +1,90 @@
+# test_forest_engine.py
+
+# --- Moteur NumPy : équivalence numérique avec scikit-learn ---
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from conftest import API_DIR, ARTIFACT_PATH, DATA_PATH, MODEL_PATH
+from features import FEATURE_COLUMNS
+from forest_engine import NumpyForest, file_sha256, load_model
+
+# Les deux moteurs font la même moyenne de probabilités ; seul l'ordre des additions peut différer
+TOLERANCE = 1e-12
+
+
+def _frame(X):
+    return pd.DataFrame(X, columns=FEATURE_COLUMNS)
+
+
+def test_exported_pipeline_matches_sklearn(pipeline, training_data):
+    X, _ = training_data
+    forest = NumpyForest.from_pipeline(pipeline, file_sha256(MODEL_PATH))
+    expected = pipeline.predict_proba(_frame(X))
+    assert np.abs(forest.predict_proba(X) - expected).max() < TOLERANCE
+    assert (forest.predict(X) == pipeline.predict(_frame(X))).all()
+
+
+def test_deep_forest_on_random_domain_matches_sklearn():
+    # Arbres non élagués (profondeurs différentes) et âges hors de l'intervalle d'entraînement
+    rng = np.random.default_rng(0)
+    X = np.column_stack([rng.integers(0, 151, 2000), rng.integers(0, 2, (2000, 15))]).astype(float)
+    y = (X[:, 1] + X[:, 2] + rng.random(2000) > 1.5).astype(int)
+    preprocessor = ColumnTransformer([("num", StandardScaler(), ["age"])], remainder="passthrough")
+    model = Pipeline([("preprocessor", preprocessor),
+                      ("classifier", RandomForestClassifier(n_estimators=25, random_state=0))])
+    model.fit(_frame(X[:1500]), y[:1500])
+    forest = NumpyForest.from_pipeline(model)
+    expected = model.predict_proba(_frame(X[1500:]))
+    assert np.abs(forest.predict_proba(X[1500:]) - expected).max() < TOLERANCE
+
+
+def test_saved_artifact_round_trip(pipeline, training_data, tmp_path):
+    X, _ = training_data
+    forest = NumpyForest.from_pipeline(pipeline, "abc")
+    forest.save(str(tmp_path / "m.model"))
+    assert NumpyForest.is_artifact(str(tmp_path / "m.model"))
+    loaded = NumpyForest.load(str(tmp_path / "m.model"))
+    assert loaded.model_sha256 == "abc"
+    assert np.array_equal(loaded.predict_proba(X), forest.predict_proba(X))
+
+
+def test_load_model_prefers_matching_artifact(pipeline, training_data):
+    X, _ = training_data
+    model, sha256 = load_model(MODEL_PATH, ARTIFACT_PATH)
+    assert isinstance(model, NumpyForest)
+    assert sha256 == file_sha256(MODEL_PATH)
+    assert np.abs(model.predict_proba(X) - pipeline.predict_proba(_frame(X))).max() < TOLERANCE
+
+
+def test_load_model_ignores_artifact_of_another_model(pipeline, tmp_path):
+    NumpyForest.from_pipeline(pipeline, "un-autre-modele").save(str(tmp_path / "m.model"))
+    model, sha256 = load_model(MODEL_PATH, str(tmp_path / "m.model"))
+    assert not isinstance(model, NumpyForest)
+    assert sha256 == file_sha256(MODEL_PATH)
+
+
+def test_feature_order_is_checked(pipeline):
+    forest = NumpyForest.from_pipeline(pipeline)
+    forest.check_feature_order(FEATURE_COLUMNS)
+    with pytest.raises(ValueError):
+        forest.check_feature_order(FEATURE_COLUMNS[::-1])
+
+
+@pytest.mark.parametrize("data", [DATA_PATH, os.path.join(API_DIR, "..", "..", "data", "train_with_id.csv")])
+def test_verify_cli_accepts_clean_and_raw_csv(data):
+    # CSV nettoyé (0/1) ou brut (ID, en-têtes "Sudden weight loss", Yes/No) : même encodage que cohort.py
+    result = subprocess.run([sys.executable, "forest_engine.py", "verify", "--model", MODEL_PATH,
+                             "--artifact", ARTIFACT_PATH, "--data", data],
+                            cwd=API_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert "416 lignes" in result.stdout
@@ -0,0 +1,83 @@
+# test_incremental.py
+
+# --- Ré-entraînement incrémental : croissance de la forêt, refus sur dérive, reprise avec --force ---
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import ARTIFACT_PATH, DATA_PATH, MODEL_PATH
+from incremental import SEGMENT_APPLIED, SEGMENT_PENDING, TrainingStore, init_store, update
+
+
+@pytest.fixture
+def store(tmp_path):
+    return init_store(str(tmp_path / "store"), DATA_PATH, None)
+
+
+def write_batch(path, df):
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def run_update(store, sources, out, force=False):
+    return update(store, MODEL_PATH, ARTIFACT_PATH, sources, str(out), None, force=force)
+
+
+def test_update_grows_the_forest(store, tmp_path):
+    data = pd.read_csv(DATA_PATH)
+    batch = write_batch(tmp_path / "batch.csv", data.sample(120, random_state=0))
+    history_rows = store.n_rows
+    out = tmp_path / "updated.pkl"
+
+    report = run_update(store, [batch], out)
+    assert report["updated"] and not report["reasons"]
+    assert report["trees_added"] == 29  # ceil(100 arbres * 120 / 416)
+    original, updated = joblib.load(MODEL_PATH)[-1], joblib.load(out)[-1]
+    assert len(updated.estimators_) == len(original.estimators_) + report["trees_added"]
+    assert not updated.warm_start
+    # Arbres existants inchangés
+    X = np.zeros((1, original.n_features_in_))
+    assert all((a.predict_proba(X) == b.predict_proba(X)).all()
+               for a, b in zip(original.estimators_, updated.estimators_))
+
+    reopened = TrainingStore(store.root)
+    assert reopened.n_rows == history_rows + 120
+    assert reopened.segments[-1]["status"] == SEGMENT_APPLIED
+    # Source déjà appliquée : ignorée
+    assert run_update(reopened, [batch], tmp_path / "again.pkl")["rows"] == 0
+
+    with pytest.raises(ValueError):
+        run_update(reopened, [batch], MODEL_PATH)
+
+
+def test_drift_refusal_keeps_the_segment_pending_until_forced(store, tmp_path):
+    data = pd.read_csv(DATA_PATH)
+    shifted = data[data["class"] == 1].head(40).assign(age=95)
+    batch = write_batch(tmp_path / "shifted.csv", shifted)
+    history_rows = store.n_rows
+    out = tmp_path / "updated.pkl"
+
+    report = run_update(store, [batch], out)
+    assert not report["updated"] and report["full_retrain_required"]
+    assert any("PSI" in reason for reason in report["reasons"])
+    assert report["pending_segments"] == ["segment-0002.npy"]
+    assert not out.exists()
+    # Segment gardé pour le ré-entraînement complet, hors de l'historique
+    reopened = TrainingStore(store.root)
+    assert reopened.segments[-1]["status"] == SEGMENT_PENDING
+    assert reopened.n_rows == history_rows
+    assert len(reopened.load()) == history_rows + 40
+
+    # Nouvelle tentative sans --force : toujours refusée, sans nouveau segment
+    assert not run_update(reopened, [batch], out)["updated"]
+    assert len(TrainingStore(store.root).segments) == 2
+
+    # --force : le segment en attente est repris et appliqué
+    forced = run_update(TrainingStore(store.root), [batch], out, force=True)
+    assert forced["updated"] and forced["rows"] == 40 and forced["reasons"]
+    reopened = TrainingStore(store.root)
+    assert [s["status"] for s in reopened.segments] == [SEGMENT_APPLIED, SEGMENT_APPLIED]
+    assert reopened.n_rows == history_rows + 40
+    assert len(joblib.load(out)[-1].estimators_) == 100 + forced["trees_added"]
@@ -0,0 +1,62 @@
+# test_metrics.py
+
+# --- Métriques Prometheus : familles abstraites, agrégation entre workers ---
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from metrics import Counter, Gauge, Histogram, MultiProcessMetrics, Registry, _Metric
+
+
+def make_registry():
+    registry = Registry()
+    requests = registry.register(Counter("requests_total", "Requêtes.", ("status",)))
+    in_flight = registry.register(Gauge("in_flight", "En cours."))
+    model = registry.register(Gauge("model_info", "Modèle.", ("version",), multiprocess_mode="max"))
+    latency = registry.register(Histogram("latency_seconds", "Latence.", buckets=(0.1, 1.0)))
+    return registry, requests, in_flight, model, latency
+
+
+def test_metric_family_is_abstract():
+    with pytest.raises(TypeError):
+        _Metric("x", "doc")
+
+
+def test_workers_are_summed(tmp_path):
+    registry, requests, in_flight, model, latency = make_registry()
+    requests.labels(200).inc(3)
+    in_flight.set(2)
+    model.labels("v1").set(1)
+    latency.observe(0.05)
+
+    # État d'un autre worker (en vie : le processus de test) et d'un worker arrêté
+    other, _, _, _, _ = make_registry()
+    other_requests, other_in_flight, other_model, other_latency = other.metrics
+    other_requests.labels(200).inc(4)
+    other_requests.labels(500).inc(1)
+    other_in_flight.set(5)
+    other_model.labels("v1").set(1)
+    other_latency.observe(0.5)
+    dead = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    with open(tmp_path / "dead.json", "w", encoding="utf-8") as f:
+        json.dump({"pid": int(dead.stdout), "metrics": other.state()}, f)
+    with open(tmp_path / "alive.json", "w", encoding="utf-8") as f:
+        json.dump({"pid": os.getppid(), "metrics": {"in_flight": [[[], 1.0]]}}, f)
+
+    text = MultiProcessMetrics(str(tmp_path), registry).render()
+    assert os.path.exists(tmp_path / f"{os.getpid()}.json")
+    lines = set(text.splitlines())
+    assert 'requests_total{status="200"} 7' in lines
+    assert 'requests_total{status="500"} 1' in lines
+    # Jauges : worker arrêté ignoré ; "max" pour le modèle servi
+    assert "in_flight 3" in lines
+    assert 'model_info{version="v1"} 1' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert "latency_seconds_count 2" in lines
+    # Les séries du processus ne sont pas modifiées par l'agrégation
+    assert requests.labels(200).value == 3
@@ -0,0 +1,64 @@
+# test_registry.py
+
+# --- Registre de modèles : publication, activation, retour arrière ---
+
+import pytest
+
+from conftest import ARTIFACT_PATH, MODEL_PATH, TABLE_PATH
+from registry import ModelRegistry, RegistryError
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return ModelRegistry(str(tmp_path / "models"))
+
+
+def publish_versions(registry, n):
+    return [registry.publish(MODEL_PATH).version for _ in range(n)]
+
+
+def test_publish_and_verify(registry):
+    entry = registry.publish(MODEL_PATH, ARTIFACT_PATH, TABLE_PATH)
+    assert entry.version == "v0001"
+    assert registry.versions() == ["v0001"]
+    assert set(entry.manifest["files"]) >= {"model.pkl", "model.model", "table.npz"}
+    registry.get("v0001").verify()
+
+    with open(entry.table_path, "ab") as f:
+        f.write(b"modification")
+    with pytest.raises(RegistryError):
+        registry.get("v0001").verify()
+
+    with pytest.raises(RegistryError):
+        registry.publish(MODEL_PATH, version="v0001")
+    with pytest.raises(RegistryError):
+        registry.get("../v0001")
+
+
+def test_activate_and_candidate_promotion(registry):
+    publish_versions(registry, 2)
+    assert registry.current() is None and registry.previous() is None
+    registry.activate("v0001")
+    registry.set_candidate("v0002", "canary", 10)
+    assert registry.candidate() == {"version": "v0002", "mode": "canary", "percent": 10}
+    registry.activate("v0002")
+    assert registry.current() == "v0002"
+    assert registry.candidate() is None
+    with pytest.raises(RegistryError):
+        registry.activate("v0009")
+
+
+def test_successive_rollbacks_walk_back_history(registry):
+    publish_versions(registry, 3)
+    for version in ("v0001", "v0002", "v0003"):
+        registry.activate(version)
+    assert registry.rollback() == "v0002"
+    assert registry.rollback() == "v0001"
+    assert registry.current() == "v0001"
+    with pytest.raises(RegistryError):
+        registry.rollback()
+
+    # Nouvelle activation après les retours arrière : le suivant revient à la version d'avant
+    registry.activate("v0003")
+    assert registry.previous() == "v0001"
+    assert registry.history() == ["v0001", "v0002", "v0003", "v0002", "v0001", "v0003"]
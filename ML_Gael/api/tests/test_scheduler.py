@@ -0,0 +1,116 @@
+# test_scheduler.py
+
+# --- Ordonnanceur d'inférence : ordre des réponses, file pleine (429), arrêt (503) ---
+
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from scheduler import MicroBatcher, QueueFullError, SchedulerNotRunningError
+
+
+def row_sum(X: np.ndarray) -> np.ndarray:
+    return X.sum(axis=1)
+
+
+def test_each_request_gets_its_own_score_in_batches():
+    batcher = MicroBatcher(row_sum, max_batch_rows=8, max_wait_ms=20, workers=1)
+
+    async def scenario():
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit([i, 2 * i]) for i in range(20)))
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(scenario()) == [3.0 * i for i in range(20)]
+    stats = batcher.stats()
+    assert stats["rows"] == 20
+    assert stats["batches"] < 20
+    assert stats["max_batch_rows_seen"] <= 8
+
+
+def test_rows_are_scored_by_their_own_model():
+    def scaled(X, model):
+        return X.sum(axis=1) * model
+
+    batcher = MicroBatcher(scaled, max_batch_rows=8, max_wait_ms=20, workers=1)
+
+    async def scenario():
+        batcher.start()
+        try:
+            return await asyncio.gather(batcher.submit([1.0], 10), batcher.submit([1.0], 100))
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(scenario()) == [10.0, 100.0]
+
+
+def test_queue_full_is_rejected():
+    release = threading.Event()
+
+    def blocked(X):
+        release.wait(5)
+        return X.sum(axis=1)
+
+    batcher = MicroBatcher(blocked, max_batch_rows=1, max_wait_ms=0, max_queue=2, workers=1)
+
+    async def scenario():
+        batcher.start()
+        # 1re requête en cours de calcul (pool occupé), les 2 suivantes remplissent la file
+        running = []
+        for i in range(3):
+            running.append(asyncio.ensure_future(batcher.submit([i])))
+            await asyncio.sleep(0.02)
+        with pytest.raises(QueueFullError):
+            await batcher.submit([9])
+        release.set()
+        scores = await asyncio.gather(*running)
+        await batcher.stop()
+        return scores
+
+    assert asyncio.run(scenario()) == [0.0, 1.0, 2.0]
+    assert batcher.stats()["rejected"] == 1
+
+
+def test_submit_when_stopped():
+    batcher = MicroBatcher(row_sum)
+
+    async def scenario():
+        with pytest.raises(SchedulerNotRunningError):
+            await batcher.submit([1])
+        batcher.start()
+        await batcher.stop()
+        with pytest.raises(SchedulerNotRunningError):
+            await batcher.submit([1])
+
+    asyncio.run(scenario())
+
+
+def test_stop_fails_queued_and_collected_requests():
+    release = threading.Event()
+
+    def blocked(X):
+        release.wait(5)
+        return X.sum(axis=1)
+
+    # Lot en cours (bloqué au-delà de stop_timeout), lot en formation (fenêtre longue), requêtes en file
+    batcher = MicroBatcher(blocked, max_batch_rows=4, max_wait_ms=10_000, workers=2, stop_timeout=0.05)
+
+    async def scenario():
+        batcher.start()
+        first = [asyncio.ensure_future(batcher.submit([i])) for i in range(4)]
+        await asyncio.sleep(0.05)
+        collecting = asyncio.ensure_future(batcher.submit([10]))
+        await asyncio.sleep(0.05)
+        # Le thread bloqué est libéré après l'annulation du lot, pendant l'arrêt du pool
+        asyncio.get_running_loop().call_later(0.2, release.set)
+        await batcher.stop()
+        return await asyncio.gather(*first, collecting, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert len(results) == 5
+    assert all(isinstance(r, SchedulerNotRunningError) for r in results)
+    assert not batcher.running
@@ -0,0 +1,52 @@
+# test_score_table.py
+
+# --- Table de scores : lignes couvertes et non couvertes ---
+
+import numpy as np
+import pandas as pd
+
+from conftest import MODEL_PATH, TABLE_PATH
+from features import FEATURE_COLUMNS
+from forest_engine import file_sha256
+from score_table import ScoreTable
+
+
+def _patient(age, symptoms=0):
+    return [age] + [symptoms] * (len(FEATURE_COLUMNS) - 1)
+
+
+def test_shipped_table_matches_model(pipeline, training_data):
+    X, _ = training_data
+    table = ScoreTable.load(TABLE_PATH)
+    assert table.model_sha256 == file_sha256(MODEL_PATH)
+    proba, covered = table.lookup(X)
+    assert covered.all()
+    expected = pipeline.predict_proba(pd.DataFrame(X, columns=FEATURE_COLUMNS))[:, 1]
+    assert np.array_equal(proba, expected)
+
+
+def test_uncovered_rows_are_nan(pipeline):
+    table = ScoreTable.compile(pipeline, "sha", age_min=20, age_max=30)
+    X = np.array([
+        _patient(25, 1),                 # couverte
+        _patient(19),                    # âge sous la table
+        _patient(31),                    # âge au-dessus de la table
+        _patient(25.5),                  # âge non entier
+        _patient(-1),                    # âge négatif
+        [25, 2] + [0] * 14,              # valeur binaire différente de 0/1
+    ], dtype=np.float64)
+    proba, covered = table.lookup(X)
+    assert covered.tolist() == [True, False, False, False, False, False]
+    assert not np.isnan(proba[0]) and np.isnan(proba[1:]).all()
+    expected = pipeline.predict_proba(pd.DataFrame(X[:1], columns=FEATURE_COLUMNS))[0, 1]
+    assert proba[0] == expected
+
+
+def test_lookup_one_agrees_with_vectorised_lookup(pipeline, tmp_path):
+    table = ScoreTable.compile(pipeline, "sha", age_min=20, age_max=30)
+    table.save(str(tmp_path / "t.npz"))
+    loaded = ScoreTable.load(str(tmp_path / "t.npz"))
+    row = _patient(27, 1)
+    assert loaded.lookup_one(27, row[1:]) == table.lookup(np.array([row], dtype=float))[0][0]
+    assert loaded.lookup_one(40, row[1:]) is None
+    assert loaded.lookup_one(27, [2] + row[2:]) is None
@@ -0,0 +1,379 @@
+# train.py
+
+# --- Entraînement reproductible et sélection de modèle ---
+#
+# Reprend le pipeline du notebook ML_Entrainement_Diabete.ipynb (ColumnTransformer : StandardScaler sur
+# 'age', le reste inchangé) et remplace le RandomForest fixé à la main par une recherche d'hyperparamètres
+# en validation croisée stratifiée sur trois familles de modèles (RandomForest, LogisticRegression,
+# GradientBoosting), exécutée sur tous les cœurs (joblib, processus 'loky').
+#
+# Le préprocesseur ajusté sur chaque pli est mis en cache sur disque (Pipeline(memory=...)) : les
+# candidats suivants le relisent au lieu de le recalculer.
+#
+# Sélection sous contrainte de latence : chaque configuration est ré-entraînée sur toutes les données puis
+# mesurée telle qu'elle sera servie (moteur NumPy pour les forêts, ArrayPipeline sinon) : latence d'une
+# ligne (p50/p99), d'un lot de 1000 lignes et taille de l'artefact. Le rapport donne le front de Pareto
+# ROC-AUC / latence p99 ; le modèle retenu est celui de meilleure ROC-AUC qui respecte le budget
+# (--latency-budget-ms). Son profil de latence est enregistré dans les métadonnées de l'artefact.
+#
+# Calibration : les probabilités du modèle retenu sont calibrées (isotonique ou sigmoïde, --calibration) sur
+# ses prédictions hors-pli, et les seuils des points de fonctionnement (sensibilité / spécificité cibles) sont
+# enregistrés avec la calibration dans les métadonnées (cf. calibration.py).
+#
+# Usage :
+#   python train.py --data ../../data/diabetes_clean.csv --out modele_diabete_XX.pkl
+#   python train.py --latency-budget-ms 1 --candidates random_forest logistic_regression --n-jobs 2
+#   python train.py --data ../../data/diabetes_clean.packed.npy   (format compact, cf. features.py)
+#   python train.py --data training_store                          (magasin incrémental, cf. incremental.py)
+#   python train.py --data ../../data/train_with_id.csv            (CSV brut, encodé par feature_schema.py)
+
+import argparse
+import datetime
+import io
+import json
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import GridSearchCV, StratifiedKFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from calibration import METHODS as CALIBRATION_METHODS, TARGET_SENSITIVITY, TARGET_SPECIFICITY, fit_calibration, out_of_fold_scores
+from feature_schema import FEATURE_COLUMNS, TARGET_COLUMN, read_csv
+from features import NO_LABEL, load_packed, unpack_rows
+from forest_engine import TREE_ARRAYS, ArrayPipeline, NumpyForest, file_sha256
+from incremental import STORE_MANIFEST, TrainingStore
+
+NUMERICAL_FEATURES = ["age"]
+RANDOM_STATE = 42
+
+# Métriques calculées en validation croisée ; la sélection se fait sur SELECTION_METRIC
+SCORING = ["roc_auc", "accuracy", "f1", "recall"]
+SELECTION_METRIC = "roc_auc"
+
+# Mesure de latence : nombre d'appels d'une ligne (pour p50/p99) et de lots de BATCH_ROWS lignes
+LATENCY_SINGLE_CALLS = 300
+LATENCY_BATCH_CALLS = 10
+BATCH_ROWS = 1000
+
+# Familles de modèles candidates et grilles d'hyperparamètres (paramètres du pas 'classifier' du pipeline)
+CANDIDATES = {
+    "random_forest": (
+        RandomForestClassifier(random_state=RANDOM_STATE, class_weight="balanced"),
+        {"n_estimators": [10, 50, 100], "max_depth": [None, 6, 10]},
+    ),
+    "logistic_regression": (
+        LogisticRegression(max_iter=1000, class_weight="balanced"),
+        {"C": [0.1, 1.0, 10.0]},
+    ),
+    "gradient_boosting": (
+        GradientBoostingClassifier(random_state=RANDOM_STATE),
+        {"n_estimators": [50, 100], "max_depth": [2, 3]},
+    ),
+}
+
+
+def load_dataset(path: str):
+    """
+    Charge le CSV d'entraînement nettoyé (data/diabetes_clean.csv) ou brut (data/train_with_id.csv, Yes/No),
+    sa version compacte (.npy, cf. features.py) ou le magasin du ré-entraînement incrémental (répertoire, cf. incremental.py) : renvoie (X dans l'ordre
+    FEATURE_COLUMNS, y).
+    """
+    if TrainingStore.is_store(path):
+        # Magasin du ré-entraînement incrémental (cf. incremental.py) : ré-entraînement complet sur tout l'historique
+        packed = TrainingStore(path).load()
+        X = pd.DataFrame(unpack_rows(packed).astype(np.int64), columns=FEATURE_COLUMNS)
+        return X, pd.Series(packed["label"].astype(np.int64), name=TARGET_COLUMN)
+    if path.endswith(".npy"):
+        packed = load_packed(path)
+        if (packed["label"] == NO_LABEL).any():
+            raise ValueError(f"{path} contient des lignes sans classe.")
+        X = pd.DataFrame(unpack_rows(packed).astype(np.int64), columns=FEATURE_COLUMNS)
+        return X, pd.Series(packed["label"].astype(np.int64), name=TARGET_COLUMN)
+    # CSV nettoyé ou brut : encodage et validation par le schéma (cf. feature_schema.py), lignes invalides écartées
+    X, y, valid = read_csv(path, with_label=True)
+    if not valid.all():
+        rows = np.flatnonzero(~valid) + 2  # numéros de ligne du fichier (en-tête = ligne 1)
+        print(f"ATTENTION: {len(rows)} ligne(s) invalide(s) ignorée(s) dans {path} : {rows[:10].tolist()}")
+    return pd.DataFrame(X[valid], columns=FEATURE_COLUMNS), pd.Series(y[valid], name=TARGET_COLUMN)
+
+
+def data_sha256(path: str) -> str:
+    """
+    Empreinte des données d'entraînement (manifeste pour un magasin incrémental, qui liste ses segments).
+    """
+    return file_sha256(os.path.join(path, STORE_MANIFEST) if TrainingStore.is_store(path) else path)
+
+
+def build_pipeline(classifier, memory=None) -> Pipeline:
+    """
+    Pipeline identique à celui du notebook : StandardScaler sur l'âge, autres colonnes inchangées, puis le classifieur.
+    """
+    preprocessor = ColumnTransformer(
+        transformers=[("scaler", StandardScaler(), NUMERICAL_FEATURES)],
+        remainder="passthrough",
+    )
+    return Pipeline(steps=[("preprocessor", preprocessor), ("classifier", classifier)], memory=memory)
+
+
+def search_candidate(name: str, X, y, cv, n_jobs: int, memory) -> list:
+    """
+    Recherche en grille d'une famille de modèles. Renvoie une entrée (hyperparamètres, métriques de
+    validation croisée) par configuration testée.
+    """
+    classifier, grid = CANDIDATES[name]
+    search = GridSearchCV(
+        build_pipeline(classifier, memory),
+        {f"classifier__{k}": v for k, v in grid.items()},
+        scoring=SCORING,
+        refit=False,
+        cv=cv,
+        n_jobs=n_jobs,
+    )
+    search.fit(X, y)
+
+    results = search.cv_results_
+    configurations = []
+    for i, params in enumerate(results["params"]):
+        configurations.append({
+            "name": name,
+            "params": {k.replace("classifier__", ""): v for k, v in params.items()},
+            "cv": {
+                metric: {
+                    "mean": round(float(results[f"mean_test_{metric}"][i]), 4),
+                    "std": round(float(results[f"std_test_{metric}"][i]), 4),
+                }
+                for metric in SCORING
+            },
+            "mean_fit_seconds": round(float(results["mean_fit_time"][i]), 4),
+        })
+    return configurations
+
+
+def fit_configuration(configuration: dict, X, y) -> Pipeline:
+    """
+    Ré-entraîne une configuration sur toutes les données.
+    """
+    classifier = clone(CANDIDATES[configuration["name"]][0]).set_params(**configuration["params"])
+    return build_pipeline(classifier).fit(X, y)
+
+
+def serving_model(pipeline):
+    """
+    Modèle tel que l'API le sert : moteur NumPy pour les forêts aléatoires, ArrayPipeline sinon.
+    """
+    try:
+        return NumpyForest.from_pipeline(pipeline)
+    except ValueError:
+        return ArrayPipeline(pipeline)
+
+
+def measure_serving(pipeline, X) -> dict:
+    """
+    Latences d'inférence (une ligne : p50/p99 ; lot de BATCH_ROWS lignes : médiane) et tailles d'artefact.
+    """
+    model = serving_model(pipeline)
+    rows = X.to_numpy(dtype=np.float64)
+    batch = np.resize(rows, (BATCH_ROWS, rows.shape[1]))
+    model.predict_proba(rows[:1])  # premier appel exclu
+
+    single = np.empty(LATENCY_SINGLE_CALLS)
+    for i in range(LATENCY_SINGLE_CALLS):
+        row = rows[i % len(rows)][None, :]
+        start = time.perf_counter()
+        model.predict_proba(row)
+        single[i] = time.perf_counter() - start
+
+    batched = np.empty(LATENCY_BATCH_CALLS)
+    for i in range(LATENCY_BATCH_CALLS):
+        start = time.perf_counter()
+        model.predict_proba(batch)
+        batched[i] = time.perf_counter() - start
+
+    buffer = io.BytesIO()
+    joblib.dump(pipeline, buffer)
+    artifact_bytes = buffer.tell()
+    if isinstance(model, NumpyForest):
+        artifact_bytes = sum(getattr(model, name).nbytes for name in TREE_ARRAYS)
+    return {
+        "engine": type(model).__name__,
+        "single_row_p50_ms": round(float(np.percentile(single, 50)) * 1000, 4),
+        "single_row_p99_ms": round(float(np.percentile(single, 99)) * 1000, 4),
+        f"batch_{BATCH_ROWS}_ms": round(float(np.median(batched)) * 1000, 3),
+        "pickle_bytes": buffer.tell(),
+        "artifact_bytes": int(artifact_bytes),
+    }
+
+
+def pareto_front(configurations: list) -> list:
+    """
+    Indices des configurations non dominées : aucune autre n'a une ROC-AUC au moins égale ET une latence p99
+    au moins aussi faible (avec au moins une des deux strictement meilleure).
+    """
+    points = [(c["cv"][SELECTION_METRIC]["mean"], c["latency"]["single_row_p99_ms"]) for c in configurations]
+    front = []
+    for i, (auc, p99) in enumerate(points):
+        dominated = any(
+            a >= auc and l <= p99 and (a > auc or l < p99)
+            for j, (a, l) in enumerate(points) if j != i
+        )
+        if not dominated:
+            front.append(i)
+    return front
+
+
+def select(configurations: list, latency_budget_ms: float = None) -> int:
+    """
+    Indice de la configuration de meilleure ROC-AUC dont la latence p99 respecte le budget
+    (à défaut : la plus rapide, avec un avertissement).
+    """
+    eligible = [i for i, c in enumerate(configurations)
+                if latency_budget_ms is None or c["latency"]["single_row_p99_ms"] <= latency_budget_ms]
+    if not eligible:
+        fastest = min(range(len(configurations)), key=lambda i: configurations[i]["latency"]["single_row_p99_ms"])
+        print(f"ATTENTION: aucun modèle ne respecte le budget de {latency_budget_ms} ms, sélection du plus rapide.")
+        return fastest
+    return max(eligible, key=lambda i: (configurations[i]["cv"][SELECTION_METRIC]["mean"],
+                                        -configurations[i]["latency"]["single_row_p99_ms"]))
+
+
+def calibrate(configuration: dict, X, y, cv, n_jobs: int, method: str, target_sensitivity: float,
+              target_specificity: float):
+    """
+    Calibration de la configuration retenue, ajustée sur ses prédictions hors-pli (mêmes plis que la sélection).
+    """
+    classifier = clone(CANDIDATES[configuration["name"]][0]).set_params(**configuration["params"])
+    scores = out_of_fold_scores(build_pipeline(classifier), X, y, cv.n_splits, RANDOM_STATE, n_jobs)
+    return fit_calibration(scores, y.to_numpy(), method, target_sensitivity, target_specificity)
+
+
+def train(data_path: str, candidates=None, n_folds: int = 5, n_jobs: int = -1, cache_dir: str = None,
+          latency_budget_ms: float = None, calibration: str = "isotonic",
+          target_sensitivity: float = TARGET_SENSITIVITY, target_specificity: float = TARGET_SPECIFICITY) -> dict:
+    """
+    Lance la sélection de modèle et renvoie un rapport : configurations classées par ROC-AUC moyenne
+    (avec latences et front de Pareto), puis la configuration retenue, sa calibration et son pipeline.
+    """
+    X, y = load_dataset(data_path)
+    cv = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=RANDOM_STATE)
+    names = candidates or list(CANDIDATES)
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="diabete_train_") as tmp_dir:
+        # Préprocesseurs ajustés par pli, partagés entre candidats et entre processus
+        memory = joblib.Memory(cache_dir or tmp_dir, verbose=0)
+        with joblib.parallel_backend("loky", n_jobs=n_jobs):
+            configurations = [c for name in names for c in search_candidate(name, X, y, cv, n_jobs, memory)]
+            search_seconds = time.perf_counter() - start
+            pipelines = joblib.Parallel()(joblib.delayed(fit_configuration)(c, X, y) for c in configurations)
+
+    # Mesures de latence séquentielles (aucun autre calcul en parallèle pendant la mesure)
+    for configuration, pipeline in zip(configurations, pipelines):
+        configuration["latency"] = measure_serving(pipeline, X)
+    elapsed = time.perf_counter() - start
+
+    order = sorted(range(len(configurations)), key=lambda i: configurations[i]["cv"][SELECTION_METRIC]["mean"], reverse=True)
+    configurations = [configurations[i] for i in order]
+    pipelines = [pipelines[i] for i in order]
+    for i in pareto_front(configurations):
+        configurations[i]["pareto"] = True
+    winner = select(configurations, latency_budget_ms)
+
+    import sklearn
+    selected = configurations[winner]
+    calibrated = calibrate(selected, X, y, cv, n_jobs, calibration, target_sensitivity, target_specificity)
+    return {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "data": {"path": data_path, "sha256": data_sha256(data_path), "n_rows": len(X), "positive_rate": round(float(y.mean()), 4)},
+        "sklearn_version": sklearn.__version__,
+        "cv_folds": n_folds,
+        "n_jobs": n_jobs,
+        "selection_metric": SELECTION_METRIC,
+        "latency_budget_ms": latency_budget_ms,
+        "search_seconds": round(search_seconds, 2),
+        "total_seconds": round(elapsed, 2),
+        "winner": selected["name"],
+        "pipeline": pipelines[winner],
+        # Enregistré dans l'artefact du modèle (manifest.json ou rapport à côté du .pkl) et exposé par l'API
+        "metadata": {
+            "model": selected["name"],
+            "params": selected["params"],
+            "cv_" + SELECTION_METRIC: selected["cv"][SELECTION_METRIC]["mean"],
+            "latency_budget_ms": latency_budget_ms,
+            "latency": selected["latency"],
+            "calibration": calibrated.to_metadata(),
+        },
+        "candidates": [{**c, "pareto": c.get("pareto", False)} for c in configurations],
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"   {'candidat':<20} {'ROC-AUC':>15} {'accuracy':>9} {'p50 1 ligne':>12} {'p99 1 ligne':>12} "
+          f"{'lot ' + str(BATCH_ROWS):>10} {'artefact':>10}  paramètres")
+    for r in report["candidates"]:
+        cv, lat = r["cv"], r["latency"]
+        flag = "*" if r["pareto"] else " "
+        print(f" {flag} {r['name']:<20} {cv['roc_auc']['mean']:>8.4f} ±{cv['roc_auc']['std']:.3f} {cv['accuracy']['mean']:>9.4f} "
+              f"{lat['single_row_p50_ms']:>9.3f} ms {lat['single_row_p99_ms']:>9.3f} ms {lat[f'batch_{BATCH_ROWS}_ms']:>7.2f} ms "
+              f"{lat['artifact_bytes'] / 1024:>7.0f} Ko  {r['params']}")
+    print("(* = front de Pareto ROC-AUC / latence p99)")
+    budget = report["latency_budget_ms"]
+    print(f"Modèle retenu : {report['winner']} {report['metadata']['params']}"
+          f"{f' (budget p99 : {budget} ms)' if budget is not None else ''} ; sélection en {report['total_seconds']}s")
+    calibration = report["metadata"]["calibration"]
+    print(f"Calibration {calibration['method']} ({len(calibration['x'])} points), seuils hors-pli :")
+    for name, point in calibration["operating_points"].items():
+        print(f"   {name:<17} seuil {point['threshold']:.4f}  sensibilité {point['sensitivity']:.4f}  "
+              f"spécificité {point['specificity']:.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entraîne et sélectionne le modèle de prédiction du diabète.")
+    parser.add_argument("--data", default="../../data/diabetes_clean.csv", help="CSV d'entraînement (nettoyé ou brut) ou .npy compact")
+    parser.add_argument("--out", default="modele_diabete_XX.pkl", help="Pipeline retenu (.pkl)")
+    parser.add_argument("--report", help="Rapport JSON (défaut : <out sans .pkl>.report.json)")
+    parser.add_argument("--artifact", help="Artefact NumPy si le modèle retenu est une forêt (défaut : <out sans .pkl>.model)")
+    parser.add_argument("--candidates", nargs="+", choices=list(CANDIDATES), help="Familles de modèles à comparer")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Processus parallèles (-1 = tous les cœurs)")
+    parser.add_argument("--cache-dir", help="Répertoire du cache des préprocesseurs (défaut : temporaire)")
+    parser.add_argument("--latency-budget-ms", type=float, help="Latence p99 maximale d'une prédiction à une ligne")
+    parser.add_argument("--calibration", choices=CALIBRATION_METHODS, default="isotonic", help="Calibration des probabilités")
+    parser.add_argument("--target-sensitivity", type=float, default=TARGET_SENSITIVITY, help="Point de fonctionnement high_sensitivity")
+    parser.add_argument("--target-specificity", type=float, default=TARGET_SPECIFICITY, help="Point de fonctionnement high_specificity")
+    args = parser.parse_args()
+
+    report = train(args.data, args.candidates, args.folds, args.n_jobs, args.cache_dir, args.latency_budget_ms,
+                   args.calibration, args.target_sensitivity, args.target_specificity)
+    print_report(report)
+
+    pipeline = report.pop("pipeline")
+    joblib.dump(pipeline, args.out)
+    report["model"] = {"path": args.out, "sha256": file_sha256(args.out)}
+    report_path = args.report or f"{os.path.splitext(args.out)[0]}.report.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=lambda o: o.item() if isinstance(o, np.generic) else str(o))
+    print(f"Modèle sauvegardé : {args.out} ; rapport : {report_path}")
+
+    # Artefact NumPy (forêts uniquement), avec le profil de latence dans ses métadonnées
+    artifact_path = args.artifact or f"{os.path.splitext(args.out)[0]}.model"
+    try:
+        forest = NumpyForest.from_pipeline(pipeline, report["model"]["sha256"], report["data"]["sha256"], report["metadata"])
+    except ValueError:
+        print("Modèle retenu non exportable en artefact NumPy : l'API utilisera le pickle.")
+    else:
+        forest.save(artifact_path)
+        print(f"Artefact NumPy : {artifact_path}")
+    print("Pensez à régénérer la table de scores (score_table.py).")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 import streamlit as st
-import requests
+import httpx
+import asyncio
+import concurrent.futures
+import threading
 import json
 import os
 import time
@@ -8,6 +11,21 @@ import time
 
 API_BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:8000")
 
+# 5 secondes de timeout (Critère "Application solide")
+TIMEOUT_SECONDS = 5
+
+# Nouvelles tentatives (connexion refusée, 429/502/503/504) avec attente exponentielle : 0.2 s, 0.4 s, 0.8 s.
+# /predict est sans effet de bord (même entrée -> même réponse) : le rejouer est sans risque.
+MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "3"))
+RETRY_BACKOFF_SECONDS = float(os.getenv("API_RETRY_BACKOFF", "0.2"))
+
+# Appels simultanés vers l'API pour tout le serveur Streamlit (toutes sessions confondues) : au-delà, les
+# prédictions attendent leur tour au lieu de surcharger l'API lors d'un pic (cours, journée de dépistage)
+MAX_INFLIGHT = int(os.getenv("API_MAX_INFLIGHT", "10"))
+
+# Durée de conservation côté client des prédictions déjà obtenues (formulaire identique -> pas d'appel)
+PREDICTION_CACHE_TTL_SECONDS = int(os.getenv("PREDICTION_CACHE_TTL", "600"))
+
 
 # --- DEBUG: Vérifiez la variable d'environnement ---
 # if not API_BASE_URL:
@@ -30,52 +48,162 @@ BINARY_FEATURES = [
 
 # --- 2. Fonctions d'Appel de l'API ---
 
+class APIError(Exception):
+    """
+    Réponse non 200 de l'API (non mise en cache : le prochain envoi du formulaire refait l'appel).
+    """
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class APIGateway:
+    """
+    Client HTTP asynchrone unique pour tout le serveur Streamlit, dans sa propre boucle d'événements (thread dédié).
+    - un seul pool de connexions keep-alive (httpx.AsyncClient) et au plus MAX_INFLIGHT appels simultanés ;
+    - "singleflight" : des demandes identiques envoyées en même temps par plusieurs sessions partagent un appel ;
+    - nouvelles tentatives avec attente exponentielle (connexion refusée, 429/502/503/504, en-tête Retry-After).
+    Les threads de script Streamlit soumettent leurs appels avec post() et attendent le résultat.
+    """
+
+    def __init__(self, base_url: str, timeout: float, max_inflight: int):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_inflight = max(1, max_inflight)
+        self._inflight = {}  # corps JSON -> asyncio.Future
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="api-gateway", daemon=True).start()
+        # Client et sémaphore créés dans la boucle qui les utilise
+        asyncio.run_coroutine_threadsafe(self._setup(), self._loop).result()
+
+    async def _setup(self):
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            headers={"Content-Type": "application/json"},
+            limits=httpx.Limits(max_connections=self.max_inflight, max_keepalive_connections=self.max_inflight),
+        )
+        self._slots = asyncio.Semaphore(self.max_inflight)
+
+    def post(self, path: str, body: str) -> httpx.Response:
+        """
+        Appel bloquant (depuis un thread de script) ; les exceptions httpx sont propagées.
+        """
+        future = asyncio.run_coroutine_threadsafe(self._coalesced_post(path, body), self._loop)
+        # Borne de sécurité : toutes les tentatives, leurs attentes et le temps passé dans la file
+        deadline = self.timeout * (2 * MAX_RETRIES + 2) + RETRY_BACKOFF_SECONDS * 2 ** (MAX_RETRIES + 1)
+        try:
+            return future.result(timeout=deadline)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise httpx.TimeoutException("Pas de réponse de l'API dans le délai imparti")
+
+    async def _coalesced_post(self, path: str, body: str) -> httpx.Response:
+        key = (path, body)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        future = self._loop.create_future()
+        self._inflight[key] = future
+        try:
+            response = await self._post_with_retries(path, body)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # déjà remontée à l'appelant
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            if not future.done():
+                # Appel du meneur annulé (son propre délai est écoulé, cf. post) : les demandes regroupées
+                # reçoivent un timeout, traité par get_prediction_from_api, plutôt qu'une annulation
+                future.set_exception(httpx.TimeoutException("Pas de réponse de l'API dans le délai imparti"))
+                future.exception()
+            del self._inflight[key]
+
+    async def _post_with_retries(self, path: str, body: str) -> httpx.Response:
+        for attempt in range(MAX_RETRIES + 1):
+            last = attempt == MAX_RETRIES
+            try:
+                async with self._slots:
+                    response = await self._client.post(path, content=body)
+            except httpx.ConnectError:
+                # Pas de nouvelle tentative après un timeout de lecture : l'API a reçu la requête et est lente
+                if last:
+                    raise
+                delay = RETRY_BACKOFF_SECONDS * 2 ** attempt
+            else:
+                if response.status_code not in RETRY_STATUSES or last:
+                    return response
+                delay = RETRY_BACKOFF_SECONDS * 2 ** attempt
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    # Plafonnée au timeout : l'utilisateur attend devant le formulaire
+                    delay = max(delay, min(float(retry_after), self.timeout))
+            await asyncio.sleep(delay)
+
+
+@st.cache_resource
+def get_api_gateway() -> APIGateway:
+    """
+    Passerelle unique pour tout le serveur Streamlit (partagée entre sessions et réexécutions du script).
+    """
+    return APIGateway(API_BASE_URL, TIMEOUT_SECONDS, MAX_INFLIGHT)
+
+
+@st.cache_data(ttl=PREDICTION_CACHE_TTL_SECONDS, max_entries=1024, show_spinner=False)
+def fetch_prediction(features: tuple) -> dict:
+    """
+    Appel à /predict mémoïsé : un formulaire identique (même tuple de valeurs) réutilise la réponse.
+    Les erreurs (exceptions) ne sont pas mises en cache.
+    """
+    # Corps JSON compact construit une seule fois (pas d'espaces) ; il sert aussi de clé de regroupement
+    body = json.dumps(dict(features), separators=(",", ":"))
+    response = get_api_gateway().post("/predict", body)
+    if response.status_code != 200:
+        raise APIError(response)
+    return response.json()
+
+
 def get_prediction_from_api(data: dict):
     """
     Appelle l'endpoint /predict de l'API FastAPI avec gestion des erreurs.
     """
-    url = f"{API_BASE_URL}/predict"
-    
-    # 5 secondes de timeout (Critère "Application solide")
-    TIMEOUT_SECONDS = 5 
-    
     try:
-        response = requests.post(
-            url, 
-            data=json.dumps(data), 
-            headers={"Content-Type": "application/json"},
-            timeout=TIMEOUT_SECONDS
-        )
+        return fetch_prediction(tuple(data.items()))
         
     # Gestion du timeout (si l'API ne répond pas dans les 5s)
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         st.error("❌ Erreur: L'API a mis trop de temps à répondre (> 5s). Veuillez réessayer.")
         return None
-    except requests.exceptions.ConnectionError:
+    except httpx.TransportError:
         st.error(f"❌ Erreur: Impossible de se connecter à l'API à l'adresse {API_BASE_URL}. Assurez-vous qu'elle est lancée (uvicorn app:app).")
         return None
+    except APIError as e:
+        response = e.response
     
     # Gestion des statuts HTTP (y compris 422 pour les erreurs de validation)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        # Afficher l'erreur retournée par l'API (ex: 422 Pydantic error)
-        try:
-            error_data = response.json()
-            st.error(f"⚠️ Erreur de l'API (Code {response.status_code}): Problème de validation des données.")
-            
-            # Tente d'afficher les erreurs Pydantic de manière claire
-            if 'detail' in error_data and isinstance(error_data['detail'], list):
-                for detail in error_data['detail']:
-                    # Afficher l'emplacement et le message de l'erreur
-                    loc = detail.get('loc', ['N/A', 'N/A'])
-                    st.warning(f"  Champ: **{loc[-1]}** - Message: *{detail.get('msg', 'Erreur inconnue')}*")
-            else:
-                st.error(f"Réponse API détaillée: {error_data}")
-        except json.JSONDecodeError:
-            st.error(f"❌ Erreur non JSON de l'API (Code {response.status_code}).")
+    # Afficher l'erreur retournée par l'API (ex: 422 Pydantic error)
+    try:
+        error_data = response.json()
+        st.error(f"⚠️ Erreur de l'API (Code {response.status_code}): Problème de validation des données.")
         
-        return None
+        # Tente d'afficher les erreurs Pydantic de manière claire
+        if 'detail' in error_data and isinstance(error_data['detail'], list):
+            for detail in error_data['detail']:
+                # Afficher l'emplacement et le message de l'erreur
+                loc = detail.get('loc', ['N/A', 'N/A'])
+                st.warning(f"  Champ: **{loc[-1]}** - Message: *{detail.get('msg', 'Erreur inconnue')}*")
+        else:
+            st.error(f"Réponse API détaillée: {error_data}")
+    except json.JSONDecodeError:
+        st.error(f"❌ Erreur non JSON de l'API (Code {response.status_code}).")
+    
+    return None
 
 
 # --- 3. Interface Streamlit ---